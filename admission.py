@@ -0,0 +1,136 @@
+# admission.py - Per-client token-bucket rate limits and concurrency gates that shed load early
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+class MemoryBackend:
+    """
+    Token buckets held in this process, bounded to max_keys clients.
+    Each worker process counts separately, so with N workers a client can
+    get up to N times its limit; use SQLiteBackend to share the buckets.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated); least recently used first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                # A client idle long enough to evict has a full bucket, or close to it
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (cost - tokens) / rate
+
+class SQLiteBackend:
+    """
+    Token buckets kept in their own SQLite file, so every worker process on
+    the host draws from the same bucket per client. Taking a token is one
+    UPSERT in autocommit mode. Buckets that have refilled completely are
+    pruned every PRUNE_INTERVAL seconds, since they are the same as no row.
+    """
+
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pruned = time.time()
+        self._conn().execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                full_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst, cost=1):
+        # Wall-clock time, which unlike monotonic time is the same in every process
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute('''
+            INSERT INTO rate_limit_buckets (key, tokens, updated, full_at)
+            VALUES (:key, :burst - :cost, :now, :now + :cost / :rate)
+            ON CONFLICT(key) DO UPDATE
+            SET tokens = MIN(:burst, tokens + (:now - updated) * :rate) - :cost,
+                updated = :now,
+                full_at = :now + (:burst - MIN(:burst, tokens + (:now - updated) * :rate) + :cost) / :rate
+            WHERE MIN(:burst, tokens + (:now - updated) * :rate) >= :cost
+            RETURNING tokens
+        ''', {'key': key, 'rate': rate, 'burst': burst, 'cost': cost, 'now': now}).fetchone()
+        if now - self._pruned > self.PRUNE_INTERVAL:
+            self._pruned = now
+            conn.execute('DELETE FROM rate_limit_buckets WHERE full_at < ?', (now,))
+        if row is not None:
+            return 0.0
+        tokens, updated = conn.execute(
+            'SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)
+        ).fetchone() or (burst, now)
+        return max(0.0, (cost - min(burst, tokens + (now - updated) * rate)) / rate)
+
+class RateLimiter:
+    """
+    Token bucket per client and endpoint class. limits maps each class to
+    (rate, burst): a client may make burst requests at once and rate per
+    second after that. Classes missing from limits are not limited.
+    """
+
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = limits
+
+    def check(self, endpoint_class, client):
+        """Take one token; returns 0 when allowed, else the seconds until a token is available"""
+        limit = self.limits.get(endpoint_class)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        return self.backend.take(f'{endpoint_class}:{client}', rate, burst)
+
+class ConcurrencyGate:
+    """
+    Lets at most limit callers in at once. A caller that finds every slot
+    taken waits up to max_wait seconds for one and is turned away after
+    that, so a burst is shed instead of queueing on the database without
+    bound. Gates are per process: each worker protects its own threads.
+    """
+
+    def __init__(self, limit, max_wait=0.0):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        """Take a slot, returning False when none freed up within max_wait"""
+        return self._slots.acquire(timeout=self.max_wait)
+
+    def release(self):
+        self._slots.release()
+
+def create_backend(kind, path=None):
+    """Build the backend named by config: 'memory' or 'sqlite'"""
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'sqlite':
+        return SQLiteBackend(path)
+    raise ValueError(f'Unknown rate limit backend: {kind}')
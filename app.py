@@ -1,118 +1,447 @@
 # app.py - Main Flask application for Route Venture
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+import os
+import click
+from flask import (Blueprint, Flask, Response, current_app, render_template, request, jsonify,
+                   redirect, url_for, send_file)
+from werkzeug.exceptions import HTTPException
 import database as db
+import bulk_io
 from config import config
 
-app = Flask(__name__)
-app.config.from_object(config['development'])
+# Every route, hook and CLI command is registered on this blueprint; create_app() builds the app
+bp = Blueprint('main', __name__, cli_group=None)
 
-# Initialize database on startup
-with app.app_context():
-    db.init_db()
+# ==================== INSTRUMENTATION ====================
+import time
+import metrics
+
+# Set from SLOW_QUERY_SECONDS by init_instrumentation(); queries also run outside requests
+slow_query_seconds = None
+
+def init_instrumentation(app):
+    """Read the slow query threshold from the app config"""
+    global slow_query_seconds
+    slow_query_seconds = app.config['SLOW_QUERY_SECONDS']
+
+def record_query(conn, sql, parameters, seconds):
+    """Feed every SQL statement into the metrics, logging slow ones with their plan"""
+    metrics.record_query(sql, seconds)
+    if slow_query_seconds is not None and seconds >= slow_query_seconds:
+        metrics.log_slow_query(sql, seconds, db.explain_query_plan(conn, sql, parameters))
+
+db.add_query_listener(record_query)
+
+@bp.before_app_request
+def start_request_timer():
+    """Start timing the request and counting its SQL statements"""
+    request.environ['route_venture.started'] = time.perf_counter()
+    request.environ['route_venture.stats'] = metrics.start_request()
+
+@bp.after_app_request
+def record_request_metrics(response):
+    """Record the request once its body has been sent, so streamed responses are timed in full"""
+    started = request.environ['route_venture.started']
+    stats = request.environ['route_venture.stats']
+    method = request.method
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = response.status_code
+    slow_request = current_app.config['SLOW_REQUEST_SECONDS']
+    
+    def finish():
+        seconds = time.perf_counter() - started
+        metrics.finish_request()
+        metrics.record_request(method, route, status, seconds, stats)
+        if slow_request is not None and seconds >= slow_request:
+            metrics.log_slow_request(method, route, status, seconds, stats)
+    
+    # Werkzeug never closes direct_passthrough bodies (send_file), which do no further work anyway
+    if response.direct_passthrough:
+        finish()
+    else:
+        response.call_on_close(finish)
+    return response
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Expose request, SQL and QR render metrics in the Prometheus text format"""
+    return Response(metrics.registry.expose(), mimetype='text/plain; version=0.0.4')
+
+# ==================== ADMISSION CONTROL ====================
+import functools
+import math
+from admission import ConcurrencyGate, RateLimiter, create_backend as create_rate_limit_backend
+
+# Created by init_admission_control(); rate_limiter is None when RATE_LIMIT_ENABLED is off
+rate_limiter = None
+concurrency_gates = {}
+
+def init_admission_control(app):
+    """Create the rate limiter and one concurrency gate per entry of CONCURRENCY_LIMITS"""
+    global rate_limiter, concurrency_gates
+    rate_limiter = RateLimiter(
+        create_rate_limit_backend(app.config['RATE_LIMIT_BACKEND'], app.config['RATE_LIMIT_PATH']),
+        app.config['RATE_LIMITS']
+    ) if app.config['RATE_LIMIT_ENABLED'] else None
+    concurrency_gates = {
+        endpoint_class: ConcurrencyGate(limit, app.config['CONCURRENCY_MAX_WAIT'])
+        for endpoint_class, limit in app.config['CONCURRENCY_LIMITS'].items()
+    }
+
+def admitted(endpoint_class, queued=False):
+    """
+    Admit a route's requests under endpoint_class: each client address gets
+    the token bucket configured in RATE_LIMITS (429 when it is empty), then
+    the request takes a slot of the class's concurrency gate (503 when none
+    frees up within CONCURRENCY_MAX_WAIT). Both answers carry Retry-After,
+    and neither touches the database. Routes marked queued skip the gate
+    while the enrollment write queue is on: a gate smaller than
+    WRITE_QUEUE_MAX_BATCH would cap its batches, and the queue already
+    turns requests away past WRITE_QUEUE_MAX_PENDING.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if rate_limiter is not None:
+                retry_after = rate_limiter.check(endpoint_class, request.remote_addr)
+                if retry_after:
+                    metrics.record_rejection(endpoint_class, 'rate_limited')
+                    return (jsonify({'error': 'Too many requests, please slow down'}), 429,
+                            {'Retry-After': str(math.ceil(retry_after))})
+            
+            gate = concurrency_gates.get(endpoint_class)
+            if gate is None or (queued and enrollment_queue is not None):
+                return view(**kwargs)
+            if not gate.acquire():
+                metrics.record_rejection(endpoint_class, 'overloaded')
+                return jsonify({'error': 'Server is busy, please retry'}), 503, {'Retry-After': '1'}
+            try:
+                return view(**kwargs)
+            finally:
+                gate.release()
+        return wrapper
+    return decorator
 
 # ==================== QR CODE ROUTES =====================
-import qrcode
 import io
 import base64
+from flask import stream_with_context
+from qr_codes import QRCodeCache, ERROR_CORRECTION_LEVELS, stream_qr_zip
+
+# Created by init_qr_codes(); qrcode and Pillow are only imported when the first code is rendered
+qr_cache = None
+qr_executor = None
+
+def init_qr_codes(app):
+    """Create the QR code cache from the app config"""
+    global qr_cache
+    qr_cache = QRCodeCache(app.config['QR_CACHE_SIZE'], app.config['QR_CACHE_DIR'],
+                           on_render=metrics.qr_render_duration.observe)
+
+def get_qr_executor():
+    """Create the QR render process pool on first use"""
+    global qr_executor
+    if qr_executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+        qr_executor = ProcessPoolExecutor(max_workers=current_app.config['QR_RENDER_WORKERS'])
+    return qr_executor
+
+def qr_render_executor():
+    """The process pool when single renders are offloaded (QR_RENDER_OFFLOAD), else None"""
+    return get_qr_executor() if current_app.config['QR_RENDER_OFFLOAD'] else None
+
+def event_enroll_url(event_id):
+    """URL encoded in an event's QR code"""
+    # Create the event URL (adjust based on your routing)
+    # For localhost testing
+    return f"http://localhost:5000/enroll?event_id={event_id}"
+    
+    # For production, use:
+    # return f"{request.url_root}enroll?event_id={event_id}"
+
+def get_event_qr(event_id, default_error_correction):
+    """Look up the cached QR code for an event, honouring ?size= and ?ec= overrides"""
+    event_url = event_enroll_url(event_id)
+    box_size = request.args.get('size', 10, type=int)
+    error_correction = request.args.get('ec', default_error_correction).upper()
+    if not 1 <= box_size <= 40 or error_correction not in ERROR_CORRECTION_LEVELS:
+        raise ValueError('size must be 1-40 and ec one of L, M, Q, H')
+    
+    return qr_cache.get(event_id, event_url, box_size, error_correction, qr_render_executor())
 
-@app.route('/api/event/<int:event_id>/qrcode')
+def cacheable(response, etag):
+    """Attach a strong ETag and long-lived Cache-Control, answering 304 when it matches"""
+    response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['QR_CACHE_MAX_AGE']
+    return response.make_conditional(request)
+
+@bp.route('/api/event/<int:event_id>/qrcode')
 def generate_event_qrcode(event_id):
     """Generate QR code image for specific event"""
     try:
-        # Create the event URL (adjust based on your routing)
-        # For localhost testing
-        event_url = f"http://localhost:5000/enroll?event_id={event_id}"
-        
-        # For production, use:
-        # event_url = f"{request.url_root}enroll?event_id={event_id}"
-        
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(event_url)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to BytesIO object
-        img_io = io.BytesIO()
-        img.save(img_io, 'PNG')
-        img_io.seek(0)
-        
-        return send_file(img_io, mimetype='image/png')
-    
+        png, etag = get_event_qr(event_id, 'L')
+        return cacheable(send_file(io.BytesIO(png), mimetype='image/png'), etag)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/event/<int:event_id>/qrcode-base64')
+@bp.route('/api/event/<int:event_id>/qrcode-base64')
 def get_qrcode_base64(event_id):
     """Return QR code as base64 for embedding in HTML (alternative method)"""
     try:
-        import base64
-        
-        event_url = f"http://localhost:5000/enroll?event_id={event_id}"
-        
-        qr = qrcode.QRCode(version=1, box_size=10, border=4)
-        qr.add_data(event_url)
-        qr.make(fit=True)
+        png, etag = get_event_qr(event_id, 'M')
+        img_str = base64.b64encode(png).decode()
         
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        buffered = io.BytesIO()
-        img.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
+        return cacheable(jsonify({'qrcode': f'data:image/png;base64,{img_str}'}), etag)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/events/qrcodes.zip')
+@admitted('export')
+def export_event_qrcodes():
+    """Stream a ZIP of QR codes for all upcoming events, optionally filtered by ?event_type="""
+    try:
+        events = db.get_upcoming_events(request.args.get('event_type'))
+        entries = [
+            (f"event-{event['id']}-qrcode.png",
+             (event['id'], event_enroll_url(event['id']), 10, 'L'))
+            for event in events
+        ]
         
-        return jsonify({'qrcode': f'data:image/png;base64,{img_str}'})
-    
+        return Response(
+            stream_with_context(stream_qr_zip(entries, qr_cache, get_qr_executor())),
+            mimetype='application/zip',
+            headers={'Content-Disposition': 'attachment; filename=event-qrcodes.zip'}
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ==================== STATIC ASSETS ====================
+from static_assets import Asset, StaticAssets
+
+# Created by init_static_assets() when STATIC_PIPELINE is set
+static_assets = None
+rendered_pages = {}
+
+def init_static_assets(app):
+    """Serve static/ from memory under fingerprinted URLs when STATIC_PIPELINE is set"""
+    global static_assets
+    static_assets = StaticAssets(app.static_folder) if app.config['STATIC_PIPELINE'] else None
+    rendered_pages.clear()
+    if static_assets is not None:
+        app.view_functions['static'] = serve_static_asset
+        app.url_defaults(fingerprint_static_url)
+
+def fingerprint_static_url(endpoint, values):
+    """Make url_for('static', filename=...) link to the file's fingerprinted name"""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = static_assets.url_filename(values['filename'])
+
+def send_asset(asset, immutable):
+    """Answer with the best encoding the client accepts; only fingerprinted URLs are cached for good"""
+    body, encoding = asset.negotiate(request.accept_encodings)
+    response = current_app.response_class(body, mimetype=asset.mimetype)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Each encoding is a different representation, so it needs its own ETag
+    response.set_etag(f'{asset.etag}-{encoding}' if encoding else asset.etag)
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def serve_static_asset(filename):
+    """Replaces Flask's static view while STATIC_PIPELINE is set"""
+    asset, immutable = static_assets.lookup(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return send_asset(asset, immutable)
+
+def render_page(template):
+    """Render a page without parameters, only once per process when STATIC_PIPELINE is set"""
+    if static_assets is None:
+        return render_template(template)
+    page = rendered_pages.get(template)
+    if page is None:
+        page = rendered_pages[template] = Asset(render_template(template).encode(), 'text/html')
+    return send_asset(page, immutable=False)
+
 # ==================== WEB PAGE ROUTES ====================
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Home page"""
-    return render_template('index.html')
+    return render_page('index.html')
 
-@app.route('/home')
+@bp.route('/home')
 def home():
     """Home page with introduction"""
     return render_template('home.html')
 
-@app.route('/enroll')
+@bp.route('/enroll')
 def enroll_page():
     """Event enrollment page - shows all available events"""
-    return render_template('enroll.html')
+    return render_page('enroll.html')
 
-@app.route('/create')
+@bp.route('/create')
 def create():
     """Create event page - now accessed via admin dashboard"""
     # Optional: Add authentication check here in production
-    return render_template('create.html')
+    return render_page('create.html')
 
-@app.route('/admin')
+@bp.route('/admin')
 def admin_page():
     """Admin dashboard page"""
-    return render_template('admin.html')
+    return render_page('admin.html')
+
+# ==================== PAGINATION HELPERS ====================
+
+# Query parameters that ask for one page ({items, next_cursor}) instead of the
+# full list; anything else, such as a cache-busting ?_=, keeps the list
+USER_PAGE_PARAMS = ('after', 'limit', 'fields')
+EVENT_PAGE_PARAMS = ('after', 'limit', 'event_type', 'date_from', 'date_to', 'location', 'fields')
+
+def wants_page(params):
+    """True when the request carries any of the given paging or filter parameters"""
+    return any(name in request.args for name in params)
+
+def parse_limit():
+    """Read ?limit= and clamp it to the allowed page size"""
+    limit = request.args.get('limit', db.DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, db.MAX_PAGE_SIZE))
+
+def parse_fields(allowed):
+    """Read ?fields= as a tuple of column names, defaulting to every allowed column"""
+    if not request.args.get('fields'):
+        return tuple(allowed)
+    fields = tuple(field.strip() for field in request.args['fields'].split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def project(row, fields):
+    """Convert a row to a dict holding only the requested fields"""
+    return {field: row[field] for field in fields}
+
+def include_archived():
+    """True when the client asked for archived past events too (?include_archived=1)"""
+    return request.args.get('include_archived') == '1'
+
+# ==================== STREAMING HELPERS ====================
+
+def wants_stream():
+    """True when the client asked for a streamed list (?stream=1, ?format=ndjson or an NDJSON Accept header)"""
+    return (request.args.get('stream') == '1'
+            or request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best == 'application/x-ndjson')
+
+def stream_rows(columns, rows):
+    """Stream tuple rows as a chunked JSON array, or as NDJSON when requested"""
+    ndjson = request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+    return Response(
+        bulk_io.write_json(columns, rows, ndjson),
+        mimetype='application/x-ndjson' if ndjson else 'application/json'
+    )
+
+# ==================== RESPONSE CACHE ====================
+from urllib.parse import urlencode
+from response_cache import ResponseCache, create_backend
+
+# Created by init_response_cache()
+response_cache = None
+
+def init_response_cache(app):
+    """Create the response cache and its backend from the app config"""
+    global response_cache
+    response_cache = ResponseCache(create_backend(
+        app.config['RESPONSE_CACHE_BACKEND'],
+        app.config['RESPONSE_CACHE_PATH'],
+        app.config['RESPONSE_CACHE_MAX_BYTES']
+    ))
+
+def invalidate_response_cache(tags):
+    """Writes in database.py bump the tags of the data they touched"""
+    if response_cache is not None:
+        response_cache.invalidate(tags)
+
+db.add_write_listener(invalidate_response_cache)
+
+def cached_response(*tags):
+    """
+    Serve a GET route from response_cache. tags name the data the route reads
+    and may use the route's arguments, e.g. 'event:{event_id}'. Only 200
+    responses are cached; clients revalidate with ETag / Last-Modified.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            # Streamed bodies are not buffered, and batched reads must stay on their snapshot
+            if wants_stream() or db.in_read_snapshot():
+                return view(**kwargs)
+            
+            key = f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+            entry, versions = response_cache.lookup(key, [tag.format(**kwargs) for tag in tags])
+            status = 'HIT'
+            if entry is None:
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = response_cache.store(key, versions, response.get_data(), response.mimetype)
+                status = 'MISS'
+            
+            response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+            response.set_etag(entry['etag'])
+            response.last_modified = entry['last_modified']
+            response.cache_control.no_cache = True
+            response.headers['X-Cache'] = status
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
 
 # ==================== USER API ENDPOINTS ====================
 
-@app.route('/api/users', methods=['GET'])
+@bp.route('/api/users', methods=['GET'])
 def get_users():
-    """Get all users"""
+    """Get all users, or one page of users when after, limit or fields is given"""
     try:
-        users = db.get_all_users()
-        return jsonify([dict(user) for user in users]), 200
+        if wants_stream():
+            return stream_rows(*db.stream_all_users())
+        if not wants_page(USER_PAGE_PARAMS):
+            users = db.get_all_users()
+            return jsonify([dict(user) for user in users]), 200
+        
+        fields = parse_fields(db.USER_FIELDS)
+        limit = parse_limit()
+        after = request.args.get('after')
+        if after is not None and not after.isdigit():
+            raise ValueError('after must be a user ID')
+        
+        users = db.get_users_page(int(after or 0), limit, fields)
+        next_cursor = str(users[-1]['id']) if len(users) == limit else None
+        return jsonify({
+            'items': [project(user, fields) for user in users],
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/<int:user_id>', methods=['GET'])
+@bp.route('/api/user/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """Get specific user by ID"""
     try:
@@ -123,7 +452,8 @@ def get_user(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/add', methods=['POST'])
+@bp.route('/api/user/add', methods=['POST'])
+@admitted('write')
 def add_user():
     """Add a new user"""
     try:
@@ -133,6 +463,9 @@ def add_user():
             return jsonify({'error': 'Name and email are required'}), 400
         
         user_id = db.add_user(data['name'], data['email'])
+        if user_id is None:
+            return jsonify({'error': 'A user with this email already exists'}), 409
+        
         return jsonify({
             'message': 'User added successfully',
             'id': user_id
@@ -140,7 +473,28 @@ def add_user():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/update/<int:user_id>', methods=['PUT'])
+@bp.route('/api/user/get-or-create', methods=['POST'])
+@admitted('write')
+def get_or_create_user():
+    """Return the user registered with an email, registering them first if needed"""
+    try:
+        data = request.get_json()
+        
+        if not data or 'name' not in data or 'email' not in data:
+            return jsonify({'error': 'Name and email are required'}), 400
+        
+        user, created = db.get_or_create_user(data['name'], data['email'])
+        return jsonify({
+            'id': user['id'],
+            'name': user['name'],
+            'email': user['email'],
+            'created': created
+        }), 201 if created else 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/user/update/<int:user_id>', methods=['PUT'])
+@admitted('write')
 def update_user(user_id):
     """Update user information"""
     try:
@@ -155,7 +509,8 @@ def update_user(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/delete/<int:user_id>', methods=['DELETE'])
+@bp.route('/api/user/delete/<int:user_id>', methods=['DELETE'])
+@admitted('write')
 def delete_user(user_id):
     """Delete a user"""
     try:
@@ -170,27 +525,103 @@ def delete_user(user_id):
 
 # ==================== EVENT API ENDPOINTS ====================
 
-@app.route('/api/events', methods=['GET'])
+@bp.route('/api/events', methods=['GET'])
+@cached_response('events', 'users')
 def get_events():
-    """Get all events"""
+    """
+    Get all events, or one page of events when any of EVENT_PAGE_PARAMS is
+    given: after=<event_date,id>, limit, event_type, date_from, date_to,
+    location and fields=<comma separated columns>. include_archived=1 adds
+    archived events to either shape.
+    """
+    try:
+        if wants_stream():
+            return stream_rows(*db.stream_all_events())
+        if not wants_page(EVENT_PAGE_PARAMS):
+            events = db.get_all_events(include_archived())
+            return jsonify([dict(event) for event in events]), 200
+        
+        fields = parse_fields(db.EVENT_FIELDS)
+        limit = parse_limit()
+        after = None
+        if request.args.get('after'):
+            event_date, _, event_id = request.args['after'].rpartition(',')
+            if not event_date or not event_id.isdigit():
+                raise ValueError('after must be <event_date>,<id>')
+            after = (event_date, int(event_id))
+        
+        events = db.get_events_page(
+            after,
+            limit,
+            request.args.get('event_type'),
+            request.args.get('date_from'),
+            request.args.get('date_to'),
+            request.args.get('location'),
+            fields,
+            include_archived()
+        )
+        next_cursor = None
+        if len(events) == limit:
+            next_cursor = f"{events[-1]['event_date']},{events[-1]['id']}"
+        return jsonify({
+            'items': [project(event, fields) for event in events],
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/events/search', methods=['GET'])
+@admitted('search')
+@cached_response('events', 'users')
+def search_events():
+    """
+    Full-text search over event title, description and location, best match first.
+    Supports q (the last word matches as a prefix), event_type, date_from,
+    date_to, limit and after=<cursor from the previous page>.
+    """
     try:
-        events = db.get_all_events()
-        return jsonify([dict(event) for event in events]), 200
+        query = request.args.get('q', '').strip()
+        if not query:
+            raise ValueError('q is required')
+        limit = parse_limit()
+        after = request.args.get('after', '0')
+        if not after.isdigit():
+            raise ValueError('after must be a cursor from a previous page')
+        
+        events = db.search_events(
+            query,
+            request.args.get('event_type'),
+            request.args.get('date_from'),
+            request.args.get('date_to'),
+            limit,
+            int(after)
+        )
+        next_cursor = str(int(after) + limit) if len(events) == limit else None
+        return jsonify({
+            'items': [dict(event) for event in events],
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/event/<int:event_id>', methods=['GET'])
+@bp.route('/api/event/<int:event_id>', methods=['GET'])
+@cached_response('event:{event_id}', 'users')
 def get_event(event_id):
     """Get specific event by ID"""
     try:
-        event = db.get_event_by_id(event_id)
+        event = db.get_event_by_id(event_id, include_archived())
         if event:
             return jsonify(dict(event)), 200
         return jsonify({'error': 'Event not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/event/add', methods=['POST'])
+@bp.route('/api/event/add', methods=['POST'])
+@admitted('write')
 def add_event():
     """Add a new event"""
     try:
@@ -210,6 +641,8 @@ def add_event():
             data.get('max_participants'),
             data.get('created_by')
         )
+        if current_app.config['JOBS_ENABLED']:
+            scheduler.once('prerender-new-event-qr', lambda: prerender_qr_codes([event_id]))
         
         return jsonify({
             'message': 'Event created successfully',
@@ -218,7 +651,8 @@ def add_event():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/event/update/<int:event_id>', methods=['PUT'])
+@bp.route('/api/event/update/<int:event_id>', methods=['PUT'])
+@admitted('write')
 def update_event(event_id):
     """Update event information"""
     try:
@@ -227,13 +661,20 @@ def update_event(event_id):
             return jsonify({'error': 'Event not found'}), 404
         
         data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object of fields to update'}), 400
         db.update_event(event_id, **data)
         
         return jsonify({'message': 'Event updated successfully'}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except db.DatabaseBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/event/delete/<int:event_id>', methods=['DELETE'])
+@bp.route('/api/event/delete/<int:event_id>', methods=['DELETE'])
+@admitted('write')
 def delete_event(event_id):
     """Delete an event"""
     try:
@@ -242,13 +683,64 @@ def delete_event(event_id):
             return jsonify({'error': 'Event not found'}), 404
         
         db.delete_event(event_id)
+        qr_cache.invalidate(event_id)
         return jsonify({'message': 'Event deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ==================== ENROLLMENT WRITE QUEUE ====================
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from write_queue import GroupCommitQueue, QueueFullError
+
+# Optional write-behind mode: one writer thread group-commits enrollment changes
+enrollment_queue = None
+
+def init_write_queue(app):
+    """Create the enrollment write queue when WRITE_QUEUE_ENABLED is set"""
+    global enrollment_queue
+    enrollment_queue = GroupCommitQueue(
+        db.apply_enrollment_batch,
+        app.config['WRITE_QUEUE_MAX_BATCH'],
+        app.config['WRITE_QUEUE_MAX_DELAY'],
+        app.config['WRITE_QUEUE_MAX_PENDING'],
+        on_batch=metrics.record_write_batch
+    ) if app.config['WRITE_QUEUE_ENABLED'] else None
+
+def queued_write(request_args):
+    """
+    Submit one request to the enrollment queue and wait for its own result.
+    A request still waiting after WRITE_QUEUE_TIMEOUT is withdrawn and gets
+    DatabaseBusyError; one whose batch is already being committed can no
+    longer be withdrawn, so its outcome is awaited instead of inviting a retry.
+    """
+    try:
+        future = enrollment_queue.submit(request_args)
+    except QueueFullError as e:
+        raise db.DatabaseBusyError(str(e)) from e
+    try:
+        return future.result(timeout=current_app.config['WRITE_QUEUE_TIMEOUT'])
+    except FutureTimeoutError:
+        if future.cancel():
+            raise db.DatabaseBusyError('Timed out waiting for the write queue, please retry') from None
+    # run_write() bounds the batch with its own busy timeout and retries
+    return future.result()
+
+def enroll_user(event_id, user_id, waitlist):
+    """db.enroll_user(), through the write queue when WRITE_QUEUE_ENABLED is set"""
+    if enrollment_queue is None:
+        return db.enroll_user(event_id, user_id, waitlist)
+    return queued_write(('enroll', event_id, user_id, waitlist))
+
+def unenroll_user(event_id, user_id):
+    """db.unenroll_user(), through the write queue when WRITE_QUEUE_ENABLED is set"""
+    if enrollment_queue is None:
+        return db.unenroll_user(event_id, user_id)
+    return queued_write(('unenroll', event_id, user_id))
+
 # ==================== ENROLLMENT API ENDPOINTS ====================
 
-@app.route('/api/enroll', methods=['POST'])
+@bp.route('/api/enroll', methods=['POST'])
+@admitted('write', queued=True)
 def enroll():
     """Enroll a user in an event"""
     try:
@@ -257,7 +749,7 @@ def enroll():
         if not data or 'event_id' not in data or 'user_id' not in data:
             return jsonify({'error': 'Event ID and User ID are required'}), 400
         
-        enrollment_id = db.enroll_user(data['event_id'], data['user_id'])
+        enrollment_id = enroll_user(data['event_id'], data['user_id'], bool(data.get('waitlist')))
         
         if enrollment_id is None:
             return jsonify({'error': 'User is already enrolled in this event'}), 409
@@ -266,10 +758,22 @@ def enroll():
             'message': 'Enrollment successful',
             'id': enrollment_id
         }), 201
+    except db.EventNotFoundError:
+        return jsonify({'error': 'Event not found'}), 404
+    except db.EventFullError as e:
+        if e.waitlist_position is not None:
+            return jsonify({
+                'message': 'Event is full, added to the waitlist',
+                'waitlist_position': e.waitlist_position
+            }), 202
+        return jsonify({'error': 'Event is full', 'full': True}), 409
+    except db.DatabaseBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/unenroll', methods=['POST'])
+@bp.route('/api/unenroll', methods=['POST'])
+@admitted('write', queued=True)
 def unenroll():
     """Unenroll a user from an event"""
     try:
@@ -278,60 +782,491 @@ def unenroll():
         if not data or 'event_id' not in data or 'user_id' not in data:
             return jsonify({'error': 'Event ID and User ID are required'}), 400
         
-        db.unenroll_user(data['event_id'], data['user_id'])
+        promoted_user_id = unenroll_user(data['event_id'], data['user_id'])
         
-        return jsonify({'message': 'Unenrollment successful'}), 200
+        return jsonify({
+            'message': 'Unenrollment successful',
+            'promoted_user_id': promoted_user_id
+        }), 200
+    except db.DatabaseBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/event/<int:event_id>/enrollments', methods=['GET'])
+@bp.route('/api/event/<int:event_id>/enrollments', methods=['GET'])
+@cached_response('enrollments:{event_id}', 'users')
 def get_event_enrollments(event_id):
     """Get all enrollments for an event"""
     try:
-        enrollments = db.get_event_enrollments(event_id)
+        if wants_stream():
+            return stream_rows(*db.stream_event_enrollments(event_id))
+        enrollments = db.get_event_enrollments(event_id, include_archived())
         return jsonify([dict(enrollment) for enrollment in enrollments]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/<int:user_id>/enrollments', methods=['GET'])
+@bp.route('/api/user/<int:user_id>/enrollments', methods=['GET'])
 def get_user_enrollments(user_id):
     """Get all enrollments for a user"""
     try:
-        enrollments = db.get_user_enrollments(user_id)
+        if wants_stream():
+            return stream_rows(*db.stream_user_enrollments(user_id))
+        enrollments = db.get_user_enrollments(user_id, include_archived())
         return jsonify([dict(enrollment) for enrollment in enrollments]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ==================== LIVE EVENT UPDATES ====================
+import threading
+from live_updates import ChangeBroadcaster, format_sse
+
+# Created by init_live_updates()
+event_broadcaster = None
+event_stream_subscribers = 0
+event_stream_lock = threading.Lock()
+
+def seat_update(change):
+    """Delta pushed to the browsers for one row of db.get_event_changes()"""
+    if change['enrolled_count'] is None:
+        return {'event_id': change['event_id'], 'deleted': True}
+    max_participants = change['max_participants']
+    return {
+        'event_id': change['event_id'],
+        'enrolled_count': change['enrolled_count'],
+        'remaining': None if max_participants is None else max(0, max_participants - change['enrolled_count'])
+    }
+
+def fetch_seat_updates(after, page_size=1000):
+    """Change feed for the broadcaster: the latest seat count of every event changed after `after`"""
+    try:
+        if after is None:
+            return None, db.latest_event_change(), None
+        since = cursor = after
+        updates = {}
+        while True:
+            changes = db.get_event_changes(cursor, page_size)
+            if not changes:
+                break
+            # Change numbers are consecutive, so a jump means older ones were pruned
+            if cursor == after and changes[0]['seq'] != after + 1:
+                since = changes[0]['seq'] - 1
+            for change in changes:
+                updates[change['event_id']] = seat_update(change)
+            cursor = changes[-1]['seq']
+            if len(changes) < page_size:
+                break
+        return since, cursor, list(updates.values()) or None
+    finally:
+        db.release_db_connection()
+
+def init_live_updates(app):
+    """Create the seat count broadcaster; its thread starts with the first stream"""
+    global event_broadcaster
+    event_broadcaster = ChangeBroadcaster(fetch_seat_updates, app.config['EVENT_STREAM_POLL_INTERVAL'],
+                                          min_interval=app.config['EVENT_STREAM_MIN_INTERVAL'])
+
+def wake_event_broadcaster(tags):
+    """Push this worker's own event and enrollment writes without waiting for the next poll"""
+    if event_broadcaster is not None and ('events' in tags or '*' in tags):
+        event_broadcaster.wake()
+
+db.add_write_listener(wake_event_broadcaster)
+
+def reserve_event_stream(max_subscribers):
+    """Count one more open stream, or return False when max_subscribers are already open"""
+    global event_stream_subscribers
+    with event_stream_lock:
+        if event_stream_subscribers >= max_subscribers:
+            return False
+        event_stream_subscribers += 1
+        return True
+
+def release_event_stream():
+    global event_stream_subscribers
+    with event_stream_lock:
+        event_stream_subscribers -= 1
+
+@bp.route('/api/events/stream')
+def stream_seat_updates():
+    """
+    Server-Sent Events stream of seat count changes. Each 'seats' message is a
+    list of {event_id, enrolled_count, remaining} (remaining is null for events
+    without a limit) or {event_id, deleted: true}. A 'reset' message means
+    updates were missed and the list should be reloaded. Reconnecting browsers
+    resume from Last-Event-ID.
+    """
+    after = request.headers.get('Last-Event-ID', type=int)
+    if after is None:
+        after = event_broadcaster.latest(timeout=5)
+    if after is None or not reserve_event_stream(current_app.config['EVENT_STREAM_MAX_SUBSCRIBERS']):
+        response = jsonify({'error': 'Live updates are unavailable, please retry'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    heartbeat = current_app.config['EVENT_STREAM_HEARTBEAT']
+    deadline = time.monotonic() + current_app.config['EVENT_STREAM_MAX_SECONDS']
+    
+    def generate(cursor):
+        # An id-only message records the starting point for a reconnect
+        yield f'retry: 3000\nid: {cursor}\n\n'
+        while time.monotonic() < deadline:
+            messages = event_broadcaster.listen(cursor, heartbeat)
+            if not messages:
+                yield ': keep-alive\n\n'
+            for cursor, updates in messages:
+                yield format_sse(updates, 'seats' if updates is not None else 'reset', cursor)
+    
+    response = Response(generate(after), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release_event_stream)
+    return response
+
+# ==================== BULK IMPORT / EXPORT ENDPOINTS ====================
+
+IMPORTERS = {
+    'users': db.import_users,
+    'events': db.import_events,
+    'enrollments': db.import_enrollments,
+}
+
+@bp.route('/api/<any(users, events, enrollments):kind>/import', methods=['POST'])
+@admitted('import')
+def bulk_import(kind):
+    """Import users, events or enrollments from a streamed CSV or JSONL request body"""
+    try:
+        fmt = request.args.get('format') or bulk_io.detect_format(request.mimetype)
+        if fmt not in bulk_io.FORMATS:
+            return jsonify({'error': 'format must be csv or jsonl'}), 400
+        
+        text_stream = io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8-sig', newline='')
+        imported, errors = IMPORTERS[kind](bulk_io.read_records(text_stream, fmt))
+        return jsonify({'imported': imported, 'errors': errors}), 200
+    except db.DatabaseBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/event/<int:event_id>/enrollments/export', methods=['GET'])
+@admitted('export')
+def export_event_enrollments(event_id):
+    """Stream an event's roster as CSV (default) or JSONL"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in bulk_io.FORMATS:
+        return jsonify({'error': 'format must be csv or jsonl'}), 400
+    
+    fields = ('id', 'name', 'email', 'enrolled_at')
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        bulk_io.write_records(*db.stream_event_enrollments(event_id), fields, fmt),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=event-{event_id}-enrollments.{fmt}'}
+    )
+
+# ==================== BATCH API ENDPOINT ====================
+
+MAX_BATCH_REQUESTS = 20
+
+# Endpoints that stream or hold the connection open; a batch would have to
+# wait for them to finish, or would leave a seat count subscriber behind
+STREAMING_ENDPOINTS = {
+    'main.stream_seat_updates',
+    'main.export_event_qrcodes',
+    'main.export_event_enrollments',
+}
+
+def dispatch_batched_get(path):
+    """Run one GET API call inside the current request and return {status, body}"""
+    if not isinstance(path, str) or not path.startswith('/api/') or path.startswith('/api/batch'):
+        return {'status': 400, 'body': {'error': 'Only /api/ GET paths can be batched'}}
+    
+    with current_app.test_request_context(path, method='GET'):
+        # Checked on the matched route before the view runs, so nothing is started
+        if request.endpoint in STREAMING_ENDPOINTS or wants_stream():
+            return {'status': 400, 'body': {'error': 'Streaming endpoints cannot be batched'}}
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+        except HTTPException as e:
+            return {'status': e.code, 'body': {'error': e.description}}
+        
+        if not response.is_json:
+            response.close()
+            return {'status': 415, 'body': {'error': 'Only JSON endpoints can be batched'}}
+        return {'status': response.status_code, 'body': response.get_json()}
+
+@bp.route('/api/batch', methods=['POST'])
+@admitted('export')
+def batch():
+    """
+    Run several GET API calls in one round trip: {"requests": ["/api/event/1", ...]}.
+    All sub-requests share this request's connection and one read transaction,
+    so they see a consistent snapshot. Returns {"responses": [{status, body}, ...]}.
+    """
+    try:
+        data = request.get_json()
+        paths = data.get('requests') if isinstance(data, dict) else None
+        
+        if not isinstance(paths, list) or not paths:
+            return jsonify({'error': 'requests must be a non-empty list of paths'}), 400
+        if len(paths) > MAX_BATCH_REQUESTS:
+            return jsonify({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch'}), 400
+        
+        with db.read_snapshot():
+            responses = [dispatch_batched_get(path) for path in paths]
+        return jsonify({'responses': responses}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ==================== ADMIN API ENDPOINTS ====================
 
-@app.route('/api/admin/stats', methods=['GET'])
+@bp.route('/api/admin/stats', methods=['GET'])
 def get_stats():
     """Get statistics for admin dashboard"""
     try:
-        stats = db.get_enrollment_stats()
-        # Convert sqlite3.Row objects to dicts
-        stats['events_by_type'] = [dict(row) for row in stats['events_by_type']]
-        stats['popular_events'] = [dict(row) for row in stats['popular_events']]
+        stats = db.get_enrollment_stats(include_archived())
         return jsonify(stats), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/contact')
+@bp.route('/contact')
 def contact():
     """Contact Us page route"""
-    return render_template('contact.html')
+    return render_page('contact.html')
+
+# ==================== BACKGROUND JOBS ====================
+import socket
+from datetime import date, timedelta
+from scheduler import Scheduler
+
+# Created by init_jobs()
+scheduler = None
+
+def job_owner():
+    """Identifies this worker process in the job_runs table"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def finish_job(name, seconds, error):
+    """Record a finished job run in the metrics and the job_runs table"""
+    metrics.record_job(name, seconds, error)
+    db.finish_job_run(name, job_owner(), seconds, error)
+
+def upcoming_event_ids():
+    """Ids of the soonest upcoming events, the ones visitors are most likely to open"""
+    return [event['id'] for event in db.get_upcoming_events()[:current_app.config['JOB_WARM_EVENTS']]]
+
+def warm_event_cache():
+    """Fill the response cache with the first events page and the soonest events"""
+    paths = ['/api/events?limit=30'] + [f'/api/event/{event_id}' for event_id in upcoming_event_ids()]
+    for path in paths:
+        with current_app.test_request_context(path, method='GET'):
+            current_app.make_response(current_app.dispatch_request()).close()
+
+def prerender_qr_codes(event_ids=None):
+    """Render the QR codes the event pages and posters ask for before anyone does"""
+    for event_id in upcoming_event_ids() if event_ids is None else event_ids:
+        for error_correction in ('L', 'M'):
+            qr_cache.get(event_id, event_enroll_url(event_id), 10, error_correction, qr_render_executor())
+
+def archive_past_events(days=None):
+    """Move events dated more than ARCHIVE_AFTER_DAYS days ago to the archive database"""
+    if days is None:
+        days = current_app.config['ARCHIVE_AFTER_DAYS']
+    before = (date.today() - timedelta(days=days)).isoformat()
+    return db.archive_events(before)
+
+def init_jobs(app):
+    """
+    Register the background jobs enabled in JOB_INTERVALS; they start with the
+    first request. With JOBS_ENABLED off only the read snapshot is refreshed.
+    """
+    global scheduler
+    scheduler = Scheduler(
+        app.config['JOB_WORKERS'],
+        claim=lambda name, interval: db.claim_job_run(name, interval, job_owner()),
+        on_finish=finish_job
+    )
+    
+    def in_app_context(func):
+        """Run a job inside an application context so its pooled connection is handed back"""
+        @functools.wraps(func)
+        def wrapper():
+            with app.app_context():
+                func()
+        return wrapper
+    
+    # Jobs whose results are shared by every worker run in one process per interval;
+    # per-process caches are warmed in every worker
+    shared_response_cache = app.config['RESPONSE_CACHE_BACKEND'] == 'sqlite'
+    shared_qr_cache = bool(app.config['QR_CACHE_DIR'])
+    jobs = [
+        ('warm-event-cache', warm_event_cache, shared_response_cache),
+        ('warm-admin-stats', db.get_enrollment_stats, False),
+        ('prerender-qr-codes', prerender_qr_codes, shared_qr_cache),
+        ('optimize-database', db.optimize_database, True),
+        ('checkpoint-wal', db.checkpoint_wal, True),
+        ('vacuum-database', db.vacuum_database, True),
+    ]
+    if app.config['ARCHIVE_DATABASE_PATH']:
+        jobs.append(('archive-events', archive_past_events, True))
+    for name, func, exclusive in jobs:
+        interval = app.config['JOB_INTERVALS'].get(name)
+        if interval is not None and app.config['JOBS_ENABLED']:
+            scheduler.every(name, interval, in_app_context(func), exclusive=exclusive, delay=0)
+    
+    # The admin statistics read the snapshot, so it is kept fresh either way
+    if app.config['READ_SNAPSHOT_PATH']:
+        scheduler.every('refresh-read-snapshot', app.config['READ_SNAPSHOT_INTERVAL'], db.refresh_read_snapshot)
+
+@bp.before_app_request
+def start_scheduler():
+    """Start the job threads in the worker process that serves the first request"""
+    if current_app.config['JOBS_ENABLED'] or scheduler.jobs:
+        scheduler.start()
+
+@bp.route('/api/admin/jobs', methods=['GET'])
+def get_jobs():
+    """Background jobs of this worker process and the last run of each job in any process"""
+    try:
+        return jsonify({
+            'owner': job_owner(),
+            'jobs': scheduler.status(),
+            'runs': [dict(run) for run in db.get_job_runs()]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 # ==================== ERROR HANDLERS ====================
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# ==================== CLI COMMANDS ====================
+
+@bp.cli.command('migrate')
+def migrate_command():
+    """Create missing tables and apply pending schema migrations"""
+    version = db.init_db()
+    click.echo(f'Schema is at version {version}')
+
+@bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot query falls back to a full table scan"""
+    problems = db.check_query_plans()
+    for func_name, sql, step in problems:
+        click.echo(f'{func_name}: {step}\n    {sql}', err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo('All hot queries use an index')
+
+@bp.cli.command('archive-events')
+@click.option('--days', type=int, default=None, help='Archive events dated more than this many days ago '
+              '(default: ARCHIVE_AFTER_DAYS).')
+def archive_events_command(days):
+    """Move past events and their enrollments to the archive database"""
+    if not current_app.config['ARCHIVE_DATABASE_PATH']:
+        raise click.ClickException('Set ARCHIVE_DATABASE_PATH to enable archiving')
+    events, enrollments = archive_past_events(days)
+    click.echo(f'Archived {events} event(s) and {enrollments} enrollment(s)')
+
+@bp.cli.command('enrollment-counts')
+@click.option('--rebuild', is_flag=True, help='Recompute drifted counters from the enrollments table.')
+def enrollment_counts_command(rebuild):
+    """Check events.enrolled_count against the enrollments table"""
+    drifted = db.check_enrollment_counts()
+    for row in drifted:
+        click.echo(f"event {row['id']}: stored {row['enrolled_count']}, actual {row['actual_count']}")
+    if rebuild and drifted:
+        fixed = db.rebuild_enrollment_counts()
+        click.echo(f'Rebuilt enrollment counts for {fixed} event(s)')
+    elif drifted:
+        raise SystemExit(1)
+    else:
+        click.echo('Enrollment counts are consistent')
+
+@bp.cli.command('reconcile-stats')
+@click.option('--dry-run', is_flag=True, help='Report drift without rewriting the summary tables.')
+def reconcile_stats_command(dry_run):
+    """Recompute admin statistics from scratch and report any drift"""
+    drift = db.reconcile_stats(fix=not dry_run)
+    for name, values in drift.items():
+        click.echo(f"{name}: stored {values['stored']}, actual {values['actual']}")
+    if not drift:
+        click.echo('Admin statistics are consistent')
+    elif dry_run:
+        raise SystemExit(1)
+    else:
+        click.echo(f'Rewrote {len(drift)} drifted aggregate(s)')
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(IMPORTERS)))
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(bulk_io.FORMATS), help='Defaults to the file extension.')
+def import_data_command(kind, source, fmt):
+    """Bulk import users, events or enrollments from a CSV or JSONL file ('-' for stdin)"""
+    fmt = fmt or bulk_io.detect_format(source.name)
+    imported, errors = IMPORTERS[kind](bulk_io.read_records(source, fmt))
+    for error in errors:
+        click.echo(f"row {error['row']}: {error['error']}", err=True)
+    click.echo(f'Imported {imported} {kind}, {len(errors)} row(s) rejected')
+
+# ==================== APPLICATION FACTORY ====================
+
+def init_database(app):
+    """
+    Bring the schema up to date. Only the first process to start after a
+    deployment that adds migrations runs any DDL; every other process just
+    reads the schema version.
+    """
+    if (db.DATABASE_NAME, db.ARCHIVE_DATABASE_NAME) != (app.config['DATABASE_NAME'],
+                                                        app.config['ARCHIVE_DATABASE_PATH']):
+        # Connections opened for a previous app point at the old files
+        db.close_all_connections()
+    db.DATABASE_NAME = app.config['DATABASE_NAME']
+    # Past events live in a second file, attached to every connection as 'archive'
+    db.ARCHIVE_DATABASE_NAME = app.config['ARCHIVE_DATABASE_PATH']
+    with app.app_context():
+        if db.schema_version() < len(db.MIGRATIONS):
+            db.init_db()
+    
+    # Admin statistics can read a periodically refreshed copy instead of the live database
+    if app.config['READ_SNAPSHOT_PATH']:
+        db.enable_read_snapshots(app.config['READ_SNAPSHOT_PATH'])
+
+def create_app(config_name=None, **overrides):
+    """
+    Build the Flask application. config_name is a key of config.config and
+    defaults to the FLASK_CONFIG environment variable, then 'development';
+    keyword arguments override single settings, e.g. DATABASE_NAME=path.
+    Serve it with e.g. gunicorn "app:create_app('production')".
+
+    The database pool, caches, queues and scheduler are module globals, so
+    there is one app per process: calling create_app() again replaces the
+    objects the previous app was using.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[config_name or os.environ.get('FLASK_CONFIG', 'default')])
+    app.config.update(overrides)
+    
+    # Each request borrows one pooled connection and hands it back on teardown
+    app.teardown_appcontext(db.release_db_connection)
+    
+    init_database(app)
+    init_static_assets(app)
+    init_instrumentation(app)
+    init_admission_control(app)
+    init_qr_codes(app)
+    init_response_cache(app)
+    init_write_queue(app)
+    init_live_updates(app)
+    init_jobs(app)
+    app.register_blueprint(bp)
+    return app
+
 # ==================== RUN APPLICATION ====================
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    create_app().run(debug=True, host='0.0.0.0', port=5001)
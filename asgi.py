@@ -0,0 +1,223 @@
+# asgi.py - Optional ASGI entry point: Flask routes on a bounded thread pool, live streams on the event loop
+#
+#   uvicorn --factory asgi:create_asgi_app --workers 4
+#   FLASK_CONFIG=production hypercorn 'asgi:create_asgi_app()'
+
+import asyncio
+import io
+import json
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import app as views
+from live_updates import format_sse
+
+# Encoded change messages kept for streams that are still sending them
+ENCODED_CHANGES_KEPT = 64
+
+class _RequestBody(io.RawIOBase):
+    """wsgi.input that pulls the request body from the ASGI receive channel on demand"""
+
+    def __init__(self, receive, loop):
+        self.receive = receive
+        self.loop = loop
+        self.buffer = b''
+        self.more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self.buffer and self.more:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message['type'] == 'http.disconnect':
+                raise OSError('Client disconnected')
+            self.buffer = message.get('body', b'')
+            self.more = message.get('more_body', False)
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+def wsgi_environ(scope, body):
+    """Build the PEP 3333 environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BufferedReader(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+class AsyncApp:
+    """
+    ASGI application serving the Flask app created by app.create_app().
+    Every route runs unchanged on a pool of ASGI_THREADS threads, so
+    requests beyond that wait as cheap coroutines instead of each holding a
+    thread, and database calls never block the event loop. The live seat
+    count stream is served on the loop itself: an idle stream costs one
+    suspended coroutine rather than a thread. Single QR code renders go to
+    the QR_RENDER_WORKERS process pool, so encoding does not hold the GIL.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.config['QR_RENDER_OFFLOAD'] = True
+        self.executor = ThreadPoolExecutor(self.config['ASGI_THREADS'], thread_name_prefix='asgi-route')
+        self.native_routes = {'/api/events/stream': self.stream_seat_updates}
+        # (cursor, is_reset) -> encoded SSE message, oldest first
+        self._encoded_changes = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            handler = self.native_routes.get(scope['path'])
+            if handler is not None and scope['method'] == 'GET':
+                await handler(scope, receive, send)
+            else:
+                await self.run_wsgi(scope, receive, send)
+        else:
+            raise NotImplementedError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        """Stop the route threads and the QR render processes"""
+        self.executor.shutdown(wait=False)
+        if views.qr_executor is not None:
+            views.qr_executor.shutdown()
+
+    async def run_wsgi(self, scope, receive, send):
+        """Run one request through the Flask app on the route thread pool, streaming its body back"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._run_wsgi, scope, receive, send, loop)
+
+    def _run_wsgi(self, scope, receive, send, loop):
+        def call(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        body = self.flask_app(wsgi_environ(scope, _RequestBody(receive, loop)), start_response)
+        try:
+            started = False
+            for chunk in body:
+                if not started:
+                    call({'type': 'http.response.start', 'status': response['status'],
+                          'headers': response['headers']})
+                    started = True
+                if chunk:
+                    call({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                call({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            call({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Runs call_on_close hooks such as the request metrics
+            if hasattr(body, 'close'):
+                body.close()
+
+    async def stream_seat_updates(self, scope, receive, send):
+        """The /api/events/stream route of app.py, with each subscriber a coroutine"""
+        broadcaster = views.event_broadcaster
+        headers = dict(scope['headers'])
+        try:
+            after = int(headers[b'last-event-id'])
+        except (KeyError, ValueError):
+            after = None
+        if after is None:
+            after = await broadcaster.latest_async(timeout=5)
+        if after is None or not views.reserve_event_stream(self.config['EVENT_STREAM_MAX_SUBSCRIBERS']):
+            await send({'type': 'http.response.start', 'status': 503, 'headers': [
+                (b'content-type', b'application/json'), (b'retry-after', b'30')]})
+            await send({'type': 'http.response.body',
+                        'body': json.dumps({'error': 'Live updates are unavailable, please retry'}).encode()})
+            return
+
+        # Cancels this coroutine when the client goes away, instead of racing
+        # a disconnect check against every wait for changes
+        disconnected = asyncio.ensure_future(self._cancel_on_disconnect(receive, asyncio.current_task()))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            cursor = after
+            await self._send_event(send, f'retry: 3000\nid: {cursor}\n\n'.encode('utf-8'))
+            heartbeat = self.config['EVENT_STREAM_HEARTBEAT']
+            deadline = time.monotonic() + self.config['EVENT_STREAM_MAX_SECONDS']
+            while time.monotonic() < deadline:
+                messages = await broadcaster.listen_async(cursor, heartbeat)
+                if not messages:
+                    await self._send_event(send, b': keep-alive\n\n')
+                for cursor, updates in messages:
+                    await self._send_event(send, self._encode_change(cursor, updates))
+            await send({'type': 'http.response.body', 'body': b''})
+        except asyncio.CancelledError:
+            if not disconnected.done():
+                raise
+        finally:
+            disconnected.cancel()
+            views.release_event_stream()
+
+    def _encode_change(self, cursor, updates):
+        """SSE message for one change, encoded once per worker however many streams send it"""
+        key = (cursor, updates is None)
+        message = self._encoded_changes.get(key)
+        if message is None:
+            message = format_sse(updates, 'seats' if updates is not None else 'reset', cursor).encode('utf-8')
+            self._encoded_changes[key] = message
+            if len(self._encoded_changes) > ENCODED_CHANGES_KEPT:
+                self._encoded_changes.popitem(last=False)
+        return message
+
+    @staticmethod
+    async def _send_event(send, body):
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    @staticmethod
+    async def _cancel_on_disconnect(receive, task):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        task.cancel()
+
+def create_asgi_app(config_name=None):
+    """Build the Flask app with app.create_app(config_name) and wrap it for an ASGI server"""
+    return AsyncApp(views.create_app(config_name))
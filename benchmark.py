@@ -0,0 +1,1002 @@
+# benchmark.py - Reproducible load test for the Route Venture API
+#
+#   python benchmark.py --users 2000 --events 500 --enrollments 20000 --clients 8 --duration 20
+#   python benchmark.py --mode wsgi --save-baseline benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json    # exits 1 on a regression
+#   python benchmark.py --mix writes --clients 200 --rate 4000 --admission off   # overload
+#   python benchmark.py --mode asgi --clients 256 --idle-streams 2000             # needs uvicorn
+#   python benchmark.py --scenario history --history-events 1000000               # archive
+#   python benchmark.py --scenario enroll-stress --clients 32                     # exits 1 if overbooked
+#   python benchmark.py --scenario write-queue --duration 10                      # queue off vs on
+#   python benchmark.py --scenario startup --startup-runs 15                      # cold start and RSS
+#   python benchmark.py --scenario static                                         # pages with the asset pipeline
+#   python benchmark.py --scenario pool --clients 1                               # vs connect per call
+#   python benchmark.py --scenario qr --qr-iterations 200                         # cold vs warm QR codes
+#   python benchmark.py --scenario import --import-rows 5000                      # bulk vs one per request
+#   python benchmark.py --scenario export --events 100000                         # streamed vs buffered
+
+import atexit
+import gzip
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import click
+
+import database as db
+
+# Weighted traffic mix: (label, weight, request builder). Builders get the
+# client's Random and the seeded scale and return (method, path, json body).
+TRAFFIC_MIX = [
+    ('browse events', 30, lambda rng, s: ('GET', '/api/events?limit=30', None)),
+    ('browse by type', 10, lambda rng, s: ('GET', f"/api/events?limit=30&event_type={rng.choice(EVENT_TYPES)}", None)),
+    ('event detail', 15, lambda rng, s: ('GET', f"/api/event/{rng.randint(1, s['events'])}", None)),
+    ('event roster', 8, lambda rng, s: ('GET', f"/api/event/{rng.randint(1, s['events'])}/enrollments", None)),
+    ('user enrollments', 5, lambda rng, s: ('GET', f"/api/user/{rng.randint(1, s['users'])}/enrollments", None)),
+    ('enroll', 10, lambda rng, s: ('POST', '/api/enroll', {
+        'event_id': rng.randint(1, s['events']), 'user_id': rng.randint(1, s['users']), 'waitlist': rng.random() < 0.3})),
+    ('unenroll', 4, lambda rng, s: ('POST', '/api/unenroll', {
+        'event_id': rng.randint(1, s['events']), 'user_id': rng.randint(1, s['users'])})),
+    ('admin stats', 10, lambda rng, s: ('GET', '/api/admin/stats', None)),
+    ('qr code', 8, lambda rng, s: ('GET', f"/api/event/{rng.randint(1, s['events'])}/qrcode", None)),
+]
+
+# Signup burst that only writes, for overload tests of the admission control
+WRITE_MIX = [
+    ('enroll', 50, lambda rng, s: ('POST', '/api/enroll', {
+        'event_id': rng.randint(1, s['events']), 'user_id': rng.randint(1, s['users']), 'waitlist': rng.random() < 0.3})),
+    ('unenroll', 30, lambda rng, s: ('POST', '/api/unenroll', {
+        'event_id': rng.randint(1, s['events']), 'user_id': rng.randint(1, s['users'])})),
+    ('add user', 20, lambda rng, s: ('POST', '/api/user/add', {
+        'name': 'Load Test', 'email': f'load{rng.getrandbits(48)}@example.com'})),
+]
+
+# Signups and cancellations racing for the last seats of a few events
+STRESS_EVENTS = 20
+STRESS_USERS = 400
+ENROLL_STRESS_MIX = [
+    ('enroll', 70, lambda rng, s: ('POST', '/api/enroll', {
+        'event_id': rng.randint(1, min(s['events'], STRESS_EVENTS)),
+        'user_id': rng.randint(1, min(s['users'], STRESS_USERS)), 'waitlist': rng.random() < 0.3})),
+    ('unenroll', 30, lambda rng, s: ('POST', '/api/unenroll', {
+        'event_id': rng.randint(1, min(s['events'], STRESS_EVENTS)),
+        'user_id': rng.randint(1, min(s['users'], STRESS_USERS))})),
+]
+
+MIXES = {'browse': TRAFFIC_MIX, 'writes': WRITE_MIX}
+
+EVENT_TYPES = ('hiking', 'camping', 'cleanup', 'biking', 'other')
+PERCENTILES = (50, 95, 99)
+
+# ==================== SEEDING ====================
+
+def seed_database(path, users, events, enrollments, seed):
+    """Create a fresh database at path with a deterministic synthetic data set"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    db.DATABASE_NAME = path
+    conn = db._connect()
+    db.init_db(conn)
+
+    conn.executemany('INSERT INTO users (name, email) VALUES (?, ?)',
+                     [(f'Hiker {i}', f'hiker{i}@example.com') for i in range(1, users + 1)])
+    conn.executemany('''
+        INSERT INTO events (title, description, event_type, location, event_date, event_time, max_participants, created_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'Event {i}', 'Synthetic benchmark event', rng.choice(EVENT_TYPES), f'Trailhead {i % 50}',
+           f'{rng.randint(2025, 2028)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', '09:00',
+           rng.choice((None, 20, 50, 100)), rng.randint(1, users)) for i in range(1, events + 1)])
+    conn.commit()
+    conn.close()
+
+    # Enrollments go through the importer so event capacity and counters are honoured
+    records = ({'event_id': rng.randint(1, events), 'user_id': rng.randint(1, users)} for _ in range(enrollments))
+    enrolled, _ = db.import_enrollments(records)
+    db.close_all_connections()
+    return enrolled
+
+# ==================== CLIENTS ====================
+
+class InProcessClient:
+    """Sends requests through the Flask test client, without any socket, from its own client address"""
+
+    def __init__(self, app, address='127.0.0.1'):
+        self.client = app.test_client()
+        self.address = address
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body, environ_base={'REMOTE_ADDR': self.address})
+        response.get_data()
+        response.close()
+        return response.status_code
+
+class HTTPClient:
+    """Sends requests over one keep-alive HTTP connection to a local server"""
+
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, method, path, body):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.connection.request(method, path, payload, headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+def start_wsgi_server(app):
+    """Serve app from a threaded werkzeug server on a free local port"""
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port
+
+def start_asgi_server(app):
+    """Serve app through asgi.py from uvicorn on a free local port"""
+    import uvicorn
+    from asgi import AsyncApp
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    asgi_app = AsyncApp(app)
+    # Without lifespan events the QR render processes are stopped at exit instead
+    atexit.register(asgi_app.close)
+    server = uvicorn.Server(uvicorn.Config(asgi_app, log_level='error', lifespan='off', backlog=4096))
+    threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return sock.getsockname()[1]
+
+def open_idle_streams(host, port, count):
+    """
+    Open count live seat count streams that stay idle for the rest of the run,
+    the way browsers left open on the enroll page would. Returns the sockets
+    of the streams that were accepted.
+    """
+    streams = []
+    for _ in range(count):
+        sock = socket.create_connection((host, port), timeout=30)
+        sock.sendall(b'GET /api/events/stream HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        if sock.recv(64).startswith(b'HTTP/1.1 200'):
+            streams.append(sock)
+        else:
+            sock.close()
+    return streams
+
+def load_replay(path):
+    """
+    Read a request log with one {"method", "path", "json"} object per line.
+    Lines that are not HTTP requests are skipped, so the result may be empty.
+    """
+    replay = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get('path'), str) and entry['path'].startswith('/'):
+                method = entry.get('method', 'GET').upper()
+                replay.append((f"{method} {entry['path'].split('?')[0]}", method, entry['path'], entry.get('json')))
+    return replay
+
+# ==================== LOAD GENERATION ====================
+
+def run_load(make_client, scale, clients, duration, requests_per_client, seed, replay=None, mix=TRAFFIC_MIX,
+             rate=None):
+    """
+    Drive the API from several client threads and return
+    ({label: [(latency seconds, status), ...]}, wall clock seconds).
+    Without rate each client sends its next request as soon as the previous
+    one is answered. With rate the clients send rate requests per second
+    between them on a fixed schedule, however slow the answers are, and
+    latency counts from the scheduled send time, so time spent queueing
+    behind a slow server is included.
+    """
+    labels = [label for label, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    builders = {label: build for label, _, build in mix}
+    interval = clients / rate if rate else None
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = make_client(index)
+        local = defaultdict(list)
+        start_barrier.wait()
+        began = time.perf_counter()
+        deadline = began + duration if duration else None
+        sent = 0
+        while True:
+            scheduled = None
+            if interval is not None:
+                # Spread the clients' schedules evenly over one interval
+                scheduled = began + (sent + index / clients) * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if deadline is not None and (scheduled or time.perf_counter()) >= deadline:
+                break
+            if deadline is None and sent >= requests_per_client:
+                break
+            if replay:
+                label, method, path, body = replay[(index + sent * clients) % len(replay)]
+            else:
+                label = rng.choices(labels, weights)[0]
+                method, path, body = builders[label](rng, scale)
+            started = scheduled or time.perf_counter()
+            try:
+                status = client.request(method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = 599
+            local[label].append((time.perf_counter() - started, status))
+            sent += 1
+        with lock:
+            for label, values in local.items():
+                samples[label].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(samples, elapsed):
+    """Per-endpoint and overall throughput, error counts and latency percentiles in ms"""
+    summary = {}
+    everything = []
+    for label, values in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in values)
+        everything.extend(latencies)
+        summary[label] = {
+            'requests': len(values),
+            'errors': sum(1 for _, status in values if status >= 500 and status != 503),
+            # Turned away by admission control with Retry-After
+            'rejected': sum(1 for _, status in values if status in (429, 503)),
+            'rps': round(len(values) / elapsed, 1),
+            **{f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 2) for pct in PERCENTILES},
+        }
+    everything.sort()
+    summary['TOTAL'] = {
+        'requests': len(everything),
+        'errors': sum(entry['errors'] for entry in summary.values()),
+        'rejected': sum(entry['rejected'] for entry in summary.values()),
+        'rps': round(len(everything) / elapsed, 1),
+        **{f'p{pct}_ms': round(percentile(everything, pct) * 1000, 2) for pct in PERCENTILES},
+    }
+    return summary
+
+def compare(summary, baseline, tolerance):
+    """
+    Return (label, metric, baseline value, current value) for every endpoint
+    whose p95 grew or whose throughput fell by more than tolerance.
+    """
+    regressions = []
+    for label, base in baseline['results'].items():
+        current = summary.get(label)
+        if current is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance) and current['p95_ms'] - base['p95_ms'] > 0.5:
+            regressions.append((label, 'p95_ms', base['p95_ms'], current['p95_ms']))
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append((label, 'rps', base['rps'], current['rps']))
+    return regressions
+
+def print_summary(summary, baseline=None):
+    header = f"{'endpoint':<18}{'reqs':>8}{'err':>6}{'rej':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    if baseline:
+        header += f"{'base p95':>10}{'base rps':>10}"
+    click.echo(header)
+    for label, row in summary.items():
+        line = (f"{label:<18}{row['requests']:>8}{row['errors']:>6}{row.get('rejected', 0):>7}{row['rps']:>9}"
+                f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+        base = baseline['results'].get(label) if baseline else None
+        if base:
+            line += f"{base['p95_ms']:>10}{base['rps']:>10}"
+        click.echo(line)
+
+# ==================== SCENARIOS ====================
+
+# Past events added by the history scenario are dated before this, so they
+# can be archived without touching the seeded current events
+HISTORY_BEFORE = '2020-01-01'
+
+def seed_history(path, events, enrollments_per_event, users, seed, batch_size=10000):
+    """
+    Add `events` past events to the database at path, each with up to
+    enrollments_per_event enrollments, the way years of finished events pile
+    up in the live tables. Returns the number of rows added.
+    """
+    rng = random.Random(seed)
+    per_event = min(enrollments_per_event, users)
+    conn = sqlite3.connect(path)
+    # Past the AUTOINCREMENT sequence, so no id of a deleted event is reused
+    first = conn.execute('''
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'events'), 0), COALESCE(MAX(id), 0)) + 1
+        FROM events
+    ''').fetchone()[0]
+    for start in range(first, first + events, batch_size):
+        ids = range(start, min(start + batch_size, first + events))
+        conn.executemany('''
+            INSERT INTO events (id, title, description, event_type, location, event_date, event_time,
+                                max_participants, created_by)
+            VALUES (?, ?, 'Synthetic past event', ?, ?, ?, '09:00', NULL, ?)
+        ''', [(i, f'Past event {i}', rng.choice(EVENT_TYPES), f'Trailhead {i % 50}',
+               f'{rng.randint(2005, 2019)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+               rng.randint(1, users)) for i in ids])
+        conn.executemany('INSERT INTO enrollments (event_id, user_id) VALUES (?, ?)',
+                         [(i, user) for i in ids for user in rng.sample(range(1, users + 1), per_event)])
+        conn.commit()
+    conn.close()
+    return events * (1 + per_event)
+
+def run_history(app, db_path, events, enrollments_per_event, users, seed, load):
+    """
+    Run load() three times: before any history, with `events` past events in
+    the live tables, and after archive_events() has moved them out. Returns
+    {phase: summary}, so the hot paths can be compared as history grows.
+    """
+    phases = {'no history': load()}
+
+    started = time.perf_counter()
+    rows = seed_history(db_path, events, enrollments_per_event, users, seed)
+    click.echo(f'Added {rows} past event and enrollment rows in {time.perf_counter() - started:.1f}s')
+    with app.app_context():
+        # As the periodic job would; the cached responses predate rows written behind the app's back
+        db.optimize_database()
+        db._notify_write('*')
+    phases['history live'] = load()
+
+    with app.app_context():
+        started = time.perf_counter()
+        moved, _ = db.archive_events(HISTORY_BEFORE)
+        seconds = time.perf_counter() - started
+        db.optimize_database()
+    click.echo(f'Archived {moved} events in {seconds:.1f}s ({moved / seconds:.0f} events/s)')
+    phases['history archived'] = load()
+    return phases
+
+def run_enroll_stress(app, db_path, seats, load):
+    """
+    Leave `seats` free seats on each of the first STRESS_EVENTS events, race
+    ENROLL_STRESS_MIX for them with load(samples=True), then check every event
+    against its capacity and every counter against a recount.
+    Returns (summary, enrollments per second, [problem, ...]).
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute('UPDATE events SET max_participants = enrolled_count + ? WHERE id <= ?', (seats, STRESS_EVENTS))
+    conn.commit()
+    conn.close()
+    with app.app_context():
+        db._notify_write('*')
+
+    samples, elapsed = load(samples=True)
+    enrolled = sum(1 for _, status in samples.get('enroll', ()) if status == 201)
+
+    problems = []
+    conn = sqlite3.connect(db_path)
+    for event_id, counter, actual, capacity in conn.execute('''
+        SELECT e.id, e.enrolled_count, COUNT(en.id), e.max_participants
+        FROM events e
+        LEFT JOIN enrollments en ON en.event_id = e.id
+        GROUP BY e.id
+        HAVING e.enrolled_count != COUNT(en.id) OR COUNT(en.id) > e.max_participants
+    '''):
+        if capacity is not None and actual > capacity:
+            problems.append(f'event {event_id} is overbooked: {actual} enrollments for {capacity} seats')
+        if counter != actual:
+            problems.append(f'event {event_id} enrolled_count drifted: {counter} stored, {actual} enrolled')
+    conn.close()
+    with app.app_context():
+        for name, values in db.reconcile_stats(fix=False).items():
+            problems.append(f"stats counter {name} drifted: {values['stored']} stored, {values['actual']} actual")
+    return summarize(samples, elapsed), enrolled / elapsed, problems
+
+@contextmanager
+def connect_per_call():
+    """
+    Stand in for the connection handling before the pool: every
+    get_db_connection() and every write opens a plain connection of its own,
+    closed again once the caller drops it.
+    """
+    def connect():
+        conn = sqlite3.connect(db.DATABASE_NAME, timeout=db.BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=db._TimedConnection)
+        conn.row_factory = sqlite3.Row
+        conn.has_archive = False
+        return conn
+
+    pooled = db.get_db_connection, db._writer_connection
+    db.get_db_connection = db._writer_connection = connect
+    try:
+        yield
+    finally:
+        db.get_db_connection, db._writer_connection = pooled
+
+def run_pool(app, events, load):
+    """
+    Run load() with the connection pool, then again connecting per call.
+    Returns {phase: summary}. The QR codes are rendered up front, so neither
+    phase pays for filling the QR cache.
+    """
+    from app import prerender_qr_codes
+    with app.app_context():
+        prerender_qr_codes(range(1, events + 1))
+    phases = {'pool': load()}
+    with connect_per_call():
+        phases['connect per call'] = load()
+    return phases
+
+def run_qr(app, events, iterations):
+    """
+    Time QR codes cold and warm, in-process: a render against a cache hit,
+    and GET /api/event/<id>/qrcode with the event's images dropped from the
+    cache first, served from the cache, and revalidated with If-None-Match.
+    Returns a summary like summarize().
+    """
+    from app import event_enroll_url, qr_cache
+    from qr_codes import render_qr_png
+    client = app.test_client()
+    samples = defaultdict(list)
+
+    def timed(label, call):
+        started = time.perf_counter()
+        result = call()
+        samples[label].append((time.perf_counter() - started, getattr(result, 'status_code', 200)))
+        return result
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        event_id = i % events + 1
+        path = f'/api/event/{event_id}/qrcode'
+        url = event_enroll_url(event_id)
+        timed('render (cold)', lambda: render_qr_png(url))
+        qr_cache.invalidate(event_id)
+        timed('GET cold', lambda: client.get(path))
+        timed('cache hit (warm)', lambda: qr_cache.get(event_id, url))
+        etag = timed('GET warm', lambda: client.get(path)).headers['ETag']
+        timed('GET 304', lambda: client.get(path, headers={'If-None-Match': etag}))
+    return summarize(samples, time.perf_counter() - started)
+
+def run_import(app, users, events, rows, seed):
+    """
+    Add `rows` users and `rows` enrollments through the bulk JSONL import, and
+    as many again one request at a time through /api/user/add and /api/enroll.
+    Returns {kind: {rows, bulk / single rows per second, accepted rows}}.
+    """
+    rng = random.Random(seed)
+    client = app.test_client()
+    pairs = [divmod(pair, users) for pair in rng.sample(range(events * users), 2 * rows)]
+    records = {
+        'users': ([{'name': 'Bulk Hiker', 'email': f'bulk{i}@example.com'} for i in range(rows)],
+                  [{'name': 'Single Hiker', 'email': f'single{i}@example.com'} for i in range(rows)]),
+        'enrollments': ([{'event_id': event + 1, 'user_id': user + 1} for event, user in pairs[:rows]],
+                        [{'event_id': event + 1, 'user_id': user + 1} for event, user in pairs[rows:]]),
+    }
+    single_paths = {'users': '/api/user/add', 'enrollments': '/api/enroll'}
+
+    results = {}
+    for kind, (bulk, single) in records.items():
+        body = ''.join(json.dumps(record) + '\n' for record in bulk)
+        started = time.perf_counter()
+        response = client.post(f'/api/{kind}/import', data=body, content_type='application/x-ndjson')
+        bulk_seconds = time.perf_counter() - started
+
+        accepted = 0
+        started = time.perf_counter()
+        for record in single:
+            accepted += client.post(single_paths[kind], json=record).status_code == 201
+        single_seconds = time.perf_counter() - started
+        results[kind] = {
+            'rows': rows,
+            'bulk_rows_per_s': round(rows / bulk_seconds, 1),
+            'bulk_accepted': response.get_json()['imported'],
+            'single_rows_per_s': round(rows / single_seconds, 1),
+            'single_accepted': accepted,
+        }
+    return results
+
+def print_import(results):
+    click.echo(f"{'rows':<14}{'count':>8}{'bulk rows/s':>14}{'accepted':>10}{'single rows/s':>16}{'accepted':>10}"
+               f"{'speedup':>9}")
+    for kind, row in results.items():
+        click.echo(f"{kind:<14}{row['rows']:>8}{row['bulk_rows_per_s']:>14}{row['bulk_accepted']:>10}"
+                   f"{row['single_rows_per_s']:>16}{row['single_accepted']:>10}"
+                   f"{row['bulk_rows_per_s'] / row['single_rows_per_s']:>8.1f}x")
+
+# The full event list, built in memory by jsonify() or streamed from the cursor
+EXPORT_PATHS = {
+    'buffered JSON': '/api/events',
+    'streamed JSON': '/api/events?stream=1',
+    'streamed NDJSON': '/api/events?format=ndjson',
+}
+
+def measure_export(db_path, path, results):
+    """
+    Child process of run_export(): fetch path once through a fresh app and put
+    (seconds, seconds to the first chunk, body bytes, peak RSS, growth of the
+    peak RSS during the request) on results, sizes in bytes.
+    """
+    import resource
+    from app import create_app
+    app = create_app(DATABASE_NAME=db_path, JOBS_ENABLED=False)
+    client = app.test_client()
+    client.get('/api/event/1')  # Imports and database connections are not part of the measurement
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if platform.system() == 'Darwin' else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    first_chunk = None
+    size = 0
+    response = client.get(path)
+    for chunk in response.iter_encoded():
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((seconds, first_chunk or seconds, size, after * unit, (after - peak) * unit))
+
+def run_export(db_path, repeats):
+    """
+    Fetch every path in EXPORT_PATHS `repeats` times, each in a new process so
+    its peak RSS is its own. Returns {label: {seconds, first chunk, MB, peak
+    RSS and its growth during the request in MiB}} with the median times and
+    the largest memory figures.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for label, path in EXPORT_PATHS.items():
+        runs = []
+        for _ in range(repeats):
+            queue = context.Queue()
+            process = context.Process(target=measure_export, args=(db_path, path, queue))
+            process.start()
+            runs.append(queue.get())
+            process.join()
+        runs.sort()
+        seconds, _, size, _, _ = runs[len(runs) // 2]
+        results[label] = {
+            'seconds': round(seconds, 3),
+            'first_chunk_s': round(sorted(run[1] for run in runs)[len(runs) // 2], 3),
+            'mb': round(size / 1e6, 1),
+            'peak_rss_mib': round(max(run[3] for run in runs) / 2 ** 20, 1),
+            'peak_rss_growth_mib': round(max(run[4] for run in runs) / 2 ** 20, 1),
+        }
+    return results
+
+def print_export(results):
+    click.echo(f"{'response':<18}{'seconds':>10}{'first chunk':>13}{'MB':>8}{'peak RSS MiB':>14}{'growth':>9}")
+    for label, row in results.items():
+        click.echo(f"{label:<18}{row['seconds']:>10}{row['first_chunk_s']:>13}{row['mb']:>8}"
+                   f"{row['peak_rss_mib']:>14}{row['peak_rss_growth_mib']:>9}")
+
+# Uncontended signups and cancellations spread over every event
+WRITE_QUEUE_MIX = [entry for entry in WRITE_MIX if entry[0] in ('enroll', 'unenroll')]
+WRITE_QUEUE_CLIENTS = (1, 8, 64)
+
+def run_write_queue(create_app, overrides, serve, scale, duration, requests_per_client, seed):
+    """
+    Run WRITE_QUEUE_MIX at each of WRITE_QUEUE_CLIENTS with the enrollment
+    write queue off, then on, each time on a newly created app. Capacities
+    are lifted first, so events filling up during earlier runs do not lower
+    the enrollment rate of later ones. Returns {'queue off' or 'queue on':
+    {clients: {enrollments/s, writes/s, rejected, p95}}}.
+    """
+    conn = sqlite3.connect(overrides['DATABASE_NAME'])
+    conn.execute('UPDATE events SET max_participants = NULL')
+    conn.commit()
+    conn.close()
+    results = {}
+    for enabled in (False, True):
+        _, make_client = serve(create_app(**overrides, WRITE_QUEUE_ENABLED=enabled))
+        phase = results['queue on' if enabled else 'queue off'] = {}
+        for clients in WRITE_QUEUE_CLIENTS:
+            # A seed of its own, or the run would repeat signups an earlier one already made
+            seed += 1000
+            samples, elapsed = run_load(make_client, scale, clients, duration, requests_per_client, seed,
+                                        mix=WRITE_QUEUE_MIX)
+            summary = summarize(samples, elapsed)
+            phase[clients] = {
+                'enrollments_per_s': round(sum(1 for _, status in samples['enroll'] if status == 201) / elapsed, 1),
+                'writes_per_s': summary['TOTAL']['rps'],
+                'rejected': summary['TOTAL']['rejected'],
+                'p95_ms': summary['TOTAL']['p95_ms'],
+            }
+    return results
+
+def print_write_queue(results):
+    click.echo(f"{'clients':<9}" + ''.join(f"{name + ' enrolled/s':>22}{'writes/s':>10}{'rej':>7}{'p95 ms':>9}"
+                                            for name in results))
+    for clients in WRITE_QUEUE_CLIENTS:
+        rows = [phase[clients] for phase in results.values()]
+        click.echo(f'{clients:<9}' + ''.join(f"{row['enrollments_per_s']:>22}{row['writes_per_s']:>10}"
+                                             f"{row['rejected']:>7}{row['p95_ms']:>9}" for row in rows))
+
+# Run by each process of the startup scenario: import the app, build it and
+# answer one request, the way a freshly forked worker does. The old style
+# stands in for the module-level app this replaced, which imported qrcode and
+# Pillow up front and ran the CREATE TABLE pass on every start.
+STARTUP_CODE = '''
+import json, platform, resource, sys, time
+started = time.perf_counter()
+old_style = sys.argv[2] == 'old'
+if old_style:
+    import qrcode, PIL.Image
+import database as db
+from app import create_app
+app = create_app(DATABASE_NAME=sys.argv[1], JOBS_ENABLED=False)
+if old_style:
+    with app.app_context():
+        db.init_db()
+status = app.test_client().get('/api/events').status_code
+seconds = time.perf_counter() - started
+unit = 1 if platform.system() == 'Darwin' else 1024
+print(json.dumps({'status': status, 'seconds': seconds,
+                  'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit}))
+'''
+STARTUP_LOCK_SECONDS = 2.0
+
+def start_worker(db_path, style):
+    """Time STARTUP_CODE in a new interpreter; returns (seconds, max RSS in bytes)"""
+    result = subprocess.run([sys.executable, '-c', STARTUP_CODE, db_path, style], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise click.ClickException(f'{style} worker failed to start:\n{result.stderr}')
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    return measured['seconds'], measured['rss']
+
+def run_startup(db_path, runs):
+    """
+    Start `runs` fresh worker processes in each style, first on an idle
+    database, then while another connection holds the write lock for
+    STARTUP_LOCK_SECONDS, as during another worker's long write. Returns
+    {phase: {median seconds, median max RSS in MiB}}.
+    """
+    results = {}
+    for locked in (False, True):
+        for style in ('factory', 'old'):
+            measured = []
+            for _ in range(runs):
+                holder = None
+                if locked:
+                    holder = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+                    holder.execute('BEGIN IMMEDIATE')
+                    threading.Timer(STARTUP_LOCK_SECONDS, holder.rollback).start()
+                measured.append(start_worker(db_path, style))
+                if holder is not None:
+                    time.sleep(max(0.0, STARTUP_LOCK_SECONDS - measured[-1][0]))
+                    holder.close()
+            seconds = sorted(run[0] for run in measured)[runs // 2]
+            rss = sorted(run[1] for run in measured)[runs // 2]
+            name = 'create_app()' if style == 'factory' else 'old module-level app'
+            results[name + (', write lock held' if locked else '')] = {
+                'seconds': round(seconds, 3), 'max_rss_mib': round(rss / 2 ** 20, 1)}
+    return results
+
+def print_startup(results):
+    click.echo(f"{'worker start':<40}{'import + first request s':>26}{'max RSS MiB':>13}")
+    for name, row in results.items():
+        click.echo(f"{name:<40}{row['seconds']:>26}{row['max_rss_mib']:>13}")
+
+# Pages a browser opens, and the local assets they link to. The Bootstrap
+# files come from a CDN and are left out, as the pipeline does not serve them.
+STATIC_PAGES = ('/', '/enroll', '/create', '/admin', '/contact')
+STATIC_LINK = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+def decoded_body(response):
+    """The page's HTML, whatever encoding it was sent with"""
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        return gzip.decompress(response.data).decode()
+    if encoding == 'br':
+        import brotli
+        return brotli.decompress(response.data).decode()
+    return response.get_data(as_text=True)
+
+def visit_page(client, path, cache):
+    """
+    Load a page and its local assets the way a browser does: reuse fresh
+    cached copies without asking, revalidate stale ones with If-None-Match or
+    If-Modified-Since. `cache` maps URL to the last 200 and carries over to
+    the next visit. Returns (requests, bytes received).
+    """
+    requests = received = 0
+
+    def fetch(url):
+        nonlocal requests, received
+        cached = cache.get(url)
+        if cached is not None and cached['fresh']:
+            return cached['response']
+        headers = {'Accept-Encoding': 'gzip, br'}
+        if cached is not None and cached['response'].headers.get('ETag'):
+            headers['If-None-Match'] = cached['response'].headers['ETag']
+        if cached is not None and cached['response'].headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = cached['response'].headers['Last-Modified']
+        response = client.get(url, headers=headers)
+        requests += 1
+        received += len(response.data)
+        if response.status_code == 304:
+            return cached['response']
+        fresh = response.cache_control.immutable or (response.cache_control.max_age or 0) > 0
+        cache[url] = {'response': response, 'fresh': fresh}
+        return response
+
+    for asset in STATIC_LINK.findall(decoded_body(fetch(path))):
+        fetch(asset)
+    return requests, received
+
+def run_static(create_app, overrides):
+    """
+    Open every page in STATIC_PAGES twice, as a first and a repeat visit
+    from the same browser, with STATIC_PIPELINE off and on. Returns
+    {setting: {page: {first/repeat requests and bytes}}}, with a total row.
+    """
+    results = {}
+    for enabled in (False, True):
+        client = create_app(**overrides, STATIC_PIPELINE=enabled).test_client()
+        pages = {}
+        for path in STATIC_PAGES:
+            cache = {}
+            first = visit_page(client, path, cache)
+            repeat = visit_page(client, path, cache)
+            pages[path] = {'first_requests': first[0], 'first_bytes': first[1],
+                           'repeat_requests': repeat[0], 'repeat_bytes': repeat[1]}
+        pages['total'] = {key: sum(page[key] for page in pages.values()) for key in pages[STATIC_PAGES[0]]}
+        results['pipeline on' if enabled else 'pipeline off'] = pages
+    return results
+
+def print_static(results):
+    click.echo(f"{'':<12}{'first visit':>38}{'repeat visit':>38}")
+    click.echo(f"{'page':<12}" + f"{'off req':>10}{'off bytes':>10}{'on req':>8}{'on bytes':>10}" * 2)
+    off, on = results['pipeline off'], results['pipeline on']
+    for page in off:
+        row = ''
+        for visit in ('first', 'repeat'):
+            row += (f"{off[page][visit + '_requests']:>10}{off[page][visit + '_bytes']:>10}"
+                    f"{on[page][visit + '_requests']:>8}{on[page][visit + '_bytes']:>10}")
+        click.echo(f'{page:<12}{row}')
+
+def print_phases(phases):
+    """One row per endpoint with its p50 / p95 latency in each phase, then the total requests per second"""
+    click.echo(f"{'endpoint':<18}" + ''.join(f'{name:>26}' for name in phases))
+    first = next(iter(phases.values()))
+    for label in first:
+        cells = []
+        for summary in phases.values():
+            row = summary.get(label)
+            cells.append(f"{row['p50_ms']:.2f} / {row['p95_ms']:.2f}" if row else '-')
+        click.echo(f'{label:<18}' + ''.join(f'{cell:>26}' for cell in cells))
+    click.echo(f"{'requests/s':<18}" + ''.join(f"{summary['TOTAL']['rps']:>26}" for summary in phases.values()))
+
+# ==================== COMMAND LINE ====================
+
+@click.command()
+@click.option('--scenario',
+              type=click.Choice(['load', 'history', 'enroll-stress', 'write-queue', 'startup', 'static', 'pool',
+                                 'qr', 'import', 'export']),
+              default='load', show_default=True,
+              help='load: run the traffic mix once. history: run it before and after adding '
+                   '--history-events past events, then again once they are archived. enroll-stress: '
+                   'race signups for --stress-seats seats per event and fail if any event is overbooked '
+                   'or any counter drifted. write-queue: run enrolls and unenrolls at 1, 8 and 64 clients '
+                   'with the enrollment write queue off and on. startup: time import plus first request '
+                   'and the max RSS of fresh worker processes. static: requests and bytes for each page and its '
+                   'assets with the static pipeline off and on. pool: run the mix with the connection pool, '
+                   'then opening a connection per call, with the response cache off. qr: time --qr-iterations QR codes '
+                   'rendered cold, served from the cache, and revalidated. import: add --import-rows '
+                   'users and enrollments through the bulk import and through the single-row API. export: '
+                   'fetch the full event list buffered and streamed, each in its own process, and report '
+                   'latency and peak RSS.')
+@click.option('--db', 'db_path', help='Database file to seed (default: a temporary file).')
+@click.option('--users', default=2000, show_default=True)
+@click.option('--events', default=500, show_default=True)
+@click.option('--enrollments', default=20000, show_default=True)
+@click.option('--reuse-db', is_flag=True, help='Benchmark an existing --db without reseeding it.')
+@click.option('--history-events', default=1000000, show_default=True, help='Past events added by --scenario history.')
+@click.option('--history-enrollments', default=2, show_default=True, help='Enrollments per past event.')
+@click.option('--stress-seats', default=10, show_default=True,
+              help='Free seats left on each contended event by --scenario enroll-stress.')
+@click.option('--startup-runs', default=15, show_default=True, help='Processes per setting in --scenario startup.')
+@click.option('--qr-iterations', default=200, show_default=True, help='QR codes timed by --scenario qr.')
+@click.option('--import-rows', default=5000, show_default=True, help='Rows of each kind added by --scenario import.')
+@click.option('--export-repeats', default=3, show_default=True, help='Runs per response in --scenario export.')
+@click.option('--mode', type=click.Choice(['inprocess', 'wsgi', 'asgi']), default='inprocess', show_default=True,
+              help='Flask test client, or HTTP against a threaded local werkzeug server or uvicorn '
+                   'running asgi.py.')
+@click.option('--idle-streams', default=0, show_default=True,
+              help='Live seat count streams held open during the run (wsgi, asgi and --url).')
+@click.option('--url', help='Benchmark an already running server (host:port) instead of starting one.')
+@click.option('--clients', default=8, show_default=True, help='Concurrent client threads.')
+@click.option('--duration', default=15.0, show_default=True, help='Seconds to run; 0 to use --requests.')
+@click.option('--requests', 'requests_per_client', default=500, show_default=True,
+              help='Requests per client when --duration is 0.')
+@click.option('--rate', type=float, help='Send this many requests per second in total on a fixed schedule '
+              '(open loop) instead of as fast as the answers come back.')
+@click.option('--mix', type=click.Choice(sorted(MIXES)), default='browse', show_default=True,
+              help='Traffic mix: the realistic browse mix, or a burst of writes only.')
+@click.option('--admission', type=click.Choice(['off', 'gates', 'full']), default='gates', show_default=True,
+              help='Admission control: none, the per-worker concurrency gates, or gates plus per-client '
+                   'rate limits (each client thread has its own address in-process).')
+@click.option('--replay', type=click.Path(exists=True),
+              help='JSONL request log ({"method", "path", "json"} per line) to replay instead of the mix.')
+@click.option('--seed', default=42, show_default=True)
+@click.option('--output', type=click.Path(), help='Write the results as JSON.')
+@click.option('--save-baseline', type=click.Path(), help='Store the results as the new baseline.')
+@click.option('--baseline', type=click.Path(exists=True), help='Compare against a stored baseline.')
+@click.option('--tolerance', default=0.5, show_default=True, help='Allowed relative regression.')
+def main(scenario, db_path, users, events, enrollments, reuse_db, history_events, history_enrollments,
+         stress_seats, startup_runs, qr_iterations, import_rows, export_repeats, mode, idle_streams, url, clients,
+         duration, requests_per_client, rate, mix, admission, replay, seed, output, save_baseline, baseline, tolerance):
+    """Seed a synthetic database, replay a realistic traffic mix and report latency percentiles"""
+    scale = {'users': users, 'events': events, 'enrollments': enrollments}
+    if scenario == 'history':
+        scale.update(history_events=history_events, history_enrollments=history_enrollments)
+    if scenario == 'qr':
+        scale.update(qr_iterations=qr_iterations)
+    if scenario == 'import':
+        scale.update(import_rows=import_rows)
+    if scenario == 'export':
+        scale.update(export_repeats=export_repeats)
+    if scenario == 'enroll-stress':
+        scale.update(stress_seats=stress_seats)
+        mix = 'enroll-stress'
+    replay_requests = None
+    if replay:
+        replay_requests = load_replay(replay)
+        if not replay_requests:
+            raise click.UsageError(f'{replay} contains no HTTP requests to replay')
+    if scenario != 'load' and (url or baseline or save_baseline or replay):
+        raise click.UsageError('--url, --replay and baselines only apply to --scenario load')
+
+    host = '127.0.0.1'
+    if url:
+        host, _, port = url.rpartition(':')
+        host, port = host or '127.0.0.1', int(port)
+        make_client = lambda index: HTTPClient(host, port)
+    else:
+        if db_path is None:
+            db_path = os.path.join(tempfile.mkdtemp(prefix='route-venture-bench-'), 'route_venture.db')
+        if not reuse_db:
+            started = time.perf_counter()
+            enrolled = seed_database(db_path, users, events, enrollments, seed)
+            click.echo(f'Seeded {users} users, {events} events and {enrolled} enrollments '
+                       f'into {db_path} in {time.perf_counter() - started:.1f}s')
+
+        from app import create_app
+        # The synthetic clients send far more than any one person would, so
+        # the per-client rate limits only apply with --admission full
+        overrides = {'DATABASE_NAME': db_path, 'RATE_LIMIT_ENABLED': admission == 'full'}
+        if admission == 'off':
+            overrides['CONCURRENCY_LIMITS'] = {}
+        if scenario == 'history':
+            archive_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'archive.db')
+            if not reuse_db:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(archive_path + suffix):
+                        os.remove(archive_path + suffix)
+            overrides['ARCHIVE_DATABASE_PATH'] = archive_path
+        if scenario == 'pool':
+            # Nothing is cached, so every request reaches the database
+            overrides['RESPONSE_CACHE_MAX_BYTES'] = 0
+
+        def serve(app):
+            """Return (port or None, make_client) for app in the chosen --mode"""
+            if mode in ('wsgi', 'asgi'):
+                app.config['EVENT_STREAM_MAX_SUBSCRIBERS'] = max(app.config['EVENT_STREAM_MAX_SUBSCRIBERS'],
+                                                                 idle_streams)
+                port = start_wsgi_server(app) if mode == 'wsgi' else start_asgi_server(app)
+                return port, lambda index: HTTPClient(host, port)
+            return None, lambda index: InProcessClient(app, f'10.0.{index // 256}.{index % 256}')
+
+        app = create_app(**overrides)
+        port, make_client = serve(app)
+
+    if idle_streams and (url or mode != 'inprocess'):
+        started = time.perf_counter()
+        streams = open_idle_streams(host, port, idle_streams)
+        click.echo(f'Opened {len(streams)} of {idle_streams} idle streams in {time.perf_counter() - started:.1f}s')
+
+    def load(samples=False):
+        result = run_load(make_client, scale, clients, duration, requests_per_client, seed,
+                          replay_requests, ENROLL_STRESS_MIX if mix == 'enroll-stress' else MIXES[mix], rate)
+        return result if samples else summarize(*result)
+
+    stored = None
+    problems = []
+    if scenario == 'history':
+        summary = run_history(app, db_path, history_events, history_enrollments, users, seed, load)
+        print_phases(summary)
+    elif scenario == 'startup':
+        summary = run_startup(db_path, startup_runs)
+        print_startup(summary)
+    elif scenario == 'static':
+        summary = run_static(create_app, overrides)
+        print_static(summary)
+    elif scenario == 'write-queue':
+        summary = run_write_queue(create_app, overrides, serve, scale, duration, requests_per_client, seed)
+        print_write_queue(summary)
+    elif scenario == 'export':
+        summary = run_export(db_path, export_repeats)
+        print_export(summary)
+    elif scenario == 'import':
+        summary = run_import(app, users, events, import_rows, seed)
+        print_import(summary)
+    elif scenario == 'qr':
+        summary = run_qr(app, events, qr_iterations)
+        print_summary(summary)
+    elif scenario == 'pool':
+        summary = run_pool(app, events, load)
+        print_phases(summary)
+    elif scenario == 'enroll-stress':
+        summary, per_second, problems = run_enroll_stress(app, db_path, stress_seats, load)
+        print_summary(summary)
+        click.echo(f'{per_second:.1f} enrollments/s, {len(problems)} capacity or counter violations')
+    else:
+        summary = load()
+        if baseline:
+            with open(baseline, encoding='utf-8') as f:
+                stored = json.load(f)
+        print_summary(summary, stored)
+
+    result = {
+        'config': {'scenario': scenario, 'mode': 'remote' if url else mode, 'idle_streams': idle_streams, 'clients': clients,
+                   'duration': duration, 'rate': rate, 'mix': mix, 'admission': admission, 'seed': seed,
+                   **scale},
+        'environment': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                        'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': summary,
+    }
+    for path in (output, save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+                f.write('\n')
+
+    for problem in problems:
+        click.echo(f'VIOLATION {problem}', err=True)
+    if problems:
+        raise SystemExit(1)
+
+    if stored:
+        regressions = compare(summary, stored, tolerance)
+        for label, metric, before, after in regressions:
+            click.echo(f'REGRESSION {label}: {metric} {before} -> {after}', err=True)
+        if regressions:
+            raise SystemExit(1)
+        click.echo(f'No regressions beyond {tolerance:.0%} of the baseline')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# bulk_io.py - Streaming CSV/JSONL/JSON readers and writers for bulk import and export
+
+import csv
+import io
+import json
+
+try:
+    import orjson  # Optional faster encoder, used when installed
+except ImportError:
+    orjson = None
+
+FORMATS = ('csv', 'jsonl')
+
+def detect_format(name_or_mimetype, default='csv'):
+    """Guess csv/jsonl from a file name, extension or MIME type"""
+    value = (name_or_mimetype or '').lower()
+    if value.endswith(('.jsonl', '.ndjson', 'jsonl', 'ndjson', '/json')):
+        return 'jsonl'
+    if value.endswith(('.csv', 'csv')):
+        return 'csv'
+    return default
+
+def read_records(text_stream, fmt):
+    """
+    Yield one dict per input record without reading the whole stream.
+    CSV input needs a header row; JSONL input needs one object per line.
+    Lines that cannot be parsed are yielded as {'_error': message}.
+    """
+    if fmt == 'csv':
+        for record in csv.DictReader(text_stream):
+            yield record
+        return
+
+    for line in text_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield {'_error': f'Invalid JSON: {e}'}
+            continue
+        yield record if isinstance(record, dict) else {'_error': 'Expected a JSON object'}
+
+def write_records(columns, rows, fields, fmt):
+    """
+    Yield CSV (with header) or JSONL text chunks for an iterable of tuple rows.
+    columns names the tuple positions; only the given fields are written.
+    """
+    positions = [columns.index(field) for field in fields]
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps({field: row[i] for field, i in zip(fields, positions)}) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([row[i] for i in positions])
+        # Flush in moderately sized chunks rather than one tiny write per row
+        if buffer.tell() > 16384:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+def write_json(columns, rows, ndjson=False, chunk_size=65536):
+    """
+    Yield a JSON array (or NDJSON lines) of objects built from tuple rows,
+    in byte chunks of roughly chunk_size so each row is not its own write.
+    """
+    separator = b'\n' if ndjson else b','
+    buffer = bytearray() if ndjson else bytearray(b'[')
+    first = True
+    for row in rows:
+        if not first and not ndjson:
+            buffer += separator
+        buffer += _dumps(dict(zip(columns, row)))
+        if ndjson:
+            buffer += separator
+        first = False
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if not ndjson:
+        buffer += b']'
+    yield bytes(buffer)
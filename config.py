@@ -12,7 +12,82 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
 
     # Database settings
-    DATABASE_NAME = 'users.db'
+    DATABASE_NAME = 'route_venture.db'
+
+    # QR code cache settings
+    QR_CACHE_SIZE = 512                             # Rendered images kept in memory
+    QR_CACHE_DIR = os.environ.get('QR_CACHE_DIR')   # Optional on-disk copy, shared by workers
+    QR_CACHE_MAX_AGE = 7 * 24 * 3600                # Browser Cache-Control max-age in seconds
+    QR_RENDER_WORKERS = os.cpu_count() or 1         # Processes used for bulk QR exports
+    QR_RENDER_OFFLOAD = os.environ.get('QR_RENDER_OFFLOAD') == '1'  # Render single codes in that pool too
+
+    # API response cache settings
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')  # 'memory' or 'sqlite'
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', 'response_cache.db')  # Shared by workers with 'sqlite'
+    RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024     # Total size of cached bodies before LRU eviction
+
+    # Admission control: per-client token buckets, then per-worker concurrency gates
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # 'memory' or 'sqlite'
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', 'rate_limits.db')  # Shared by workers with 'sqlite'
+    RATE_LIMITS = {                                 # (requests per second, burst) per client address
+        'write': (5, 20),                           # Enroll, unenroll and user/event changes
+        'import': (0.1, 3),                         # Bulk CSV/JSONL imports
+        'export': (1, 10),                          # QR ZIP, roster exports and /api/batch
+        'search': (10, 30),                         # Full-text search
+    }
+    CONCURRENCY_LIMITS = {                          # Requests in flight per worker before new ones wait
+        'write': 4,
+        'import': 1,
+    }
+    CONCURRENCY_MAX_WAIT = 0.25                     # Seconds a request waits for a slot before it gets 503
+
+    # Instrumentation settings (unset to disable slow logging)
+    SLOW_REQUEST_SECONDS = float(os.environ['SLOW_REQUEST_SECONDS']) if os.environ.get('SLOW_REQUEST_SECONDS') else None
+    SLOW_QUERY_SECONDS = float(os.environ['SLOW_QUERY_SECONDS']) if os.environ.get('SLOW_QUERY_SECONDS') else None
+
+    # Analytics read snapshot settings (unset to read admin statistics from the live database)
+    READ_SNAPSHOT_PATH = os.environ.get('READ_SNAPSHOT_PATH')  # Backup copy refreshed by a background job
+    READ_SNAPSHOT_INTERVAL = 300                    # Seconds between refreshes
+
+    # Event archive settings (unset to keep every event in the live tables)
+    ARCHIVE_DATABASE_PATH = os.environ.get('ARCHIVE_DATABASE_PATH')  # Second SQLite file, attached as 'archive'
+    ARCHIVE_AFTER_DAYS = 180                        # Events dated longer ago are moved by the archive-events job
+
+    # Background job settings (intervals in seconds, None disables a job)
+    JOBS_ENABLED = os.environ.get('JOBS_ENABLED', '1') == '1'
+    JOB_WORKERS = 2                                 # Threads that run due jobs
+    JOB_INTERVALS = {
+        'warm-event-cache': 300,                    # First events page and the soonest events' responses
+        'warm-admin-stats': 60,                     # Admin statistics, including the popular events ranking
+        'prerender-qr-codes': 600,                  # QR codes of the soonest upcoming events
+        'optimize-database': 3600,                  # Sampled ANALYZE and full-text index merging
+        'checkpoint-wal': 300,                      # PRAGMA wal_checkpoint(TRUNCATE)
+        'vacuum-database': None,                    # VACUUM blocks every write while it runs
+        'archive-events': 86400,                    # Needs ARCHIVE_DATABASE_PATH
+    }
+    JOB_WARM_EVENTS = 50                            # Soonest upcoming events prepared by the warm-up jobs
+
+    # Enrollment write queue settings (write-behind with group commit, off by default)
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED') == '1'
+    WRITE_QUEUE_MAX_BATCH = 64                      # Requests committed together in one transaction
+    WRITE_QUEUE_MAX_DELAY = 0.0                     # Seconds the writer waits for a batch to fill up
+    WRITE_QUEUE_MAX_PENDING = 1024                  # Queued requests before new ones get 503
+    WRITE_QUEUE_TIMEOUT = 10.0                      # Seconds a request waits for its result
+
+    # Live seat count stream settings (/api/events/stream)
+    EVENT_STREAM_POLL_INTERVAL = 1.0                # Seconds between checks for writes by other workers
+    EVENT_STREAM_MIN_INTERVAL = 0.25                # Seconds writes are batched for before streams get them
+    EVENT_STREAM_HEARTBEAT = 15                     # Seconds between keep-alive comments on an idle stream
+    EVENT_STREAM_MAX_SECONDS = 600                  # Streams are closed after this long; browsers reconnect
+    EVENT_STREAM_MAX_SUBSCRIBERS = 1000             # Open streams per worker before new ones get 503
+
+    # ASGI serving settings (asgi.py)
+    ASGI_THREADS = 32                               # Threads running Flask routes; further requests wait on the loop
+
+    # Serve static/ under fingerprinted, immutable URLs with gzip/brotli variants and
+    # render parameterless pages once; the files are read once at startup
+    STATIC_PIPELINE = True
 
     # Server settings
     HOST = '0.0.0.0'
@@ -22,7 +97,7 @@ class Config:
 class DevelopmentConfig(Config):
     """Development environment configuration"""
     DEBUG = True
-    DATABASE_NAME = 'users_dev.db'
+    STATIC_PIPELINE = False                         # Pick up edits to static/ and templates/ without a restart
 
 class ProductionConfig(Config):
     """Production environment configuration"""
@@ -33,7 +108,9 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing environment configuration"""
     TESTING = True
-    DATABASE_NAME = 'users_test.db'
+    DATABASE_NAME = 'route_venture_test.db'
+    JOBS_ENABLED = False
+    RATE_LIMIT_ENABLED = False
 
 # Configuration dictionary
 config = {
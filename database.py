@@ -1,25 +1,640 @@
 # database.py - Updated Database operations for Route Venture
 
+import os
+import queue
+import random
+import re
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.request import pathname2url
 
 DATABASE_NAME = 'route_venture.db'
+# Past events and their enrollments are moved here by archive_events(); None disables archiving
+ARCHIVE_DATABASE_NAME = None
 
-def get_db_connection():
+# Connection pool settings
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16384
+MMAP_SIZE = 64 * 1024 * 1024
+
+# Page size limits for the paginated list queries
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Rows written per transaction by the bulk importers
+IMPORT_CHUNK_SIZE = 500
+
+# Events moved per transaction by archive_events(), together with their enrollments
+ARCHIVE_BATCH_SIZE = 200
+
+# Seconds the admin statistics are served from memory
+STATS_CACHE_TTL = 5
+
+# Write retry settings, on top of busy_timeout
+WRITE_RETRIES = 4
+WRITE_RETRY_BACKOFF = 0.05
+
+# Read-only connections, borrowed one per thread, and the single writer connection
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+_local = threading.local()
+_writer = None
+_writer_lock = threading.RLock()
+# Optional backup copy that analytics reads use instead, see enable_read_snapshots()
+_snapshot = {'path': None, 'generation': 0}
+_stats_cache = {'stats': None, 'expires': 0.0}
+_stats_lock = threading.Lock()
+
+# Callbacks told which data each committed write touched, see add_write_listener()
+_write_listeners = []
+# Callbacks told about every executed statement, see add_query_listener()
+_query_listeners = []
+
+class DatabaseBusyError(Exception):
+    """Raised when the write lock could not be acquired after all retries"""
+
+class EventNotFoundError(Exception):
+    """Raised when enrolling in an event that does not exist"""
+
+class EventFullError(Exception):
+    """
+    Raised when an event has no seats left.
+    waitlist_position is set when the user was put on the waitlist instead.
+    """
+    def __init__(self, event_id, waitlist_position=None):
+        super().__init__(f'Event {event_id} is full')
+        self.event_id = event_id
+        self.waitlist_position = waitlist_position
+
+def _notify_query(conn, sql, parameters, seconds):
+    for listener in _query_listeners:
+        listener(conn, sql, parameters, seconds)
+
+class _TimedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement and how long it took to the query listeners"""
+    
+    def execute(self, sql, parameters=()):
+        if not _query_listeners:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _notify_query(self.connection, sql, parameters, time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        if not _query_listeners:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify_query(self.connection, sql, None, time.perf_counter() - start)
+
+class _TimedConnection(sqlite3.Connection):
     """
-    Creates and returns a database connection.
-    Sets row_factory to sqlite3.Row for dictionary-like access.
+    Connection whose cursors are _TimedCursor. Connection.execute() does not
+    go through cursor() in C, so it and commit() are wrapped here as well.
     """
-    conn = sqlite3.connect(DATABASE_NAME)
+    
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def commit(self):
+        if not _query_listeners or not self.in_transaction:
+            return super().commit()
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _notify_query(self, 'COMMIT', None, time.perf_counter() - start)
+
+def add_query_listener(listener):
+    """
+    Register listener(conn, sql, parameters, seconds) to run after every
+    statement executed on a connection from this module, including COMMIT.
+    parameters is None for executemany() and COMMIT.
+    """
+    _query_listeners.append(listener)
+
+def _connect(read_only=False):
+    """
+    Opens a new connection and applies the per-connection pragmas once.
+    WAL lets readers run alongside the single writer, and synchronous=NORMAL
+    only fsyncs at checkpoints instead of on every commit. Read-only
+    connections open the file with mode=ro and query_only, so a write through
+    them fails instead of competing for the write lock.
+    """
+    if read_only:
+        uri = f'file:{pathname2url(os.path.abspath(DATABASE_NAME))}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=_TimedConnection)
+        conn.execute('PRAGMA query_only = 1')
+    else:
+        conn = sqlite3.connect(DATABASE_NAME, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=_TimedConnection)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    if ARCHIVE_DATABASE_NAME:
+        conn.execute('ATTACH DATABASE ? AS archive', (ARCHIVE_DATABASE_NAME,))
+        # journal_mode, synchronous and cache_size are per attached database
+        conn.execute(f'PRAGMA archive.cache_size = -{CACHE_SIZE_KIB}')
+        if not read_only:
+            conn.execute('PRAGMA archive.journal_mode = WAL')
+            conn.execute('PRAGMA archive.synchronous = NORMAL')
+            for statement in ARCHIVE_SCHEMA:
+                conn.execute(statement)
+    conn.has_archive = bool(ARCHIVE_DATABASE_NAME)
     return conn
 
-def init_db():
+def _writer_connection():
+    """The process's single writer connection, opened on first use. Callers hold _writer_lock."""
+    global _writer
+    if _writer is None:
+        _writer = _connect()
+    return _writer
+
+@contextmanager
+def write_connection():
     """
-    Initializes the database with required tables.
-    Creates users, events, and enrollments tables.
+    Lends out the process's single writer connection. The lock lets one
+    thread at a time write through it, so writers in this process queue here
+    rather than on SQLite's file lock. Rolls back anything left uncommitted.
+    """
+    with _writer_lock:
+        conn = _writer_connection()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+def get_db_connection():
+    """
+    Returns the read-only connection borrowed by the current thread.
+    The first call on a thread takes an idle connection from the pool (or opens
+    a new one); later calls reuse it until release_db_connection() is called.
+    Writes go through write_connection() or run_write() instead.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            # The writer creates the file and keeps its WAL open for the readers
+            with _writer_lock:
+                _writer_connection()
+            conn = _connect(read_only=True)
+        _local.conn = conn
+    return conn
+
+def get_analytics_connection():
+    """
+    Returns a read-only connection for heavy analytics queries on the current
+    thread. While enable_read_snapshots() is active it reads the latest
+    snapshot copy, reopened whenever a newer copy has been swapped in;
+    otherwise it is get_db_connection().
+    """
+    if _snapshot['path'] is None:
+        return get_db_connection()
+    generation, conn = getattr(_local, 'snapshot', None) or (None, None)
+    if generation != _snapshot['generation']:
+        if conn is not None:
+            conn.close()
+        # The copy never changes once swapped in, so SQLite can skip locking it
+        uri = f"file:{pathname2url(os.path.abspath(_snapshot['path']))}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=_TimedConnection)
+        conn.row_factory = sqlite3.Row
+        _local.snapshot = (_snapshot['generation'], conn)
+    return conn
+
+def refresh_read_snapshot():
+    """
+    Copies the live database to the snapshot path with the SQLite backup API
+    and swaps the copy in atomically. Readers still on the previous copy keep
+    a consistent view of it until their next get_analytics_connection().
+    """
+    path = _snapshot['path']
+    partial = f'{path}.{os.getpid()}.tmp'
+    source = _connect(read_only=True)
+    target = sqlite3.connect(partial)
+    try:
+        source.backup(target)
+        # A standalone copy needs no WAL, which read-only openers could not create
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, path)
+    _snapshot['generation'] += 1
+    invalidate_stats_cache()
+
+def enable_read_snapshots(path):
+    """
+    Serve analytics reads from a copy of the database at path, made now.
+    Call refresh_read_snapshot() periodically to keep it current; results lag
+    the live data by up to that period. If a refresh fails, the previous copy
+    stays in use.
+    """
+    _snapshot['path'] = path
+    refresh_read_snapshot()
+
+def release_db_connection(exception=None):
+    """
+    Returns the current thread's connection to the pool.
+    Registered with app.teardown_appcontext so every request borrows one connection.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def run_write(operation, *args):
+    """
+    Runs operation(conn, *args) in a BEGIN IMMEDIATE transaction and commits it.
+    Taking the write lock up front means the operation's reads and writes see
+    the same state. If another writer still holds the lock once busy_timeout
+    has expired, retries with jittered exponential backoff before raising
+    DatabaseBusyError.
+    """
+    with write_connection() as conn:
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                break
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                if attempt == WRITE_RETRIES:
+                    raise DatabaseBusyError('Database is busy, please retry') from e
+                time.sleep(WRITE_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+        
+        result = operation(conn, *args)
+        conn.commit()
+    return result
+
+@contextmanager
+def read_snapshot():
+    """
+    Holds one read transaction on the current thread's connection, so every
+    query made inside the block sees the same consistent snapshot under WAL.
+    Only use read functions inside the block; a write would commit it early.
     """
     conn = get_db_connection()
+    conn.execute('BEGIN')
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+
+def in_read_snapshot():
+    """True while the current thread's connection is inside a read_snapshot() block"""
+    conn = getattr(_local, 'conn', None)
+    return conn is not None and conn.in_transaction
+
+def add_write_listener(listener):
+    """
+    Register listener(tags) to run after every committed write made through
+    this module. tags name the data that changed: 'users' (existing users),
+    'events' (the event list), 'event:<id>', 'enrollments:<id>', or '*' when
+    a bulk write may have touched anything.
+    """
+    _write_listeners.append(listener)
+
+def _notify_write(*tags):
+    """Clear the cached statistics and tell the write listeners what changed"""
+    invalidate_stats_cache()
+    for listener in _write_listeners:
+        listener(tags)
+
+def close_all_connections():
+    """Close the current thread's connection, every idle pooled connection and the writer"""
+    global _writer
+    release_db_connection()
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            break
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+# Schema migrations, applied in order on top of the tables created by init_db().
+# The number of applied steps is stored in PRAGMA user_version, so append new
+# steps to the end of the list and never edit one that has already shipped.
+MIGRATIONS = [
+    # 1: indexes for per-user enrollment lookups and event date/type queries
+    [
+        'CREATE INDEX IF NOT EXISTS idx_enrollments_user ON enrollments (user_id, event_id, enrolled_at)',
+        'CREATE INDEX IF NOT EXISTS idx_events_date ON events (event_date)',
+        'CREATE INDEX IF NOT EXISTS idx_events_type ON events (event_type)',
+    ],
+    # 2: materialized enrollment counter on events, kept in sync by triggers
+    [
+        'ALTER TABLE events ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0',
+        '''
+            UPDATE events
+            SET enrolled_count = (SELECT COUNT(*) FROM enrollments WHERE event_id = events.id)
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_enrollments_count_insert
+            AFTER INSERT ON enrollments
+            BEGIN
+                UPDATE events SET enrolled_count = enrolled_count + 1 WHERE id = NEW.event_id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_enrollments_count_delete
+            AFTER DELETE ON enrollments
+            BEGIN
+                UPDATE events SET enrolled_count = enrolled_count - 1 WHERE id = OLD.event_id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_enrollments_count_update
+            AFTER UPDATE OF event_id ON enrollments
+            WHEN NEW.event_id IS NOT OLD.event_id
+            BEGIN
+                UPDATE events SET enrolled_count = enrolled_count - 1 WHERE id = OLD.event_id;
+                UPDATE events SET enrolled_count = enrolled_count + 1 WHERE id = NEW.event_id;
+            END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_events_enrolled ON events (enrolled_count)',
+    ],
+    # 3: waitlist for full events, promoted in order on unenroll
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS waitlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (event_id) REFERENCES events(id),
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                UNIQUE(event_id, user_id)
+            )
+        ''',
+    ],
+    # 4: event_type filter combined with the date-ordered event pages
+    [
+        'CREATE INDEX IF NOT EXISTS idx_events_type_date ON events (event_type, event_date)',
+        'DROP INDEX IF EXISTS idx_events_type',
+    ],
+    # 5: admin statistics summary tables, maintained by triggers
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''',
+        '''
+            CREATE TABLE IF NOT EXISTS stats_event_types (
+                event_type TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''',
+        '''
+            INSERT OR REPLACE INTO stats_counters (name, value) VALUES
+                ('total_users', (SELECT COUNT(*) FROM users)),
+                ('total_events', (SELECT COUNT(*) FROM events)),
+                ('total_enrollments', (SELECT COUNT(*) FROM enrollments))
+        ''',
+        '''
+            INSERT OR REPLACE INTO stats_event_types (event_type, count)
+            SELECT event_type, COUNT(*) FROM events GROUP BY event_type
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert
+            AFTER INSERT ON users
+            BEGIN
+                UPDATE stats_counters SET value = value + 1 WHERE name = 'total_users';
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete
+            AFTER DELETE ON users
+            BEGIN
+                UPDATE stats_counters SET value = value - 1 WHERE name = 'total_users';
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_enrollments_stats_insert
+            AFTER INSERT ON enrollments
+            BEGIN
+                UPDATE stats_counters SET value = value + 1 WHERE name = 'total_enrollments';
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_enrollments_stats_delete
+            AFTER DELETE ON enrollments
+            BEGIN
+                UPDATE stats_counters SET value = value - 1 WHERE name = 'total_enrollments';
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_events_stats_insert
+            AFTER INSERT ON events
+            BEGIN
+                UPDATE stats_counters SET value = value + 1 WHERE name = 'total_events';
+                INSERT INTO stats_event_types (event_type, count) VALUES (NEW.event_type, 1)
+                ON CONFLICT(event_type) DO UPDATE SET count = count + 1;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_events_stats_delete
+            AFTER DELETE ON events
+            BEGIN
+                UPDATE stats_counters SET value = value - 1 WHERE name = 'total_events';
+                UPDATE stats_event_types SET count = count - 1 WHERE event_type = OLD.event_type;
+                DELETE FROM stats_event_types WHERE event_type = OLD.event_type AND count <= 0;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_events_stats_update_type
+            AFTER UPDATE OF event_type ON events
+            WHEN NEW.event_type IS NOT OLD.event_type
+            BEGIN
+                UPDATE stats_event_types SET count = count - 1 WHERE event_type = OLD.event_type;
+                DELETE FROM stats_event_types WHERE event_type = OLD.event_type AND count <= 0;
+                INSERT INTO stats_event_types (event_type, count) VALUES (NEW.event_type, 1)
+                ON CONFLICT(event_type) DO UPDATE SET count = count + 1;
+            END
+        ''',
+    ],
+    # 6: full-text index over event title, description and location.
+    # External content keeps one copy of the text; triggers keep it in sync
+    # and the prefix indexes make search-as-you-type prefix queries cheap.
+    [
+        '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+                title, description, location,
+                content='events', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''',
+        "INSERT INTO events_fts (events_fts) VALUES ('rebuild')",
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_events_fts_insert
+            AFTER INSERT ON events
+            BEGIN
+                INSERT INTO events_fts (rowid, title, description, location)
+                VALUES (NEW.id, NEW.title, NEW.description, NEW.location);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_events_fts_delete
+            AFTER DELETE ON events
+            BEGIN
+                INSERT INTO events_fts (events_fts, rowid, title, description, location)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.location);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_events_fts_update
+            AFTER UPDATE OF title, description, location ON events
+            BEGIN
+                INSERT INTO events_fts (events_fts, rowid, title, description, location)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.location);
+                INSERT INTO events_fts (rowid, title, description, location)
+                VALUES (NEW.id, NEW.title, NEW.description, NEW.location);
+            END
+        ''',
+    ],
+    # 7: last run of each background job, shared by every worker process
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS job_runs (
+                name TEXT PRIMARY KEY,
+                owner TEXT,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                duration REAL,
+                error TEXT
+            ) WITHOUT ROWID
+        ''',
+    ],
+    # 8: feed of events whose seat counts changed, read by the live update stream.
+    # Every 1000th change prunes all but the newest EVENT_CHANGES_KEPT rows.
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS event_changes (
+                seq INTEGER PRIMARY KEY,
+                event_id INTEGER NOT NULL
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_event_changes_insert
+            AFTER INSERT ON events
+            BEGIN
+                INSERT INTO event_changes (event_id) VALUES (NEW.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_event_changes_update
+            AFTER UPDATE OF enrolled_count, max_participants ON events
+            BEGIN
+                INSERT INTO event_changes (event_id) VALUES (NEW.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_event_changes_delete
+            AFTER DELETE ON events
+            BEGIN
+                INSERT INTO event_changes (event_id) VALUES (OLD.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_event_changes_prune
+            AFTER INSERT ON event_changes
+            WHEN NEW.seq % 1000 = 0
+            BEGIN
+                DELETE FROM event_changes WHERE seq <= NEW.seq - 10000;
+            END
+        ''',
+    ],
+    # 9: archived events per type, kept by archive_events(). The archive is not
+    # attached to every connection, so reconcile_stats() fills it for existing archives.
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS stats_archived_event_types (
+                event_type TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''',
+    ],
+]
+
+# Tables of the archive database attached as 'archive'. Rows keep their ids and
+# columns, in the same order as the live tables, so SELECT * can be unioned
+# across both; a migration that changes events or enrollments must change these too.
+ARCHIVE_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS archive.events (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            location TEXT NOT NULL,
+            event_date DATE NOT NULL,
+            event_time TIME NOT NULL,
+            max_participants INTEGER,
+            created_by INTEGER,
+            created_at TIMESTAMP,
+            enrolled_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS archive.enrollments (
+            id INTEGER PRIMARY KEY,
+            event_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            enrolled_at TIMESTAMP
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_events_date ON events (event_date)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_events_type_date ON events (event_type, event_date)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_enrollments_event ON enrollments (event_id, enrolled_at)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_enrollments_user ON enrollments (user_id, event_id, enrolled_at)',
+]
+
+def _with_archive(conn, include_archived):
+    """True when a read asked for archived rows and conn has the archive attached"""
+    return include_archived and getattr(conn, 'has_archive', False)
+
+def init_db(conn=None):
+    """
+    Initializes the database with required tables.
+    Creates users, events, and enrollments tables, then applies pending migrations
+    and returns the resulting schema version.
+    """
+    if conn is None:
+        with write_connection() as conn:
+            return init_db(conn)
     cursor = conn.cursor()
     
     # Create users table
@@ -63,201 +678,1134 @@ def init_db():
     ''')
     
     conn.commit()
-    conn.close()
+    return migrate(conn)
+
+def schema_version():
+    """
+    Number of MIGRATIONS applied to the database, 0 for a new file.
+    Read on the writer: a pooled reader opened before init_db() would keep the
+    empty schema, and resolve table names to the attached archive instead.
+    """
+    with write_connection() as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn=None):
+    """
+    Applies pending schema migrations and returns the resulting schema version.
+    Runs under BEGIN IMMEDIATE so concurrent workers cannot apply a step twice,
+    and refreshes the planner statistics with ANALYZE when anything changed.
+    The FTS5 shadow tables are left out: statistics gathered on a near-empty
+    index make FTS5's own lookups fall back to scans as the index grows,
+    which turns bulk inserts quadratic.
+    """
+    if conn is None:
+        with write_connection() as conn:
+            return migrate(conn)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        start = conn.execute('PRAGMA user_version').fetchone()[0]
+        for version, statements in enumerate(MIGRATIONS[start:], start=start + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    if start < len(MIGRATIONS):
+        _analyze(conn)
+        conn.commit()
+    return len(MIGRATIONS)
+
+def _analyze(conn):
+    """ANALYZE every table except the FTS5 shadow tables, see migrate()"""
+    tables = [row[0] for row in conn.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT GLOB 'sqlite_*' AND name NOT GLOB 'events_fts*'
+    ''')]
+    for table in tables:
+        conn.execute(f'ANALYZE "{table}"')
 
 # User CRUD operations
+ALL_USERS_QUERY = 'SELECT * FROM users'
+
 def get_all_users():
     """Fetch all users from database"""
     conn = get_db_connection()
-    users = conn.execute('SELECT * FROM users').fetchall()
-    conn.close()
+    users = conn.execute(ALL_USERS_QUERY).fetchall()
+    return users
+
+USER_FIELDS = ('id', 'name', 'email', 'created_at')
+
+def get_users_page(after=None, limit=DEFAULT_PAGE_SIZE, fields=USER_FIELDS):
+    """
+    Fetch one page of users in ID order.
+    after is the ID of the last user on the previous page.
+    """
+    columns = ', '.join(field for field in USER_FIELDS if field in fields or field == 'id')
+    conn = get_db_connection()
+    users = conn.execute(f'''
+        SELECT {columns} FROM users
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (after or 0, limit)).fetchall()
     return users
 
 def get_user_by_id(user_id):
     """Fetch a specific user by ID"""
     conn = get_db_connection()
     user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
-    conn.close()
     return user
 
-def add_user(name, email):
-    """Add a new user"""
+def get_user_by_email(email):
+    """Fetch a specific user by email"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO users (name, email) VALUES (?, ?)', (name, email))
-    conn.commit()
-    user_id = cursor.lastrowid
-    conn.close()
-    return user_id
+    user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+    return user
+
+def add_user(name, email):
+    """Add a new user. Returns the new user's ID, or None if the email is already registered"""
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO users (name, email) VALUES (?, ?)
+            ON CONFLICT(email) DO NOTHING
+        ''', (name, email))
+        conn.commit()
+    if cursor.rowcount == 0:
+        return None  # Email already registered
+    # A new user appears in no existing event or roster, so no tags changed
+    _notify_write()
+    return cursor.lastrowid
+
+def get_or_create_user(name, email):
+    """
+    Return (user, created) for the user registered with this email,
+    adding them first if the email is new. Lookups go through the UNIQUE index on email.
+    """
+    user = get_user_by_email(email)
+    if user:
+        return user, False
+    
+    # A concurrent request may register the same email first; ON CONFLICT covers that race
+    user_id = add_user(name, email)
+    return get_user_by_email(email), user_id is not None
 
 def update_user(user_id, name=None, email=None):
     """Update user information"""
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        
+        if name and email:
+            cursor.execute('UPDATE users SET name = ?, email = ? WHERE id = ?', (name, email, user_id))
+        elif name:
+            cursor.execute('UPDATE users SET name = ? WHERE id = ?', (name, user_id))
+        elif email:
+            cursor.execute('UPDATE users SET email = ? WHERE id = ?', (email, user_id))
+        
+        conn.commit()
+    _notify_write('users')
+
+def delete_user(user_id):
+    """Delete a user"""
+    with write_connection() as conn:
+        conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        conn.commit()
+    _notify_write('users')
+
+# Event CRUD operations
+ALL_EVENTS_QUERY = '''
+    SELECT e.*, u.name as creator_name
+    FROM events e
+    LEFT JOIN users u ON e.created_by = u.id
+    ORDER BY e.event_date DESC
+'''
+
+# Live and archived events as one table, for reads made with include_archived
+ALL_EVENTS_UNION = '(SELECT * FROM main.events UNION ALL SELECT * FROM archive.events)'
+
+def get_all_events(include_archived=False):
+    """Fetch all events with enrollment count, archived ones too when include_archived is set"""
     conn = get_db_connection()
-    cursor = conn.cursor()
+    query = ALL_EVENTS_QUERY
+    if _with_archive(conn, include_archived):
+        query = query.replace('FROM events e', f'FROM {ALL_EVENTS_UNION} e')
+    events = conn.execute(query).fetchall()
+    return events
+
+# Selectable event columns; creator_name needs the users join
+EVENT_FIELDS = {
+    'id': 'e.id',
+    'title': 'e.title',
+    'description': 'e.description',
+    'event_type': 'e.event_type',
+    'location': 'e.location',
+    'event_date': 'e.event_date',
+    'event_time': 'e.event_time',
+    'max_participants': 'e.max_participants',
+    'created_by': 'e.created_by',
+    'created_at': 'e.created_at',
+    'enrolled_count': 'e.enrolled_count',
+    'creator_name': 'u.name as creator_name',
+}
+
+def get_events_page(after=None, limit=DEFAULT_PAGE_SIZE, event_type=None, date_from=None,
+                    date_to=None, location=None, fields=tuple(EVENT_FIELDS), include_archived=False):
+    """
+    Fetch one page of events, latest event_date first.
+    after is the (event_date, id) of the last event on the previous page. The
+    keyset condition and the event_type/date filters are answered from
+    idx_events_date or idx_events_type_date; location is a substring match.
+    id and event_date are always selected so the caller can build the next cursor.
+    With include_archived, the live and the archived table each supply up to
+    limit rows through the same indexes and the page is merged from those.
+    """
+    selected = [name for name in EVENT_FIELDS if name in fields or name in ('id', 'event_date')]
+    columns = ', '.join(EVENT_FIELDS[name] for name in selected)
+    join = 'LEFT JOIN users u ON e.created_by = u.id' if 'creator_name' in selected else ''
     
-    if name and email:
-        cursor.execute('UPDATE users SET name = ?, email = ? WHERE id = ?', (name, email, user_id))
-    elif name:
-        cursor.execute('UPDATE users SET name = ? WHERE id = ?', (name, user_id))
-    elif email:
-        cursor.execute('UPDATE users SET email = ? WHERE id = ?', (email, user_id))
+    conditions = []
+    params = []
+    if after:
+        conditions.append('(e.event_date, e.id) < (?, ?)')
+        params.extend(after)
+    if event_type:
+        conditions.append('e.event_type = ?')
+        params.append(event_type)
+    if date_from:
+        conditions.append('e.event_date >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append('e.event_date <= ?')
+        params.append(date_to)
+    if location:
+        conditions.append("e.location LIKE ? ESCAPE '\\'")
+        params.append('%' + re.sub(r'([%_\\])', r'\\\1', location) + '%')
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
     
-    conn.commit()
-    conn.close()
+    conn = get_db_connection()
+    query = f'''
+        SELECT {columns}
+        FROM {{events}} e
+        {join}
+        {where}
+        ORDER BY e.event_date DESC, e.id DESC
+        LIMIT ?
+    '''
+    if not _with_archive(conn, include_archived):
+        return conn.execute(query.format(events='events'), params + [limit]).fetchall()
+    
+    events = conn.execute(f'''
+        SELECT * FROM ({query.format(events='main.events')}) live_page
+        UNION ALL
+        SELECT * FROM ({query.format(events='archive.events')}) archive_page
+        ORDER BY event_date DESC, id DESC
+        LIMIT ?
+    ''', (params + [limit]) * 2 + [limit]).fetchall()
+    return events
 
-def delete_user(user_id):
-    """Delete a user"""
+def get_upcoming_events(event_type=None):
+    """Fetch id, title and date of every event from today on, soonest first"""
     conn = get_db_connection()
-    conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
-    conn.commit()
-    conn.close()
+    query = "SELECT id, title, event_date FROM events WHERE event_date >= date('now')"
+    params = []
+    if event_type:
+        query += ' AND event_type = ?'
+        params.append(event_type)
+    events = conn.execute(query + ' ORDER BY event_date', params).fetchall()
+    return events
 
-# Event CRUD operations
-def get_all_events():
-    """Fetch all events with enrollment count"""
+# Relative weight of a match in title, description and location when ranking search results
+SEARCH_WEIGHTS = (10.0, 1.0, 4.0)
+SEARCH_RANK = f'bm25({", ".join(map(str, SEARCH_WEIGHTS))})'
+
+def _search_match(text):
+    """
+    Turn free text into an FTS5 query: every word must match, and the last
+    word also matches as a prefix so results appear while the user types.
+    Words are quoted, so FTS5 operators and punctuation in the input are inert.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def search_events(text, event_type=None, date_from=None, date_to=None, limit=DEFAULT_PAGE_SIZE, offset=0):
+    """
+    Full-text search over event title, description and location, best matches
+    first (bm25), optionally narrowed by event_type and an event_date range.
+    Every match is ranked. Returns [] when text contains no searchable words.
+    """
+    match = _search_match(text)
+    if match is None:
+        return []
+    
     conn = get_db_connection()
-    events = conn.execute('''
-        SELECT e.*, u.name as creator_name,
-               COUNT(DISTINCT en.user_id) as enrolled_count
-        FROM events e
+    # rank MATCH sets the weighted bm25 that FTS5 computes as the rank column
+    query = '''
+        SELECT e.*, u.name as creator_name
+        FROM events_fts
+        JOIN events e ON e.id = events_fts.rowid
         LEFT JOIN users u ON e.created_by = u.id
-        LEFT JOIN enrollments en ON e.id = en.event_id
-        GROUP BY e.id
-        ORDER BY e.event_date DESC
-    ''').fetchall()
-    conn.close()
+        WHERE events_fts MATCH ? AND events_fts.rank MATCH ?
+    '''
+    params = [match, SEARCH_RANK]
+    if event_type:
+        query += ' AND e.event_type = ?'
+        params.append(event_type)
+    if date_from:
+        query += ' AND e.event_date >= ?'
+        params.append(date_from)
+    if date_to:
+        query += ' AND e.event_date <= ?'
+        params.append(date_to)
+    query += ' ORDER BY events_fts.rank, e.event_date, e.id LIMIT ? OFFSET ?'
+    params.extend([limit, offset])
+    events = conn.execute(query, params).fetchall()
     return events
 
-def get_event_by_id(event_id):
-    """Fetch a specific event by ID"""
+def get_event_by_id(event_id, include_archived=False):
+    """Fetch a specific event by ID, looking in the archive too when include_archived is set"""
     conn = get_db_connection()
-    event = conn.execute('''
-        SELECT e.*, u.name as creator_name,
-               COUNT(DISTINCT en.user_id) as enrolled_count
-        FROM events e
+    query = '''
+        SELECT e.*, u.name as creator_name
+        FROM {events} e
         LEFT JOIN users u ON e.created_by = u.id
-        LEFT JOIN enrollments en ON e.id = en.event_id
         WHERE e.id = ?
-        GROUP BY e.id
-    ''', (event_id,)).fetchone()
-    conn.close()
+    '''
+    event = conn.execute(query.format(events='events'), (event_id,)).fetchone()
+    if event is None and _with_archive(conn, include_archived):
+        event = conn.execute(query.format(events='archive.events'), (event_id,)).fetchone()
     return event
 
 def add_event(title, description, event_type, location, event_date, event_time, max_participants, created_by):
     """Add a new event"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO events (title, description, event_type, location, event_date, event_time, max_participants, created_by)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (title, description, event_type, location, event_date, event_time, max_participants, created_by))
-    conn.commit()
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO events (title, description, event_type, location, event_date, event_time, max_participants, created_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, description, event_type, location, event_date, event_time, max_participants, created_by))
+        conn.commit()
     event_id = cursor.lastrowid
-    conn.close()
+    _notify_write('events', f'event:{event_id}')
     return event_id
 
+# Columns a client may change; id, enrolled_count and created_* are maintained here
+EVENT_UPDATE_FIELDS = ('title', 'description', 'event_type', 'location', 'event_date', 'event_time',
+                       'max_participants')
+
+def _update_event(conn, event_id, changes):
+    """Apply changes inside an open write transaction, refusing a capacity below the current enrollment"""
+    capacity = changes.get('max_participants')
+    if capacity is not None:
+        row = conn.execute('SELECT enrolled_count FROM events WHERE id = ?', (event_id,)).fetchone()
+        if row is not None and capacity < row['enrolled_count']:
+            raise ValueError(f"max_participants cannot be below the {row['enrolled_count']} users already enrolled")
+    conn.execute(f"UPDATE events SET {', '.join(f'{key} = ?' for key in changes)} WHERE id = ?",
+                 [*changes.values(), event_id])
+
 def update_event(event_id, **kwargs):
-    """Update event information"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    fields = []
-    values = []
-    for key, value in kwargs.items():
-        if value is not None:
-            fields.append(f"{key} = ?")
-            values.append(value)
-    
-    if fields:
-        query = f"UPDATE events SET {', '.join(fields)} WHERE id = ?"
-        values.append(event_id)
-        cursor.execute(query, values)
-        conn.commit()
-    
-    conn.close()
+    """
+    Update event information. Only EVENT_UPDATE_FIELDS can be changed; None
+    values are left alone. Raises ValueError for any other field and for a
+    max_participants below the event's enrolled_count.
+    """
+    unknown = [key for key in kwargs if key not in EVENT_UPDATE_FIELDS]
+    if unknown:
+        raise ValueError(f"Fields cannot be updated: {', '.join(unknown)}")
+    changes = {key: value for key, value in kwargs.items() if value is not None}
+    if 'max_participants' in changes:
+        # The create form sends the number as a string
+        try:
+            changes['max_participants'] = int(changes['max_participants'])
+        except (TypeError, ValueError):
+            raise ValueError('max_participants must be an integer') from None
+    if changes:
+        run_write(_update_event, event_id, changes)
+        _notify_write('events', f'event:{event_id}')
 
 def delete_event(event_id):
     """Delete an event and its enrollments"""
-    conn = get_db_connection()
-    conn.execute('DELETE FROM enrollments WHERE event_id = ?', (event_id,))
-    conn.execute('DELETE FROM events WHERE id = ?', (event_id,))
-    conn.commit()
-    conn.close()
+    with write_connection() as conn:
+        conn.execute('DELETE FROM waitlist WHERE event_id = ?', (event_id,))
+        conn.execute('DELETE FROM enrollments WHERE event_id = ?', (event_id,))
+        conn.execute('DELETE FROM events WHERE id = ?', (event_id,))
+        conn.commit()
+    _notify_write('events', f'event:{event_id}', f'enrollments:{event_id}')
 
 # Enrollment operations
-def enroll_user(event_id, user_id):
-    """Enroll a user in an event"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('INSERT INTO enrollments (event_id, user_id) VALUES (?, ?)', (event_id, user_id))
-        conn.commit()
-        enrollment_id = cursor.lastrowid
-        conn.close()
-        return enrollment_id
-    except sqlite3.IntegrityError:
-        conn.close()
-        return None  # User already enrolled
+def _enroll(conn, event_id, user_id, waitlist=False):
+    """
+    Enrolls a user inside an open write transaction.
+    Returns ('enrolled', enrollment_id), ('duplicate', None), ('missing', None),
+    or ('full', waitlist_position) where the position is None without waitlist.
+    """
+    if conn.execute('SELECT 1 FROM enrollments WHERE event_id = ? AND user_id = ?',
+                    (event_id, user_id)).fetchone():
+        return 'duplicate', None
+    
+    # The capacity check and the insert are one statement, so it cannot overbook
+    cursor = conn.execute('''
+        INSERT INTO enrollments (event_id, user_id)
+        SELECT id, ? FROM events
+        WHERE id = ? AND (max_participants IS NULL OR enrolled_count < max_participants)
+    ''', (user_id, event_id))
+    if cursor.rowcount == 1:
+        return 'enrolled', cursor.lastrowid
+    
+    if not conn.execute('SELECT 1 FROM events WHERE id = ?', (event_id,)).fetchone():
+        return 'missing', None
+    if not waitlist:
+        return 'full', None
+    
+    conn.execute('INSERT OR IGNORE INTO waitlist (event_id, user_id) VALUES (?, ?)', (event_id, user_id))
+    position = conn.execute('''
+        SELECT COUNT(*) FROM waitlist
+        WHERE event_id = ? AND id <= (SELECT id FROM waitlist WHERE event_id = ? AND user_id = ?)
+    ''', (event_id, event_id, user_id)).fetchone()[0]
+    return 'full', position
+
+def _unenroll(conn, event_id, user_id):
+    """
+    Unenrolls a user inside an open write transaction and promotes the
+    longest-waiting waitlisted user into the freed seat.
+    Returns the promoted user's ID, or None.
+    """
+    removed = conn.execute('DELETE FROM enrollments WHERE event_id = ? AND user_id = ?',
+                           (event_id, user_id)).rowcount
+    conn.execute('DELETE FROM waitlist WHERE event_id = ? AND user_id = ?', (event_id, user_id))
+    if not removed:
+        return None
+    
+    while True:
+        waiting = conn.execute('''
+            SELECT id, user_id FROM waitlist WHERE event_id = ? ORDER BY id LIMIT 1
+        ''', (event_id,)).fetchone()
+        if waiting is None:
+            return None
+        
+        status, _ = _enroll(conn, event_id, waiting['user_id'])
+        if status == 'full':
+            return None
+        conn.execute('DELETE FROM waitlist WHERE id = ?', (waiting['id'],))
+        if status == 'enrolled':
+            return waiting['user_id']
+
+def _enroll_outcome(event_id, status, value):
+    """Turn an _enroll() status into enroll_user()'s return value, or raise its exception"""
+    if status == 'missing':
+        raise EventNotFoundError(f'Event {event_id} not found')
+    if status == 'full':
+        raise EventFullError(event_id, value)
+    return value
+
+def enroll_user(event_id, user_id, waitlist=False):
+    """
+    Enroll a user in an event without exceeding max_participants.
+    Returns the enrollment ID, or None if the user is already enrolled.
+    Raises EventNotFoundError, EventFullError (after waitlisting the user when
+    waitlist is True) or DatabaseBusyError.
+    """
+    status, value = run_write(_enroll, event_id, user_id, waitlist)
+    if status == 'enrolled':
+        _notify_write('events', f'event:{event_id}', f'enrollments:{event_id}')
+    return _enroll_outcome(event_id, status, value)
 
 def unenroll_user(event_id, user_id):
-    """Unenroll a user from an event"""
-    conn = get_db_connection()
-    conn.execute('DELETE FROM enrollments WHERE event_id = ? AND user_id = ?', (event_id, user_id))
-    conn.commit()
-    conn.close()
+    """Unenroll a user from an event and return the ID of any user promoted from the waitlist"""
+    promoted_user_id = run_write(_unenroll, event_id, user_id)
+    _notify_write('events', f'event:{event_id}', f'enrollments:{event_id}')
+    return promoted_user_id
+
+def _apply_enrollment_batch(conn, requests):
+    """
+    Applies each request inside its own savepoint of one open write transaction,
+    so an unexpected error only undoes that request.
+    Returns one (status, value) or raised exception per request.
+    """
+    outcomes = []
+    for kind, event_id, user_id, *options in requests:
+        conn.execute('SAVEPOINT enrollment_request')
+        try:
+            if kind == 'enroll':
+                outcome = _enroll(conn, event_id, user_id, *options)
+            else:
+                outcome = ('unenrolled', _unenroll(conn, event_id, user_id))
+            conn.execute('RELEASE enrollment_request')
+        except sqlite3.Error as e:
+            conn.execute('ROLLBACK TO enrollment_request')
+            conn.execute('RELEASE enrollment_request')
+            outcome = e
+        outcomes.append(outcome)
+    return outcomes
 
-def get_event_enrollments(event_id):
-    """Get all users enrolled in an event"""
+def apply_enrollment_batch(requests):
+    """
+    Group commit: applies ('enroll', event_id, user_id, waitlist) and
+    ('unenroll', event_id, user_id) requests in one write transaction, paying
+    for one lock acquisition and one commit instead of one per request.
+    Returns one result per request: what enroll_user() or unenroll_user()
+    would have returned, or the exception it would have raised. Raises
+    DatabaseBusyError when the whole batch could not be written.
+    """
+    outcomes = run_write(_apply_enrollment_batch, requests)
+    
+    results = []
+    tags = set()
+    for (kind, event_id, *_), outcome in zip(requests, outcomes):
+        if isinstance(outcome, Exception):
+            results.append(outcome)
+            continue
+        status, value = outcome
+        if status in ('enrolled', 'unenrolled'):
+            tags.update(('events', f'event:{event_id}', f'enrollments:{event_id}'))
+        try:
+            results.append(value if kind == 'unenroll' else _enroll_outcome(event_id, status, value))
+        except (EventNotFoundError, EventFullError) as e:
+            results.append(e)
+    if tags:
+        _notify_write(*sorted(tags))
+    return results
+
+EVENT_ENROLLMENTS_QUERY = '''
+    SELECT u.*, e.enrolled_at
+    FROM users u
+    JOIN enrollments e ON u.id = e.user_id
+    WHERE e.event_id = ?
+    ORDER BY e.enrolled_at DESC
+'''
+
+def get_event_enrollments(event_id, include_archived=False):
+    """Get all users enrolled in an event, also for an archived event when include_archived is set"""
     conn = get_db_connection()
-    enrollments = conn.execute('''
-        SELECT u.*, e.enrolled_at
-        FROM users u
-        JOIN enrollments e ON u.id = e.user_id
-        WHERE e.event_id = ?
-        ORDER BY e.enrolled_at DESC
-    ''', (event_id,)).fetchall()
-    conn.close()
+    enrollments = conn.execute(EVENT_ENROLLMENTS_QUERY, (event_id,)).fetchall()
+    if not enrollments and _with_archive(conn, include_archived):
+        # An event is archived together with all of its enrollments
+        query = EVENT_ENROLLMENTS_QUERY.replace('JOIN enrollments e', 'JOIN archive.enrollments e')
+        enrollments = conn.execute(query, (event_id,)).fetchall()
     return enrollments
 
-def get_user_enrollments(user_id):
-    """Get all events a user is enrolled in"""
+USER_ENROLLMENTS_QUERY = '''
+    SELECT ev.*, en.enrolled_at
+    FROM events ev
+    JOIN enrollments en ON ev.id = en.event_id
+    WHERE en.user_id = ?
+    ORDER BY ev.event_date ASC
+'''
+
+ALL_USER_ENROLLMENTS_QUERY = '''
+    SELECT ev.*, en.enrolled_at
+    FROM main.events ev
+    JOIN main.enrollments en ON ev.id = en.event_id
+    WHERE en.user_id = ?
+    UNION ALL
+    SELECT ev.*, en.enrolled_at
+    FROM archive.events ev
+    JOIN archive.enrollments en ON ev.id = en.event_id
+    WHERE en.user_id = ?
+    ORDER BY event_date ASC
+'''
+
+def get_user_enrollments(user_id, include_archived=False):
+    """Get all events a user is enrolled in, archived past ones too when include_archived is set"""
     conn = get_db_connection()
-    enrollments = conn.execute('''
-        SELECT ev.*, en.enrolled_at
-        FROM events ev
-        JOIN enrollments en ON ev.id = en.event_id
-        WHERE en.user_id = ?
-        ORDER BY ev.event_date ASC
-    ''', (user_id,)).fetchall()
-    conn.close()
+    if _with_archive(conn, include_archived):
+        return conn.execute(ALL_USER_ENROLLMENTS_QUERY, (user_id, user_id)).fetchall()
+    enrollments = conn.execute(USER_ENROLLMENTS_QUERY, (user_id,)).fetchall()
     return enrollments
 
-def get_enrollment_stats():
-    """Get statistics for admin dashboard"""
-    conn = get_db_connection()
+def get_enrollment_stats(include_archived=False):
+    """
+    Get statistics for admin dashboard.
+    Served from memory for STATS_CACHE_TTL seconds; writes made through this
+    module clear the cache straight away. The totals and events_by_type cover
+    live events only, plus archived ones when include_archived is set.
+    """
+    now = time.monotonic()
+    with _stats_lock:
+        stats = _stats_cache['stats'] if now < _stats_cache['expires'] else None
+
+    if stats is None:
+        stats = _read_enrollment_stats()
+        with _stats_lock:
+            _stats_cache['stats'] = stats
+            _stats_cache['expires'] = now + STATS_CACHE_TTL
+    stats = dict(stats)
+    if include_archived:
+        stats['total_events'] += stats['archived_events']
+        stats['total_enrollments'] += stats['archived_enrollments']
+        by_type = {row['event_type']: row['count'] for row in stats['events_by_type']}
+        for row in stats['archived_events_by_type']:
+            by_type[row['event_type']] = by_type.get(row['event_type'], 0) + row['count']
+        stats['events_by_type'] = [{'event_type': event_type, 'count': count}
+                                   for event_type, count in sorted(by_type.items())]
+    return stats
+
+def invalidate_stats_cache():
+    """Drop the cached admin statistics so the next read goes to the database"""
+    with _stats_lock:
+        _stats_cache['stats'] = None
+
+def _read_enrollment_stats():
+    """Read the admin statistics from the trigger-maintained summary tables"""
+    conn = get_analytics_connection()
+    counters = dict(conn.execute('SELECT name, value FROM stats_counters').fetchall())
     
     stats = {
-        'total_users': conn.execute('SELECT COUNT(*) as count FROM users').fetchone()['count'],
-        'total_events': conn.execute('SELECT COUNT(*) as count FROM events').fetchone()['count'],
-        'total_enrollments': conn.execute('SELECT COUNT(*) as count FROM enrollments').fetchone()['count'],
+        'total_users': counters.get('total_users', 0),
+        'total_events': counters.get('total_events', 0),
+        'total_enrollments': counters.get('total_enrollments', 0),
+        'archived_events': counters.get('archived_events', 0),
+        'archived_enrollments': counters.get('archived_enrollments', 0),
         'upcoming_events': conn.execute('''
             SELECT COUNT(*) as count FROM events 
             WHERE event_date >= date('now')
         ''').fetchone()['count'],
-        'events_by_type': conn.execute('''
-            SELECT event_type, COUNT(*) as count 
-            FROM events 
-            GROUP BY event_type
-        ''').fetchall(),
-        'popular_events': conn.execute('''
-            SELECT e.id, e.title, COUNT(en.user_id) as enrollment_count
-            FROM events e
-            LEFT JOIN enrollments en ON e.id = en.event_id
-            GROUP BY e.id
-            ORDER BY enrollment_count DESC
+        'events_by_type': [dict(row) for row in conn.execute('''
+            SELECT event_type, count
+            FROM stats_event_types
+            ORDER BY event_type
+        ''')],
+        'archived_events_by_type': [dict(row) for row in conn.execute('''
+            SELECT event_type, count
+            FROM stats_archived_event_types
+            ORDER BY event_type
+        ''')],
+        'popular_events': [dict(row) for row in conn.execute('''
+            SELECT id, title, enrolled_count as enrollment_count
+            FROM events
+            ORDER BY enrolled_count DESC
             LIMIT 5
-        ''').fetchall()
+        ''')]
     }
     
-    conn.close()
     return stats
+
+def _compute_enrollment_stats(conn):
+    """
+    Recompute the summary table contents from scratch with full scans. The
+    archived_* figures are only included when conn has the archive attached;
+    archive rows of an event still in the live tables (copied by an
+    interrupted archive_events() run) are not counted.
+    """
+    stats = {
+        'total_users': conn.execute('SELECT COUNT(*) FROM users').fetchone()[0],
+        'total_events': conn.execute('SELECT COUNT(*) FROM main.events').fetchone()[0],
+        'total_enrollments': conn.execute('SELECT COUNT(*) FROM main.enrollments').fetchone()[0],
+        'events_by_type': dict(conn.execute(
+            'SELECT event_type, COUNT(*) FROM main.events GROUP BY event_type'
+        ).fetchall()),
+    }
+    if getattr(conn, 'has_archive', False):
+        stats['archived_events'] = conn.execute(
+            'SELECT COUNT(*) FROM archive.events WHERE id NOT IN (SELECT id FROM main.events)'
+        ).fetchone()[0]
+        stats['archived_enrollments'] = conn.execute(
+            'SELECT COUNT(*) FROM archive.enrollments WHERE event_id NOT IN (SELECT id FROM main.events)'
+        ).fetchone()[0]
+        stats['archived_events_by_type'] = dict(conn.execute('''
+            SELECT event_type, COUNT(*) FROM archive.events
+            WHERE id NOT IN (SELECT id FROM main.events)
+            GROUP BY event_type
+        ''').fetchall())
+    return stats
+
+# Summary tables holding a {event_type: count} figure of _compute_enrollment_stats()
+STATS_TYPE_TABLES = {'events_by_type': 'stats_event_types', 'archived_events_by_type': 'stats_archived_event_types'}
+
+def _reconcile_stats(conn, fix):
+    """Compare the summary tables with a full recount inside an open write transaction"""
+    actual = _compute_enrollment_stats(conn)
+    # archive_events() only creates the archived counters once it moves something
+    stored = {'archived_events': 0, 'archived_enrollments': 0,
+              **dict(conn.execute('SELECT name, value FROM stats_counters').fetchall())}
+    for name, table in STATS_TYPE_TABLES.items():
+        stored[name] = dict(conn.execute(f'SELECT event_type, count FROM {table}').fetchall())
+    
+    drift = {
+        name: {'stored': stored.get(name), 'actual': value}
+        for name, value in actual.items()
+        if stored.get(name) != value
+    }
+    if fix and drift:
+        conn.executemany('INSERT OR REPLACE INTO stats_counters (name, value) VALUES (?, ?)',
+                         [(name, value) for name, value in actual.items() if name not in STATS_TYPE_TABLES])
+        for name, table in STATS_TYPE_TABLES.items():
+            if name in actual:
+                conn.execute(f'DELETE FROM {table}')
+                conn.executemany(f'INSERT INTO {table} (event_type, count) VALUES (?, ?)', actual[name].items())
+    return drift
+
+def reconcile_stats(fix=True):
+    """
+    Recompute the admin statistics from the base tables and compare them with
+    the summary tables. Returns {name: {'stored': ..., 'actual': ...}} for every
+    aggregate that drifted, rewriting the summary tables when fix is True.
+    The archived_* figures are checked against the archive when one is configured.
+    """
+    drift = run_write(_reconcile_stats, fix)
+    invalidate_stats_cache()
+    return drift
+
+def check_enrollment_counts():
+    """
+    Compares events.enrolled_count with the enrollments table.
+    Returns one row (id, enrolled_count, actual_count) per event that has drifted.
+    """
+    conn = get_analytics_connection()
+    drifted = conn.execute('''
+        SELECT e.id, e.enrolled_count, COUNT(en.id) as actual_count
+        FROM events e
+        LEFT JOIN enrollments en ON e.id = en.event_id
+        GROUP BY e.id
+        HAVING e.enrolled_count != COUNT(en.id)
+    ''').fetchall()
+    return drifted
+
+def rebuild_enrollment_counts():
+    """Recompute events.enrolled_count from enrollments and return the number of fixed events"""
+    with write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE events
+            SET enrolled_count = (SELECT COUNT(*) FROM enrollments WHERE event_id = events.id)
+            WHERE enrolled_count != (SELECT COUNT(*) FROM enrollments WHERE event_id = events.id)
+        ''')
+        conn.commit()
+    _notify_write('*')
+    return cursor.rowcount
+
+# Bulk import and export
+EVENT_IMPORT_FIELDS = ('title', 'description', 'event_type', 'location', 'event_date', 'event_time')
+
+def _chunks(iterable, size):
+    """Yield lists of up to size items from any iterable"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _import_users_chunk(conn, chunk, errors):
+    """Insert one chunk of (row number, record) users, skipping emails already registered"""
+    valid = []
+    for number, record in chunk:
+        if record.get('_error') or not record.get('name') or not record.get('email'):
+            errors.append({'row': number, 'error': record.get('_error') or 'Name and email are required'})
+        else:
+            valid.append((number, record['name'], record['email']))
+    
+    placeholders = ', '.join('?' * len(valid))
+    existing = {row[0] for row in conn.execute(
+        f'SELECT email FROM users WHERE email IN ({placeholders})', [email for _, _, email in valid]
+    )} if valid else set()
+    
+    new_users = []
+    for number, name, email in valid:
+        if email in existing:
+            errors.append({'row': number, 'error': f'Duplicate email {email}'})
+        else:
+            existing.add(email)
+            new_users.append((name, email))
+    conn.executemany('INSERT INTO users (name, email) VALUES (?, ?)', new_users)
+    return len(new_users)
+
+def _import_events_chunk(conn, chunk, errors):
+    """Insert one chunk of (row number, record) events"""
+    new_events = []
+    for number, record in chunk:
+        missing = [field for field in EVENT_IMPORT_FIELDS if not record.get(field)]
+        if record.get('_error') or missing:
+            errors.append({'row': number, 'error': record.get('_error') or f"Missing {', '.join(missing)}"})
+            continue
+        new_events.append([record[field] for field in EVENT_IMPORT_FIELDS] +
+                          [record.get('max_participants') or None, record.get('created_by') or None])
+    conn.executemany('''
+        INSERT INTO events (title, description, event_type, location, event_date, event_time, max_participants, created_by)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', new_events)
+    return len(new_events)
+
+def _import_enrollments_chunk(conn, chunk, errors):
+    """Enroll one chunk of (row number, record) users, honouring event capacity"""
+    messages = {'duplicate': 'Already enrolled', 'missing': 'Event not found', 'full': 'Event is full'}
+    enrolled = 0
+    for number, record in chunk:
+        if record.get('_error') or not record.get('event_id') or not record.get('user_id'):
+            errors.append({'row': number, 'error': record.get('_error') or 'Event ID and User ID are required'})
+            continue
+        status, _ = _enroll(conn, record['event_id'], record['user_id'])
+        if status == 'enrolled':
+            enrolled += 1
+        else:
+            errors.append({'row': number, 'error': messages[status]})
+    return enrolled
+
+def _import(chunk_writer, records, chunk_size, tags):
+    """Feed records through chunk_writer, one write transaction per chunk"""
+    imported = 0
+    errors = []
+    try:
+        for chunk in _chunks(enumerate(records, start=1), chunk_size):
+            imported += run_write(chunk_writer, chunk, errors)
+    finally:
+        # Earlier chunks are committed even when a later one fails
+        _notify_write(*tags)
+    errors.sort(key=lambda error: error['row'])
+    return imported, errors
+
+def import_users(records, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Bulk insert users from an iterable of {'name', 'email'} records.
+    Returns (imported count, [{'row': n, 'error': message}, ...]).
+    """
+    return _import(_import_users_chunk, records, chunk_size, ())
+
+def import_events(records, chunk_size=IMPORT_CHUNK_SIZE):
+    """Bulk insert events from an iterable of records; returns (imported count, row errors)"""
+    return _import(_import_events_chunk, records, chunk_size, ('events',))
+
+def import_enrollments(records, chunk_size=IMPORT_CHUNK_SIZE):
+    """Bulk enroll users from {'event_id', 'user_id'} records; returns (enrolled count, row errors)"""
+    return _import(_import_enrollments_chunk, records, chunk_size, ('*',))
+
+# Streaming reads
+# Rows fetched from SQLite per fetchmany() call while streaming
+STREAM_BATCH_SIZE = 1000
+
+def _stream_query(sql, params=()):
+    """
+    Run a query on a dedicated connection and return (column names, row iterator).
+    Rows are plain tuples rather than sqlite3.Row, fetched in batches, so a
+    streamed response never holds the whole result. The connection belongs to
+    the iterator, outlives the request's pooled connection, and is closed once
+    the rows are exhausted or the iterator is closed.
+    """
+    conn = _connect(read_only=True)
+    conn.row_factory = None
+    try:
+        cursor = conn.execute(sql, params)
+    except Exception:
+        conn.close()
+        raise
+    columns = tuple(description[0] for description in cursor.description)
+
+    def rows():
+        try:
+            while True:
+                batch = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            conn.close()
+
+    return columns, rows()
+
+def stream_all_users():
+    """Stream every user as (columns, rows)"""
+    return _stream_query(ALL_USERS_QUERY)
+
+def stream_all_events():
+    """Stream every event with creator name as (columns, rows)"""
+    return _stream_query(ALL_EVENTS_QUERY)
+
+def stream_event_enrollments(event_id):
+    """Stream the users enrolled in an event as (columns, rows)"""
+    return _stream_query(EVENT_ENROLLMENTS_QUERY, (event_id,))
+
+def stream_user_enrollments(user_id):
+    """Stream the events a user is enrolled in as (columns, rows)"""
+    return _stream_query(USER_ENROLLMENTS_QUERY, (user_id,))
+
+# Live event updates
+# Rows kept in event_changes by trg_event_changes_prune (migration 8)
+EVENT_CHANGES_KEPT = 10000
+
+def get_event_changes(after, limit=1000):
+    """
+    Changes to events after change number `after`, oldest first, as rows of
+    (seq, event_id, enrolled_count, max_participants). The counts are NULL
+    when the event has been deleted. An event changed several times appears
+    once per change.
+    """
+    conn = get_db_connection()
+    changes = conn.execute('''
+        SELECT c.seq, c.event_id, e.enrolled_count, e.max_participants
+        FROM event_changes c
+        LEFT JOIN events e ON e.id = c.event_id
+        WHERE c.seq > ?
+        ORDER BY c.seq
+        LIMIT ?
+    ''', (after, limit)).fetchall()
+    return changes
+
+def latest_event_change():
+    """Number of the newest change in event_changes, 0 when there is none"""
+    conn = get_db_connection()
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM event_changes').fetchone()[0]
+
+# Archiving
+ARCHIVE_EVENT_COLUMNS = ('id, title, description, event_type, location, event_date, event_time, '
+                         'max_participants, created_by, created_at, enrolled_count')
+
+ARCHIVE_ENROLLMENT_COLUMNS = 'id, event_id, user_id, enrolled_at'
+
+def _copy_archive_batch(conn, before, batch_size):
+    """
+    Make the archive hold an exact copy of up to batch_size events dated
+    before `before` and their enrollments, inside an open write transaction
+    that only changes the archive file. Returns the ids of the copied events.
+    """
+    ids = [row[0] for row in conn.execute(
+        'SELECT id FROM main.events WHERE event_date < ? ORDER BY event_date LIMIT ?', (before, batch_size)
+    )]
+    if not ids:
+        return ids
+    marks = ', '.join('?' * len(ids))
+    conn.execute(f'''
+        INSERT OR REPLACE INTO archive.events ({ARCHIVE_EVENT_COLUMNS})
+        SELECT {ARCHIVE_EVENT_COLUMNS} FROM main.events WHERE id IN ({marks})
+    ''', ids)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO archive.enrollments ({ARCHIVE_ENROLLMENT_COLUMNS})
+        SELECT {ARCHIVE_ENROLLMENT_COLUMNS} FROM main.enrollments WHERE event_id IN ({marks})
+    ''', ids)
+    # Left over from an earlier copy of an event whose enrollments changed before it was deleted
+    conn.execute(f'''
+        DELETE FROM archive.enrollments
+        WHERE event_id IN ({marks}) AND id NOT IN (SELECT id FROM main.enrollments WHERE event_id IN ({marks}))
+    ''', ids + ids)
+    return ids
+
+def _delete_archived_batch(conn, ids):
+    """
+    Delete the events in ids whose archive copy matches the live rows, with
+    their enrollments and waitlist, inside an open write transaction that only
+    changes the main file. An event changed since it was copied is left for
+    the next batch. Returns (events, enrollments) deleted.
+    """
+    marks = ', '.join('?' * len(ids))
+    ids = [row[0] for row in conn.execute(f'''
+        SELECT id FROM main.events e
+        WHERE id IN ({marks})
+          AND NOT EXISTS (SELECT {ARCHIVE_EVENT_COLUMNS} FROM main.events WHERE id = e.id
+                          EXCEPT SELECT {ARCHIVE_EVENT_COLUMNS} FROM archive.events WHERE id = e.id)
+          AND NOT EXISTS (SELECT {ARCHIVE_ENROLLMENT_COLUMNS} FROM main.enrollments WHERE event_id = e.id
+                          EXCEPT SELECT {ARCHIVE_ENROLLMENT_COLUMNS} FROM archive.enrollments WHERE event_id = e.id)
+    ''', ids)]
+    if not ids:
+        return 0, 0
+    marks = ', '.join('?' * len(ids))
+    conn.execute(f'''
+        INSERT INTO stats_archived_event_types (event_type, count)
+        SELECT event_type, COUNT(*) FROM main.events WHERE id IN ({marks}) GROUP BY event_type
+        ON CONFLICT(event_type) DO UPDATE SET count = count + excluded.count
+    ''', ids)
+    conn.execute(f'DELETE FROM main.waitlist WHERE event_id IN ({marks})', ids)
+    # Events go first, so trg_enrollments_count_delete finds no event to update per enrollment
+    conn.execute(f'DELETE FROM main.events WHERE id IN ({marks})', ids)
+    enrollments = conn.execute(f'DELETE FROM main.enrollments WHERE event_id IN ({marks})', ids).rowcount
+    conn.executemany('''
+        INSERT INTO stats_counters (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+    ''', [('archived_events', len(ids)), ('archived_enrollments', enrollments)])
+    return len(ids), enrollments
+
+def archive_events(before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move every event dated before `before` (an ISO date) and its enrollments
+    from the live tables into the archive database, batch_size events at a
+    time so enrollments and other writes are never held up for long. Waitlist
+    entries of those events are dropped. The live indexes then only cover
+    current events, so request-path queries stay as fast as the history
+    grows. Returns (events, enrollments) moved.
+
+    Each batch is copied and committed first, then deleted from the live
+    tables in a second transaction. SQLite commits attached WAL databases one
+    file at a time, so a single transaction could lose a batch in a crash
+    between the two commits; this way a crash leaves at most a copy that the
+    next run replaces.
+    """
+    if not ARCHIVE_DATABASE_NAME:
+        raise RuntimeError('No archive database is configured')
+    events = enrollments = 0
+    try:
+        while True:
+            ids = run_write(_copy_archive_batch, before, batch_size)
+            if not ids:
+                break
+            moved_events, moved_enrollments = run_write(_delete_archived_batch, ids)
+            events += moved_events
+            enrollments += moved_enrollments
+            # Events that changed in between are copied again by the next run
+            if len(ids) < batch_size or not moved_events:
+                break
+    finally:
+        if events:
+            _notify_write('*')
+    return events, enrollments
+
+# Maintenance
+# Rows sampled per index by the periodic ANALYZE, which keeps it cheap on large tables
+ANALYZE_LIMIT = 1000
+# Full-text index pages merged per run; a full 'optimize' would rewrite the whole index
+FTS_MERGE_PAGES = 500
+
+def optimize_database():
+    """
+    Refresh the planner statistics with a sampled ANALYZE and do a bounded
+    amount of full-text index segment merging. Meant for a periodic job.
+    """
+    with write_connection() as conn:
+        conn.execute(f'PRAGMA analysis_limit = {ANALYZE_LIMIT}')
+        _analyze(conn)
+        conn.execute("INSERT INTO events_fts (events_fts, rank) VALUES ('merge', ?)", (FTS_MERGE_PAGES,))
+        conn.commit()
+        conn.execute('PRAGMA analysis_limit = 0')
+
+def checkpoint_wal():
+    """
+    Copy the WAL back into the database and truncate it, so it does not grow
+    while readers keep it busy. Returns (busy, wal frames, frames checkpointed).
+    """
+    with write_connection() as conn:
+        return tuple(conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone())
+
+def vacuum_database():
+    """Rebuild the database file to reclaim free pages. Blocks every writer while it runs."""
+    with write_connection() as conn:
+        conn.execute('VACUUM')
+
+# Background job bookkeeping
+def claim_job_run(name, interval, owner):
+    """
+    Claim this interval's run of an exclusive background job for owner.
+    Returns True in exactly one of the processes that ask within an interval.
+    A run becomes due again once 90% of the interval has passed, so timer
+    jitter in the process that ran it last does not make everyone skip a turn.
+    """
+    now = time.time()
+    with write_connection() as conn:
+        cursor = conn.execute('''
+            INSERT INTO job_runs (name, owner, started_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+            SET owner = excluded.owner, started_at = excluded.started_at,
+                finished_at = NULL, duration = NULL, error = NULL
+            WHERE job_runs.started_at <= ?
+        ''', (name, owner, now, now - interval * 0.9))
+        conn.commit()
+    return cursor.rowcount == 1
+
+def finish_job_run(name, owner, seconds, error=None):
+    """Record how the run of a background job started by owner ended"""
+    with write_connection() as conn:
+        conn.execute('''
+            INSERT INTO job_runs (name, owner, started_at, finished_at, duration, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+            SET owner = excluded.owner, started_at = excluded.started_at,
+                finished_at = excluded.finished_at, duration = excluded.duration, error = excluded.error
+        ''', (name, owner, time.time() - seconds, time.time(), seconds, error))
+        conn.commit()
+
+def get_job_runs():
+    """Last recorded run of every background job, across all worker processes"""
+    conn = get_db_connection()
+    runs = conn.execute('SELECT * FROM job_runs ORDER BY name').fetchall()
+    return runs
+
+# Query plan checks
+# Request-path functions whose queries must be answered through an index, as
+# (function, args) or (function, args, plan steps). The plan steps are full
+# reads the function makes by design; anything else that scans is reported.
+HOT_QUERIES = [
+    # The unpaged list returns every event, so it may walk the whole date index, but not sort
+    (get_all_events, (), ('SCAN e USING INDEX idx_events_date',)),
+    (get_events_page, (('2030-01-01', 1), DEFAULT_PAGE_SIZE, 'hiking', '2020-01-01', '2030-12-31')),
+    (get_users_page, (1,)),
+    (get_upcoming_events, ('hiking',)),
+    (search_events, ('hik', 'hiking', '2020-01-01', '2030-12-31')),
+    (get_user_by_id, (1,)),
+    (get_user_by_email, ('hiker@example.com',)),
+    (get_event_by_id, (1,)),
+    (get_event_enrollments, (1,)),
+    (get_user_enrollments, (1,)),
+    (get_events_page, (('2030-01-01', 1), DEFAULT_PAGE_SIZE, 'hiking', '2020-01-01', '2030-12-31',
+                       None, tuple(EVENT_FIELDS), True)),
+    (get_event_by_id, (1, True)),
+    (get_event_enrollments, (1, True)),
+    (get_user_enrollments, (1, True)),
+    (_read_enrollment_stats, ()),
+    (get_event_changes, (0,)),
+    (latest_event_change, ()),
+]
+
+# Summary tables with one row per counter or event type, and the two halves
+# of an archived events page, each LIMITed to one page, where a scan is expected
+BOUNDED_TABLES = {'stats_counters', 'stats_event_types', 'stats_archived_event_types', 'live_page', 'archive_page'}
+
+def explain_query_plan(conn, sql, parameters=()):
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a statement, or [] when it
+    has no plan. Runs on a plain cursor so query listeners do not see it.
+    """
+    if parameters is None:
+        return []
+    try:
+        cursor = sqlite3.Cursor(conn)
+        return [row[3] for row in cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+    except sqlite3.Error:
+        return []
+
+def check_query_plans():
+    """
+    Runs every hot query against an empty in-memory copy of the schema and
+    returns a list of (function name, sql, plan step) for each full scan: a
+    table scan, or a walk over a whole index in a statement without a LIMIT
+    or one that sorts before applying it. Steps the entry lists as expected
+    are not reported. An empty list means every hot query is served by an index.
+    """
+    conn = sqlite3.connect(':memory:', check_same_thread=False, factory=_TimedConnection)
+    conn.row_factory = sqlite3.Row
+    init_db(conn)
+    conn.execute("ATTACH DATABASE ':memory:' AS archive")
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    conn.has_archive = True
+    
+    previous = getattr(_local, 'conn', None), getattr(_local, 'snapshot', None)
+    _local.conn = conn
+    _local.snapshot = (_snapshot['generation'], conn)
+    problems = []
+    try:
+        for func, args, *expected in HOT_QUERIES:
+            expected = expected[0] if expected else ()
+            statements = []
+            conn.set_trace_callback(statements.append)
+            func(*args)
+            conn.set_trace_callback(None)
+            
+            for sql in statements:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                steps = [row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+                # An index walked in order stops after LIMIT rows, unless the rows are sorted first
+                limited = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) and 'USE TEMP B-TREE FOR ORDER BY' not in steps
+                for step in steps:
+                    scan = re.match(r'SCAN (?:TABLE )?(\S+)(?: AS \S+)?( USING (?:COVERING )?INDEX \S+)?$', step)
+                    if (scan and scan.group(1) not in BOUNDED_TABLES and step not in expected
+                            and not (scan.group(2) and limited)):
+                        problems.append((func.__name__, ' '.join(sql.split()), step))
+    finally:
+        _local.conn, _local.snapshot = previous
+        conn.close()
+    return problems
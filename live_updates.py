@@ -0,0 +1,170 @@
+# live_updates.py - One broadcaster thread fanning change messages out to many Server-Sent Events streams
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class ChangeBroadcaster:
+    """
+    Polls a change feed on one background thread and keeps the most recent
+    messages in a ring buffer that any number of subscribers read from.
+    fetch(after) must return (since, cursor, payload): payload describes every
+    change after cursor `since` up to `cursor`, or is None when nothing
+    changed. since is after, unless older changes were already discarded;
+    fetch(None) only returns the current cursor.
+
+    The thread polls every poll_interval seconds and right away after wake(),
+    so changes committed by this process go out immediately and those
+    committed by other worker processes within one interval. Polls are at
+    least min_interval apart, so a burst of writes reaches subscribers as a
+    few combined messages instead of one message per write. Subscribers
+    hold no thread or database connection of their own: they wait on a
+    shared condition, so each change costs one query however many are
+    listening. The thread starts with the first subscriber.
+
+    Coroutines use latest_async() and listen_async() instead. They wait on
+    one future per event loop, so a change costs one call_soon_threadsafe()
+    per loop rather than one per subscriber. Their timeouts share that
+    future's timer too, so a call may wait up to twice its timeout.
+    """
+
+    def __init__(self, fetch, poll_interval=1.0, backlog=256, min_interval=0.0):
+        self.fetch = fetch
+        self.poll_interval = poll_interval
+        self.min_interval = min_interval
+        self._messages = deque(maxlen=backlog)
+        self._cursor = None
+        self._condition = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+        # Event loop -> future resolved on the next change, shared by that loop's subscribers
+        self._loop_futures = {}
+
+    def wake(self):
+        """Poll the feed now instead of at the next interval"""
+        self._wake.set()
+
+    def latest(self, timeout=None):
+        """Cursor of the newest change, waiting up to timeout seconds for the first poll"""
+        self._ensure_started()
+        with self._condition:
+            self._condition.wait_for(lambda: self._cursor is not None, timeout)
+            return self._cursor
+
+    def listen(self, after, timeout):
+        """
+        Wait up to timeout seconds for changes after cursor `after` and return
+        them as a list of (cursor, payload). Returns [(cursor, None)] when some
+        of those changes are no longer buffered and the subscriber has to
+        reload everything.
+        """
+        self._ensure_started()
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._cursor is not None and self._cursor > after, timeout):
+                return []
+            return self._changes_after(after)
+
+    async def latest_async(self, timeout):
+        """latest() for coroutines: waits without blocking the event loop"""
+        if not await self._wait_async(lambda: self._cursor is not None, timeout):
+            return None
+        with self._condition:
+            return self._cursor
+
+    async def listen_async(self, after, timeout):
+        """listen() for coroutines: waits without blocking the event loop"""
+        if not await self._wait_async(lambda: self._cursor is not None and self._cursor > after, timeout):
+            return []
+        with self._condition:
+            return self._changes_after(after)
+
+    async def _wait_async(self, predicate, timeout):
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._condition:
+                if predicate():
+                    return True
+                if loop.time() >= deadline:
+                    return False
+                future = self._loop_futures.get(loop)
+                if future is None:
+                    future = self._loop_futures[loop] = loop.create_future()
+                    # One timer per future rather than per subscriber; a subscriber
+                    # it wakes before its own deadline waits on the next future
+                    loop.call_later(timeout, self._expire, loop, future)
+            # Shielded, so a cancelled subscriber does not cancel the future the others share
+            await asyncio.shield(future)
+
+    def _expire(self, loop, future):
+        with self._condition:
+            if self._loop_futures.get(loop) is future:
+                del self._loop_futures[loop]
+        _resolve(future)
+
+    def _changes_after(self, after):
+        newer = [message for message in self._messages if message[1] > after]
+        if not newer or newer[0][0] > after:
+            return [(self._cursor, None)]
+        return [(cursor, payload) for _, cursor, payload in newer]
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='change-broadcaster', daemon=True)
+                self._thread.start()
+
+    def _poll(self, cursor):
+        since, cursor, payload = self.fetch(cursor)
+        with self._condition:
+            if payload is not None:
+                self._messages.append((since, cursor, payload))
+            # Waking every subscriber for an empty poll would cost more than the poll
+            if cursor != self._cursor:
+                self._cursor = cursor
+                self._condition.notify_all()
+                self._wake_loops()
+        return cursor
+
+    def _wake_loops(self):
+        for loop, future in self._loop_futures.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # The loop has been closed
+        self._loop_futures.clear()
+
+    def _run(self):
+        cursor = None
+        while True:
+            polled = time.monotonic()
+            try:
+                cursor = self._poll(cursor)
+            except Exception:
+                logger.exception('Polling the change feed failed')
+            self._wake.wait(self.poll_interval)
+            # Writes arriving while this sleeps go out together in the next poll
+            time.sleep(max(0.0, polled + self.min_interval - time.monotonic()))
+            self._wake.clear()
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+def format_sse(data, event=None, id=None):
+    """Encode one Server-Sent Events message"""
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
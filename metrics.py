@@ -0,0 +1,191 @@
+# metrics.py - Request, SQL and QR render instrumentation in Prometheus text format
+
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, shared by the latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds for the number of SQL statements issued by one request
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Upper bounds for the number of requests group-committed in one write transaction
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Monotonic counter with an optional set of labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+class Histogram:
+    """Cumulative histogram with fixed bucket upper bounds and an optional set of labels"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket plus +Inf, then the running sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), series):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == '+Inf' else f'le="{_number(bound)}"'
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {series[-1]!r}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+class Registry:
+    """Named collection of metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request, including a streamed body.',
+    ('method', 'route', 'status')))
+request_statements = registry.register(Histogram(
+    'http_request_sql_statements', 'SQL statements issued while handling one request.',
+    ('route',), STATEMENT_BUCKETS))
+sql_duration = registry.register(Histogram(
+    'sql_statement_duration_seconds', 'Time spent executing SQL statements, by leading keyword.',
+    ('operation',)))
+slow_requests = registry.register(Counter(
+    'http_slow_requests_total', 'Requests slower than SLOW_REQUEST_SECONDS.', ('route',)))
+slow_queries = registry.register(Counter(
+    'sql_slow_statements_total', 'SQL statements slower than SLOW_QUERY_SECONDS.', ('operation',)))
+qr_render_duration = registry.register(Histogram(
+    'qr_render_duration_seconds', 'Time spent encoding one QR code PNG.'))
+write_batch_size = registry.register(Histogram(
+    'write_queue_batch_size', 'Enrollment requests group-committed in one transaction.', (), BATCH_BUCKETS))
+write_batch_duration = registry.register(Histogram(
+    'write_queue_batch_duration_seconds', 'Time spent writing and committing one group-commit batch.'))
+job_duration = registry.register(Histogram(
+    'background_job_duration_seconds', 'Time spent running one background job.', ('job',),
+    LATENCY_BUCKETS + (30.0, 60.0, 300.0)))
+job_failures = registry.register(Counter(
+    'background_job_failures_total', 'Background job runs that raised an exception.', ('job',)))
+admission_rejections = registry.register(Counter(
+    'http_admission_rejections_total', 'Requests turned away by a rate limit (429) or a full concurrency gate (503).',
+    ('endpoint_class', 'reason')))
+
+class RequestStats:
+    """SQL statement count and time accumulated by the request running on a thread"""
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+_local = threading.local()
+
+def start_request():
+    """Begin counting SQL statements for the request on this thread and return its stats"""
+    stats = _local.stats = RequestStats()
+    return stats
+
+def finish_request():
+    """Stop counting SQL statements for the request on this thread"""
+    _local.stats = None
+
+def statement_operation(sql):
+    """Leading keyword of a statement, used as a low-cardinality label"""
+    words = sql.split(None, 1)
+    return words[0].upper() if words else 'UNKNOWN'
+
+def record_query(sql, seconds):
+    """Record one SQL statement against the global histogram and the current request"""
+    sql_duration.observe(seconds, operation=statement_operation(sql))
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += seconds
+
+def record_request(method, route, status, seconds, stats):
+    """Record a finished request"""
+    request_duration.observe(seconds, method=method, route=route, status=str(status))
+    request_statements.observe(stats.statements, route=route)
+
+def record_write_batch(size, seconds):
+    """Record one batch committed by the enrollment write queue"""
+    write_batch_size.observe(size)
+    write_batch_duration.observe(seconds)
+
+def record_job(name, seconds, error):
+    """Record one finished background job run"""
+    job_duration.observe(seconds, job=name)
+    if error is not None:
+        job_failures.inc(job=name)
+
+def record_rejection(endpoint_class, reason):
+    """Record one request turned away by admission control; reason is 'rate_limited' or 'overloaded'"""
+    admission_rejections.inc(endpoint_class=endpoint_class, reason=reason)
+
+def log_slow_request(method, route, status, seconds, stats):
+    slow_requests.inc(route=route)
+    logger.warning('Slow request: %s %s -> %s in %.1f ms (%d SQL statements, %.1f ms in SQL)',
+                   method, route, status, seconds * 1000, stats.statements, stats.sql_seconds * 1000)
+
+def log_slow_query(sql, seconds, plan):
+    slow_queries.inc(operation=statement_operation(sql))
+    logger.warning('Slow query (%.1f ms): %s\nQuery plan:\n  %s', seconds * 1000,
+                   ' '.join(sql.split()), '\n  '.join(plan) if plan else '(not available)')
@@ -0,0 +1,192 @@
+# qr_codes.py - QR code rendering and caching for Route Venture
+
+import glob
+import hashlib
+import io
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+
+ERROR_CORRECTION_LEVELS = ('L', 'M', 'Q', 'H')
+
+def render_qr_png(data, box_size=10, error_correction='L', border=4):
+    """Encode data as a QR code and return the PNG image bytes"""
+    # qrcode pulls in Pillow, which processes that never render a code should not load
+    import qrcode
+    
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=getattr(qrcode.constants, f'ERROR_CORRECT_{error_correction}'),
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    img_io = io.BytesIO()
+    img.save(img_io, 'PNG')
+    return img_io.getvalue()
+
+def timed_render_qr_png(*args):
+    """render_qr_png() that also returns the seconds spent, measured where it ran"""
+    start = time.perf_counter()
+    png = render_qr_png(*args)
+    return png, time.perf_counter() - start
+
+class QRCodeCache:
+    """
+    LRU cache of rendered QR code PNGs keyed by (event_id, url, box_size, error_correction).
+    When cache_dir is set, rendered images are also written there so they
+    survive restarts and can be shared by several worker processes.
+    on_render(seconds) is called with the encoding time of every cache miss.
+    """
+
+    def __init__(self, max_entries=256, cache_dir=None, on_render=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.on_render = on_render
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, event_id, url, box_size=10, error_correction='L', executor=None):
+        """
+        Return (png_bytes, etag) for the QR code, rendering it on a miss.
+        With executor (for example a ProcessPoolExecutor) the calling thread
+        waits for the render without holding the GIL.
+        """
+        key = (event_id, url, box_size, error_correction)
+        entry = self.lookup(key)
+        if entry is None:
+            if executor is not None:
+                rendered = executor.submit(timed_render_qr_png, url, box_size, error_correction).result()
+            else:
+                rendered = timed_render_qr_png(url, box_size, error_correction)
+            entry = self.put_rendered(key, *rendered)
+        return entry
+
+    def lookup(self, key):
+        """Return the cached (png_bytes, etag) for key from memory or disk, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        png = self._read_file(key)
+        if png is None:
+            return None
+        return self._remember(key, png)
+
+    def put(self, key, png):
+        """Store a freshly rendered PNG under key and return (png_bytes, etag)"""
+        self._write_file(key, png)
+        return self._remember(key, png)
+
+    def put_rendered(self, key, png, seconds):
+        """put() a PNG returned by timed_render_qr_png(), reporting its render time"""
+        if self.on_render is not None:
+            self.on_render(seconds)
+        return self.put(key, png)
+
+    def _remember(self, key, png):
+        entry = (png, hashlib.sha1(png).hexdigest())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, event_id):
+        """Drop every cached image for an event, in memory and on disk"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == event_id]:
+                del self._entries[key]
+        if self.cache_dir:
+            for path in glob.glob(os.path.join(self.cache_dir, f'{event_id}-*.png')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key[1:]).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{key[0]}-{digest}.png')
+
+    def _read_file(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, key, png):
+        if not self.cache_dir:
+            return
+        # Write to a temporary name first so readers never see a partial file
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path)
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only, unseekable sink that collects bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_qr_zip(entries, cache, executor=None, window=16):
+    """
+    Yield a ZIP archive of QR code PNGs chunk by chunk as they are rendered.
+    entries is an iterable of (filename, (event_id, url, box_size, error_correction)).
+    Cache misses are rendered on executor (for example a ProcessPoolExecutor)
+    up to window images ahead of the writer, so large batches use every core.
+    """
+    pending = deque()
+    entries = iter(entries)
+
+    def schedule():
+        for filename, key in entries:
+            entry = cache.lookup(key)
+            if entry is not None:
+                pending.append((filename, key, entry[0]))
+            elif executor is not None:
+                pending.append((filename, key, executor.submit(timed_render_qr_png, *key[1:])))
+            else:
+                pending.append((filename, key, cache.put_rendered(key, *timed_render_qr_png(*key[1:]))[0]))
+            if len(pending) >= window:
+                return
+
+    sink = _ChunkWriter()
+    # PNGs are already compressed, so store them as-is
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        schedule()
+        while pending:
+            filename, key, png = pending.popleft()
+            if not isinstance(png, bytes):
+                png = cache.put_rendered(key, *png.result())[0]
+            archive.writestr(filename, png)
+            yield sink.drain()
+            schedule()
+    yield sink.drain()
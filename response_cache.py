@@ -0,0 +1,197 @@
+# response_cache.py - Server-side cache of rendered API responses for Route Venture
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Tag carried by every entry, bumped by writes that touch arbitrary rows
+ALL = '*'
+
+class MemoryBackend:
+    """
+    Per-process LRU store bounded by the total size of cached bodies.
+    Only sees invalidations made in the same process, so use SQLiteBackend
+    when several workers serve the API.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = len(entry['body'])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old['body'])
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted['body'])
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+class SQLiteBackend:
+    """
+    LRU store kept in its own SQLite file, so every worker process on the host
+    shares both the cached bodies and the tag versions that invalidate them.
+    """
+
+    # Refresh an entry's LRU timestamp at most this often, to keep hits read-only
+    TOUCH_INTERVAL = 10
+
+    def __init__(self, path, max_bytes=32 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                mimetype TEXT NOT NULL,
+                etag TEXT NOT NULL,
+                last_modified REAL NOT NULL,
+                versions TEXT NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache(accessed);
+            CREATE TABLE IF NOT EXISTS response_cache_tags (
+                tag TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute('''
+            SELECT body, mimetype, etag, last_modified, versions, accessed
+            FROM response_cache WHERE key = ?
+        ''', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[5] > self.TOUCH_INTERVAL:
+            conn.execute('UPDATE response_cache SET accessed = ? WHERE key = ?', (now, key))
+        return {'body': row[0], 'mimetype': row[1], 'etag': row[2],
+                'last_modified': row[3], 'versions': json.loads(row[4])}
+
+    def set(self, key, entry):
+        if len(entry['body']) > self.max_bytes:
+            return
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO response_cache
+                (key, body, mimetype, etag, last_modified, versions, accessed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, entry['body'], entry['mimetype'], entry['etag'],
+                  entry['last_modified'], json.dumps(entry['versions']), time.time()))
+            # Evict least recently used entries until the bodies fit again
+            conn.execute('''
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(LENGTH(body)) OVER (ORDER BY accessed DESC, key) AS running
+                        FROM response_cache
+                    ) WHERE running > ?
+                )
+            ''', (self.max_bytes,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def versions(self, tags):
+        rows = dict(self._conn().execute(
+            f"SELECT tag, version FROM response_cache_tags WHERE tag IN ({', '.join('?' * len(tags))})",
+            list(tags)
+        ).fetchall())
+        return [rows.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        self._conn().executemany('''
+            INSERT INTO response_cache_tags (tag, version) VALUES (?, 1)
+            ON CONFLICT(tag) DO UPDATE SET version = version + 1
+        ''', [(tag,) for tag in tags])
+
+class ResponseCache:
+    """
+    Cache of response bodies keyed by request path and query string.
+    Each entry records the versions of the tags it was built from (for example
+    'events' or 'event:3'); invalidate() bumps tag versions, and an entry whose
+    recorded versions no longer match is treated as a miss.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def lookup(self, key, tags):
+        """
+        Return (entry or None, current tag versions).
+        Read the versions before running the query on a miss and pass them to
+        store(), so a write that lands mid-query leaves the new entry stale.
+        """
+        tags = [ALL, *tags]
+        versions = self.backend.versions(tags)
+        entry = self.backend.get(key)
+        if entry is not None and entry['versions'] == versions:
+            return entry, versions
+        return None, versions
+
+    def store(self, key, versions, body, mimetype):
+        """Cache a rendered body under key and return its entry"""
+        entry = {
+            'body': body,
+            'mimetype': mimetype,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'last_modified': time.time(),
+            'versions': versions,
+        }
+        self.backend.set(key, entry)
+        return entry
+
+    def invalidate(self, tags):
+        """Mark every entry built from any of tags as stale"""
+        if tags:
+            self.backend.bump(tags)
+
+def create_backend(kind, path=None, max_bytes=32 * 1024 * 1024):
+    """Build the backend named by config: 'memory' or 'sqlite'"""
+    if kind == 'memory':
+        return MemoryBackend(max_bytes)
+    if kind == 'sqlite':
+        return SQLiteBackend(path, max_bytes)
+    raise ValueError(f'Unknown response cache backend: {kind}')
@@ -0,0 +1,140 @@
+# scheduler.py - In-process scheduler for periodic and one-shot background jobs
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A function run every interval seconds, or once when interval is None"""
+
+    def __init__(self, name, func, interval=None, exclusive=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.exclusive = exclusive
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_error = None
+
+    def status(self):
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'exclusive': self.exclusive,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_started': self.last_started,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+        }
+
+class Scheduler:
+    """
+    Runs jobs on a small thread pool. A dispatcher thread sleeps until the
+    next job is due; a periodic job that is still running when it comes due
+    again skips that turn rather than overlapping itself.
+
+    Exclusive jobs are meant to run in only one of several worker processes:
+    before each run the scheduler calls claim(name, interval), which must
+    return True in exactly one process per interval. on_finish(name, seconds,
+    error) is called after every run with error None on success.
+
+    Threads are started by start(), so a scheduler created before gunicorn
+    forks its workers should be started in each worker.
+    """
+
+    def __init__(self, workers=2, claim=None, on_finish=None):
+        self.workers = workers
+        self.claim = claim
+        self.on_finish = on_finish
+        self.jobs = {}
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = None
+        self._thread = None
+
+    def every(self, name, interval, func, exclusive=False, delay=None):
+        """Run func() every interval seconds, first after delay (default: one interval)"""
+        job = self.jobs[name] = Job(name, func, interval, exclusive)
+        self._push(job, interval if delay is None else delay)
+        return job
+
+    def once(self, name, func, delay=0):
+        """Run func() once after delay seconds"""
+        job = self.jobs[name] = Job(name, func)
+        self._push(job, delay)
+        return job
+
+    def status(self):
+        """Run counts and timings of every job known to this process"""
+        with self._condition:
+            return [job.status() for job in self.jobs.values()]
+
+    def start(self):
+        """Start the dispatcher and worker threads; does nothing when already running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._thread = threading.Thread(target=self._dispatch, name='job-scheduler', daemon=True)
+            self._thread.start()
+
+    def _push(self, job, delay):
+        with self._condition:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._order), job))
+            self._condition.notify()
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    self._condition.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                _, _, job = heapq.heappop(self._queue)
+                if job.interval is not None:
+                    heapq.heappush(self._queue, (time.monotonic() + job.interval, next(self._order), job))
+                elif self.jobs.get(job.name) is job:
+                    del self.jobs[job.name]
+                if job.running:
+                    job.skipped += 1
+                    continue
+                job.running = True
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            if job.exclusive and self.claim is not None and not self.claim(job.name, job.interval):
+                job.skipped += 1
+                return
+            job.last_started = time.time()
+            start = time.perf_counter()
+            error = None
+            try:
+                job.func()
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+                logger.exception('Background job %s failed', job.name)
+            seconds = time.perf_counter() - start
+            job.runs += 1
+            job.failures += error is not None
+            job.last_duration = seconds
+            job.last_error = error
+            if self.on_finish is not None:
+                self.on_finish(job.name, seconds, error)
+        except Exception:
+            logger.exception('Bookkeeping for background job %s failed', job.name)
+        finally:
+            job.running = False
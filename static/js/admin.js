@@ -2,61 +2,80 @@
 
 let deleteType = '';
 let deleteId = null;
+let eventsCursor = null;
+let usersCursor = null;
+const PAGE_SIZE = 50;
 
 // Initialize page
 document.addEventListener('DOMContentLoaded', function() {
-    loadDashboardStats();
-    loadEvents();
-    loadUsers();
-    loadStatistics();
+    loadDashboard();
 });
 
-// Load dashboard statistics
-async function loadDashboardStats() {
+// Run several GET API calls in one round trip; resolves to [{status, body}, ...]
+async function fetchBatch(paths) {
+    const response = await fetch('/api/batch', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ requests: paths })
+    });
+    if (!response.ok) {
+        throw new Error(`Batch request failed with status ${response.status}`);
+    }
+    return (await response.json()).responses;
+}
+
+// Load stats and the first page of events and users with a single request
+async function loadDashboard() {
+    try {
+        const [stats, events, users] = await fetchBatch([
+            '/api/admin/stats',
+            `/api/events?limit=${PAGE_SIZE}`,
+            `/api/users?limit=${PAGE_SIZE}`
+        ]);
+        renderDashboardStats(stats.body);
+        renderStatistics(stats.body);
+        renderEvents(events.body, false);
+        renderUsers(users.body, false);
+    } catch (error) {
+        console.error('Error loading dashboard:', error);
+        loadStats();
+        loadEvents();
+        loadUsers();
+    }
+}
+
+// Fetch statistics once and render both the summary cards and the statistics tab
+async function loadStats() {
     try {
         const response = await fetch('/api/admin/stats');
         const stats = await response.json();
         
-        document.getElementById('totalUsers').textContent = stats.total_users;
-        document.getElementById('totalEvents').textContent = stats.total_events;
-        document.getElementById('totalEnrollments').textContent = stats.total_enrollments;
-        document.getElementById('upcomingEvents').textContent = stats.upcoming_events;
+        renderDashboardStats(stats);
+        renderStatistics(stats);
     } catch (error) {
         console.error('Error loading stats:', error);
     }
 }
 
-// Load all events
-async function loadEvents() {
+// Render dashboard statistics
+function renderDashboardStats(stats) {
+    document.getElementById('totalUsers').textContent = stats.total_users;
+    document.getElementById('totalEvents').textContent = stats.total_events;
+    document.getElementById('totalEnrollments').textContent = stats.total_enrollments;
+    document.getElementById('upcomingEvents').textContent = stats.upcoming_events;
+}
+
+// Load the first page of events, or the next page when append is true
+async function loadEvents(append = false) {
     try {
-        const response = await fetch('/api/events');
-        const events = await response.json();
-        
-        const tbody = document.getElementById('eventsTableBody');
-        
-        if (events.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="7" class="text-center">No events found</td></tr>';
-            return;
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (append && eventsCursor) {
+            params.set('after', eventsCursor);
         }
-        
-        tbody.innerHTML = events.map(event => `
-            <tr>
-                <td>${event.id}</td>
-                <td><strong>${event.title}</strong></td>
-                <td><span class="badge bg-success">${event.event_type}</span></td>
-                <td>${new Date(event.event_date).toLocaleDateString()}</td>
-                <td>${event.location}</td>
-                <td>${event.enrolled_count}${event.max_participants ? '/' + event.max_participants : ''}</td>
-                <td>
-                    <button class="btn btn-sm btn-info" onclick="viewEventDetails(${event.id})" title="View Details">
-                        <i class="bi bi-eye"></i>
-                    </button>
-                    <button class="btn btn-sm btn-danger" onclick="confirmDelete('event', ${event.id}, '${event.title}')" title="Delete">
-                        <i class="bi bi-trash"></i>
-                    </button>
-                </td>
-            </tr>
-        `).join('');
+        const response = await fetch(`/api/events?${params}`);
+        renderEvents(await response.json(), append);
     } catch (error) {
         console.error('Error loading events:', error);
         document.getElementById('eventsTableBody').innerHTML = 
@@ -64,35 +83,53 @@ async function loadEvents() {
     }
 }
 
-// Load all users
-async function loadUsers() {
+// Render a page of events into the events table
+function renderEvents(page, append) {
+    const events = page.items;
+    const tbody = document.getElementById('eventsTableBody');
+    eventsCursor = page.next_cursor;
+    document.getElementById('loadMoreEvents').classList.toggle('d-none', !eventsCursor);
+    
+    if (!append && events.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="7" class="text-center">No events found</td></tr>';
+        return;
+    }
+    
+    const rows = events.map(event => `
+        <tr>
+            <td>${event.id}</td>
+            <td><strong>${event.title}</strong></td>
+            <td><span class="badge bg-success">${event.event_type}</span></td>
+            <td>${new Date(event.event_date).toLocaleDateString()}</td>
+            <td>${event.location}</td>
+            <td>${event.enrolled_count}${event.max_participants ? '/' + event.max_participants : ''}</td>
+            <td>
+                <button class="btn btn-sm btn-info" onclick="viewEventDetails(${event.id})" title="View Details">
+                    <i class="bi bi-eye"></i>
+                </button>
+                <button class="btn btn-sm btn-danger" onclick="confirmDelete('event', ${event.id}, '${event.title}')" title="Delete">
+                    <i class="bi bi-trash"></i>
+                </button>
+            </td>
+        </tr>
+    `).join('');
+    
+    if (append) {
+        tbody.insertAdjacentHTML('beforeend', rows);
+    } else {
+        tbody.innerHTML = rows;
+    }
+}
+
+// Load the first page of users, or the next page when append is true
+async function loadUsers(append = false) {
     try {
-        const response = await fetch('/api/users');
-        const users = await response.json();
-        
-        const tbody = document.getElementById('usersTableBody');
-        
-        if (users.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="5" class="text-center">No users found</td></tr>';
-            return;
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (append && usersCursor) {
+            params.set('after', usersCursor);
         }
-        
-        tbody.innerHTML = users.map(user => `
-            <tr>
-                <td>${user.id}</td>
-                <td><strong>${user.name}</strong></td>
-                <td>${user.email}</td>
-                <td>${new Date(user.created_at).toLocaleDateString()}</td>
-                <td>
-                    <button class="btn btn-sm btn-info" onclick="viewUserEnrollments(${user.id})" title="View Enrollments">
-                        <i class="bi bi-calendar-check"></i>
-                    </button>
-                    <button class="btn btn-sm btn-danger" onclick="confirmDelete('user', ${user.id}, '${user.name}')" title="Delete">
-                        <i class="bi bi-trash"></i>
-                    </button>
-                </td>
-            </tr>
-        `).join('');
+        const response = await fetch(`/api/users?${params}`);
+        renderUsers(await response.json(), append);
     } catch (error) {
         console.error('Error loading users:', error);
         document.getElementById('usersTableBody').innerHTML = 
@@ -100,61 +137,91 @@ async function loadUsers() {
     }
 }
 
-// Load statistics
-async function loadStatistics() {
-    try {
-        const response = await fetch('/api/admin/stats');
-        const stats = await response.json();
-        
-        // Display events by type
-        const eventsByTypeDiv = document.getElementById('eventsByType');
-        if (stats.events_by_type.length > 0) {
-            eventsByTypeDiv.innerHTML = `
-                <div class="list-group">
-                    ${stats.events_by_type.map(item => `
-                        <div class="list-group-item d-flex justify-content-between align-items-center">
-                            <span class="text-capitalize">${item.event_type}</span>
-                            <span class="badge bg-success rounded-pill">${item.count}</span>
-                        </div>
-                    `).join('')}
-                </div>
-            `;
-        } else {
-            eventsByTypeDiv.innerHTML = '<p class="text-muted">No events yet</p>';
-        }
-        
-        // Display popular events
-        const popularEventsDiv = document.getElementById('popularEvents');
-        if (stats.popular_events.length > 0) {
-            popularEventsDiv.innerHTML = `
-                <div class="list-group">
-                    ${stats.popular_events.map((event, index) => `
-                        <div class="list-group-item d-flex justify-content-between align-items-center">
-                            <div>
-                                <span class="badge bg-warning me-2">#${index + 1}</span>
-                                <span>${event.title}</span>
-                            </div>
-                            <span class="badge bg-success rounded-pill">${event.enrollment_count} enrolled</span>
+// Render a page of users into the users table
+function renderUsers(page, append) {
+    const users = page.items;
+    const tbody = document.getElementById('usersTableBody');
+    usersCursor = page.next_cursor;
+    document.getElementById('loadMoreUsers').classList.toggle('d-none', !usersCursor);
+    
+    if (!append && users.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="5" class="text-center">No users found</td></tr>';
+        return;
+    }
+    
+    const rows = users.map(user => `
+        <tr>
+            <td>${user.id}</td>
+            <td><strong>${user.name}</strong></td>
+            <td>${user.email}</td>
+            <td>${new Date(user.created_at).toLocaleDateString()}</td>
+            <td>
+                <button class="btn btn-sm btn-info" onclick="viewUserEnrollments(${user.id})" title="View Enrollments">
+                    <i class="bi bi-calendar-check"></i>
+                </button>
+                <button class="btn btn-sm btn-danger" onclick="confirmDelete('user', ${user.id}, '${user.name}')" title="Delete">
+                    <i class="bi bi-trash"></i>
+                </button>
+            </td>
+        </tr>
+    `).join('');
+    
+    if (append) {
+        tbody.insertAdjacentHTML('beforeend', rows);
+    } else {
+        tbody.innerHTML = rows;
+    }
+}
+
+// Render the statistics tab
+function renderStatistics(stats) {
+    // Display events by type
+    const eventsByTypeDiv = document.getElementById('eventsByType');
+    if (stats.events_by_type.length > 0) {
+        eventsByTypeDiv.innerHTML = `
+            <div class="list-group">
+                ${stats.events_by_type.map(item => `
+                    <div class="list-group-item d-flex justify-content-between align-items-center">
+                        <span class="text-capitalize">${item.event_type}</span>
+                        <span class="badge bg-success rounded-pill">${item.count}</span>
+                    </div>
+                `).join('')}
+            </div>
+        `;
+    } else {
+        eventsByTypeDiv.innerHTML = '<p class="text-muted">No events yet</p>';
+    }
+    
+    // Display popular events
+    const popularEventsDiv = document.getElementById('popularEvents');
+    if (stats.popular_events.length > 0) {
+        popularEventsDiv.innerHTML = `
+            <div class="list-group">
+                ${stats.popular_events.map((event, index) => `
+                    <div class="list-group-item d-flex justify-content-between align-items-center">
+                        <div>
+                            <span class="badge bg-warning me-2">#${index + 1}</span>
+                            <span>${event.title}</span>
                         </div>
-                    `).join('')}
-                </div>
-            `;
-        } else {
-            popularEventsDiv.innerHTML = '<p class="text-muted">No enrollments yet</p>';
-        }
-    } catch (error) {
-        console.error('Error loading statistics:', error);
+                        <span class="badge bg-success rounded-pill">${event.enrollment_count} enrolled</span>
+                    </div>
+                `).join('')}
+            </div>
+        `;
+    } else {
+        popularEventsDiv.innerHTML = '<p class="text-muted">No enrollments yet</p>';
     }
 }
 
 // View event details
 async function viewEventDetails(eventId) {
     try {
-        const response = await fetch(`/api/event/${eventId}/enrollments`);
-        const enrollments = await response.json();
-        
-        const eventResponse = await fetch(`/api/event/${eventId}`);
-        const event = await eventResponse.json();
+        const [enrollmentsResponse, eventResponse] = await fetchBatch([
+            `/api/event/${eventId}/enrollments`,
+            `/api/event/${eventId}`
+        ]);
+        const enrollments = enrollmentsResponse.body;
+        const event = eventResponse.body;
         
         alert(`Event: ${event.title}\nEnrolled: ${enrollments.length} people\n\nParticipants:\n${enrollments.map(e => e.name).join('\n')}`);
     } catch (error) {
@@ -165,11 +232,12 @@ async function viewEventDetails(eventId) {
 // View user enrollments
 async function viewUserEnrollments(userId) {
     try {
-        const response = await fetch(`/api/user/${userId}/enrollments`);
-        const enrollments = await response.json();
-        
-        const userResponse = await fetch(`/api/user/${userId}`);
-        const user = await userResponse.json();
+        const [enrollmentsResponse, userResponse] = await fetchBatch([
+            `/api/user/${userId}/enrollments`,
+            `/api/user/${userId}`
+        ]);
+        const enrollments = enrollmentsResponse.body;
+        const user = userResponse.body;
         
         if (enrollments.length === 0) {
             alert(`${user.name} has not enrolled in any events yet.`);
@@ -214,8 +282,7 @@ document.getElementById('confirmDelete').addEventListener('click', async functio
                 loadUsers();
             }
             
-            loadDashboardStats();
-            loadStatistics();
+            loadStats();
         } else {
             alert(`Error: ${data.error}`);
         }
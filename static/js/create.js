@@ -28,8 +28,8 @@ async function handleEventCreation(e) {
     const organizerEmail = document.getElementById('organizerEmail').value;
     
     try {
-        // First, register or get the organizer
-        const userResponse = await fetch('/api/user/add', {
+        // Register the organizer, or look them up if the email is already registered
+        const userResponse = await fetch('/api/user/get-or-create', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -44,14 +44,6 @@ async function handleEventCreation(e) {
         
         if (userResponse.ok) {
             formData.created_by = userData.id;
-        } else if (userResponse.status === 500 && userData.error.includes('UNIQUE')) {
-            // User already exists, try to find them
-            const usersResponse = await fetch('/api/users');
-            const users = await usersResponse.json();
-            const existingUser = users.find(u => u.email === organizerEmail);
-            if (existingUser) {
-                formData.created_by = existingUser.id;
-            }
         }
         
         // Create the event
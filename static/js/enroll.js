@@ -3,14 +3,68 @@
 let currentUserId = null;
 let currentEventId = null;
 let allEvents = [];
+let eventsCursor = null;
+let searchTimer = null;
+let eventsRequest = 0;
+let seatUpdates = null;
+const PAGE_SIZE = 30;
+const SEARCH_DELAY_MS = 250;
 
 // Initialize page
 document.addEventListener('DOMContentLoaded', function() {
     loadEvents();
     setupEventListeners();
     checkStoredUser();
+    subscribeToSeatUpdates();
 });
 
+// Receive seat count changes pushed by the server instead of reloading the list
+function subscribeToSeatUpdates() {
+    if (!window.EventSource) {
+        return;
+    }
+    seatUpdates = new EventSource('/api/events/stream');
+    seatUpdates.addEventListener('seats', e => JSON.parse(e.data).forEach(applySeatUpdate));
+    // Some updates were missed, e.g. after a long disconnect
+    seatUpdates.addEventListener('reset', () => loadEvents());
+    seatUpdates.addEventListener('error', () => {
+        // Browsers reconnect on their own unless the server refused the stream
+        if (seatUpdates.readyState === EventSource.CLOSED) {
+            seatUpdates = null;
+        }
+    });
+}
+
+// Patch one event card with a pushed {event_id, enrolled_count} or {event_id, deleted}
+function applySeatUpdate(update) {
+    const event = allEvents.find(event => event.id === update.event_id);
+    if (!event) {
+        return;
+    }
+    const card = document.querySelector(`[data-event-id="${update.event_id}"]`);
+    if (update.deleted) {
+        allEvents = allEvents.filter(other => other !== event);
+        if (card) {
+            card.remove();
+        }
+        if (allEvents.length === 0) {
+            displayEvents(allEvents);
+        }
+        return;
+    }
+    event.enrolled_count = update.enrolled_count;
+    if (card) {
+        card.querySelector('.event-spots').textContent = formatSpots(event);
+    }
+}
+
+// Seats taken, out of the limit when the event has one
+function formatSpots(event) {
+    return event.max_participants
+        ? `${event.enrolled_count}/${event.max_participants} spots filled`
+        : `${event.enrolled_count} enrolled`;
+}
+
 // Check if user info is stored in localStorage
 function checkStoredUser() {
     const storedUser = localStorage.getItem('routeVentureUser');
@@ -28,11 +82,14 @@ function setupEventListeners() {
     // User registration form
     document.getElementById('userForm').addEventListener('submit', handleUserRegistration);
     
-    // Search functionality
-    document.getElementById('searchInput').addEventListener('input', filterEvents);
+    // Search functionality (server-side full-text search, debounced while typing)
+    document.getElementById('searchInput').addEventListener('input', () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => loadEvents(), SEARCH_DELAY_MS);
+    });
     
-    // Filter by type
-    document.getElementById('filterType').addEventListener('change', filterEvents);
+    // Filter by type (server-side, restarts paging)
+    document.getElementById('filterType').addEventListener('change', () => loadEvents());
 }
 
 // Handle user registration
@@ -43,7 +100,7 @@ async function handleUserRegistration(e) {
     const email = document.getElementById('userEmail').value;
     
     try {
-        const response = await fetch('/api/user/add', {
+        const response = await fetch('/api/user/get-or-create', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -56,8 +113,12 @@ async function handleUserRegistration(e) {
         if (response.ok) {
             currentUserId = data.id;
             // Store user info in localStorage
-            localStorage.setItem('routeVentureUser', JSON.stringify({ id: data.id, name, email }));
-            showUserStatus('Registration successful! You can now enroll in events.', 'success');
+            localStorage.setItem('routeVentureUser', JSON.stringify({ id: data.id, name: data.name, email: data.email }));
+            if (data.created) {
+                showUserStatus('Registration successful! You can now enroll in events.', 'success');
+            } else {
+                showUserStatus(`Welcome back, ${data.name}! You can now enroll in events.`, 'success');
+            }
         } else {
             showUserStatus(`Error: ${data.error}`, 'danger');
         }
@@ -75,13 +136,35 @@ function showUserStatus(message, type) {
     </div>`;
 }
 
-// Load all events
-async function loadEvents() {
+// Load the first page of events, or the next page when append is true.
+// With a search term the page comes from full-text search, best match first.
+async function loadEvents(append = false) {
+    const requestNumber = ++eventsRequest;
     try {
-        const response = await fetch('/api/events');
-        const events = await response.json();
-        allEvents = events;
-        displayEvents(events);
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        const searchTerm = document.getElementById('searchInput').value.trim();
+        const filterType = document.getElementById('filterType').value;
+        if (searchTerm) {
+            params.set('q', searchTerm);
+        }
+        if (filterType) {
+            params.set('event_type', filterType);
+        }
+        if (append && eventsCursor) {
+            params.set('after', eventsCursor);
+        }
+        
+        const url = searchTerm ? `/api/events/search?${params}` : `/api/events?${params}`;
+        const response = await fetch(url);
+        const page = await response.json();
+        // A newer search was started while this one was in flight
+        if (requestNumber !== eventsRequest) {
+            return;
+        }
+        allEvents = append ? allEvents.concat(page.items) : page.items;
+        eventsCursor = page.next_cursor;
+        document.getElementById('loadMoreEvents').classList.toggle('d-none', !eventsCursor);
+        displayEvents(allEvents);
     } catch (error) {
         document.getElementById('eventsList').innerHTML = 
             '<div class="col-12"><div class="alert alert-danger">Failed to load events</div></div>';
@@ -119,13 +202,8 @@ function createEventCard(event) {
     };
     
     const icon = typeIcons[event.event_type] || 'bi-calendar-event';
-    const spotsText = event.max_participants 
-        ? `${event.enrolled_count}/${event.max_participants} spots filled`
-        : `${event.enrolled_count} enrolled`;
-    
-    const isFull = event.max_participants && event.enrolled_count >= event.max_participants;
     const eventCard = `
-        <div class="col-md-6 col-lg-4 mb-4">
+        <div class="col-md-6 col-lg-4 mb-4" data-event-id="${event.id}">
             <div class="card h-100 shadow-sm">
                 <div class="card-body">
                     <div class="d-flex justify-content-between align-items-start mb-2">
@@ -137,6 +215,7 @@ function createEventCard(event) {
                         <p class="mb-1"><i class="bi bi-geo-alt"></i> ${event.location}</p>
                         <p class="mb-1"><i class="bi bi-calendar"></i> ${event.event_date}</p>
                         <p class="mb-1"><i class="bi bi-clock"></i> ${event.event_time}</p>
+                        <p class="mb-1"><i class="bi bi-people"></i> <span class="event-spots">${formatSpots(event)}</span></p>
                     </div>
                     
                     <!-- QR Code Thumbnail (NEW) -->
@@ -185,24 +264,23 @@ function enrollInEvent(eventId, eventTitle) {
 // Confirm enrollment
 document.getElementById('confirmEnroll').addEventListener('click', async function() {
     try {
-        const response = await fetch('/api/enroll', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                event_id: currentEventId,
-                user_id: currentUserId
-            })
-        });
+        let data = await requestEnrollment(false);
         
-        const data = await response.json();
+        if (data.status === 409 && data.body.full &&
+                confirm('This event is full. Would you like to join the waitlist?')) {
+            data = await requestEnrollment(true);
+        }
         
-        if (response.ok) {
+        if (data.status === 202) {
+            alert(`Event is full. You are #${data.body.waitlist_position} on the waitlist.`);
+        } else if (data.ok) {
             alert('Enrollment successful!');
-            loadEvents(); // Reload events to update enrollment count
-        } else {
-            alert(`Error: ${data.error}`);
+            // The seat count arrives over the live update stream when it is open
+            if (!seatUpdates) {
+                loadEvents();
+            }
+        } else if (!data.body.full) {
+            alert(`Error: ${data.body.error}`);
         }
     } catch (error) {
         alert('Enrollment failed. Please try again.');
@@ -211,21 +289,21 @@ document.getElementById('confirmEnroll').addEventListener('click', async functio
     bootstrap.Modal.getInstance(document.getElementById('enrollModal')).hide();
 });
 
-// Filter events
-function filterEvents() {
-    const searchTerm = document.getElementById('searchInput').value.toLowerCase();
-    const filterType = document.getElementById('filterType').value;
-    
-    const filtered = allEvents.filter(event => {
-        const matchesSearch = event.title.toLowerCase().includes(searchTerm) || 
-                            event.description.toLowerCase().includes(searchTerm) ||
-                            event.location.toLowerCase().includes(searchTerm);
-        const matchesType = !filterType || event.event_type === filterType;
-        
-        return matchesSearch && matchesType;
+// Post an enrollment request, optionally joining the waitlist when the event is full
+async function requestEnrollment(waitlist) {
+    const response = await fetch('/api/enroll', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            event_id: currentEventId,
+            user_id: currentUserId,
+            waitlist: waitlist
+        })
     });
     
-    displayEvents(filtered);
+    return { ok: response.ok, status: response.status, body: await response.json() };
 }
 
 /**
@@ -0,0 +1,80 @@
+# static_assets.py - Fingerprinted, precompressed static files and rendered pages held in memory
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli  # Optional, adds Content-Encoding: br when installed
+except ImportError:
+    brotli = None
+
+# Types worth compressing; images and fonts are already compressed
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+class Asset:
+    """One response body with its precomputed gzip and brotli variants"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.encoded = {}
+        if mimetype.startswith(COMPRESSIBLE_TYPES):
+            variants = {'gzip': gzip.compress(body, 9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(body, quality=11)
+            # A variant that is not smaller only costs the client a decode
+            self.encoded = {name: data for name, data in variants.items() if len(data) < len(body)}
+
+    def negotiate(self, accept_encodings):
+        """
+        Pick the smallest variant the client accepts, given werkzeug's parsed
+        Accept-Encoding header. Returns (body, content_encoding or None).
+        """
+        best = (self.body, None)
+        for name, data in self.encoded.items():
+            if accept_encodings[name] > 0 and len(data) < len(best[0]):
+                best = (data, name)
+        return best
+
+class StaticAssets:
+    """
+    Every file under static_folder, read once, keyed by its fingerprinted
+    name: css/style.css becomes css/style.<hash>.css. The hash changes with
+    the content, so fingerprinted URLs can be cached by browsers for good.
+    Dotfiles are skipped.
+    """
+
+    def __init__(self, static_folder):
+        self.fingerprinted = {}
+        self.assets = {}
+        for root, dirs, files in os.walk(static_folder):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    body = f.read()
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                asset = Asset(body, mimetype)
+                stem, ext = os.path.splitext(filename)
+                fingerprinted = f'{stem}.{asset.etag[:10]}{ext}'
+                self.fingerprinted[filename] = fingerprinted
+                self.assets[fingerprinted] = asset
+
+    def url_filename(self, filename):
+        """Fingerprinted name to link to, or filename itself when it is not a known asset"""
+        return self.fingerprinted.get(filename, filename)
+
+    def lookup(self, filename):
+        """Return (asset, immutable) for a fingerprinted or plain name, or (None, False)"""
+        if filename in self.assets:
+            return self.assets[filename], True
+        fingerprinted = self.fingerprinted.get(filename)
+        if fingerprinted is not None:
+            return self.assets[fingerprinted], False
+        return None, False
@@ -0,0 +1,27 @@
+# conftest.py - Shared fixtures: a testing app on its own database with one user and one event
+
+import pytest
+
+import database as db
+from app import create_app
+
+
+@pytest.fixture
+def app_overrides():
+    """Config overrides for the app fixture; a test module redefines this fixture to change them"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_overrides):
+    app = create_app('testing', DATABASE_NAME=str(tmp_path / 'route_venture_test.db'), **app_overrides)
+    with app.app_context():
+        user_id = db.add_user('Hiker', 'hiker@example.com')
+        db.add_event('Ridge walk', 'Morning hike', 'hiking', 'Trailhead', '2030-05-01', '09:00', None, user_id)
+    yield app
+    db.close_all_connections()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
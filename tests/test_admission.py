@@ -0,0 +1,37 @@
+# test_admission.py - Rate limits (429) and concurrency gates (503) in front of the write routes
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def app_overrides():
+    return {'RATE_LIMIT_ENABLED': True, 'RATE_LIMITS': {'write': (0.01, 2)},
+            'CONCURRENCY_LIMITS': {'write': 1}, 'CONCURRENCY_MAX_WAIT': 0.05}
+
+
+def add_user(client, number, address='10.0.0.1'):
+    return client.post('/api/user/add', json={'name': f'Hiker {number}', 'email': f'hiker{number}@example.com'},
+                       environ_base={'REMOTE_ADDR': address})
+
+
+def test_empty_bucket_answers_429(client):
+    assert [add_user(client, number).status_code for number in (2, 3)] == [201, 201]
+    response = add_user(client, 4)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    # Every client address has a bucket of its own
+    assert add_user(client, 4, '10.0.0.2').status_code == 201
+
+
+def test_full_gate_answers_503(client):
+    gate = app_module.concurrency_gates['write']
+    assert gate.acquire()
+    try:
+        response = add_user(client, 2)
+    finally:
+        gate.release()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert add_user(client, 2).status_code == 201
@@ -0,0 +1,63 @@
+# test_archive.py - Moving past events to the archive, include_archived reads and the archived statistics
+
+import sqlite3
+
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def app_overrides(tmp_path):
+    return {'ARCHIVE_DATABASE_PATH': str(tmp_path / 'archive.db')}
+
+
+@pytest.fixture
+def app(app):
+    """Two past camping trips and a past hike, each with the fixture's user enrolled, moved to the archive"""
+    with app.app_context():
+        for title, event_type in (('Lake camp', 'camping'), ('Forest camp', 'camping'), ('Old ridge', 'hiking')):
+            event_id = db.add_event(title, 'Past trip', event_type, 'Trailhead', '2020-06-01', '09:00', None, 1)
+            db.enroll_user(event_id, 1)
+        assert db.archive_events('2021-01-01') == (3, 3)
+    return app
+
+
+def by_type(stats):
+    return {row['event_type']: row['count'] for row in stats['events_by_type']}
+
+
+def test_archived_events_leave_the_live_reads(client):
+    assert [event['id'] for event in client.get('/api/events').get_json()] == [1]
+    assert len(client.get('/api/events?include_archived=1').get_json()) == 4
+    assert client.get('/api/user/1/enrollments').get_json() == []
+    assert len(client.get('/api/user/1/enrollments?include_archived=1').get_json()) == 3
+
+
+def test_stats_include_archived_events_by_type(client):
+    live = client.get('/api/admin/stats').get_json()
+    assert (live['total_events'], live['total_enrollments']) == (1, 0)
+    assert by_type(live) == {'hiking': 1}
+
+    stats = client.get('/api/admin/stats?include_archived=1').get_json()
+    assert (stats['total_events'], stats['total_enrollments']) == (4, 3)
+    assert by_type(stats) == {'camping': 2, 'hiking': 2}
+    assert sum(by_type(stats).values()) == stats['total_events']
+
+
+def test_reconcile_rebuilds_the_archived_counters(app, tmp_path):
+    with app.app_context():
+        assert db.reconcile_stats(fix=False) == {}
+    # Drift the archived figures behind the module's back
+    conn = sqlite3.connect(tmp_path / 'route_venture_test.db')
+    with conn:
+        conn.execute("UPDATE stats_counters SET value = 7 WHERE name = 'archived_events'")
+        conn.execute('DELETE FROM stats_archived_event_types')
+    conn.close()
+
+    with app.app_context():
+        drift = db.reconcile_stats()
+        assert drift['archived_events'] == {'stored': 7, 'actual': 3}
+        assert drift['archived_events_by_type'] == {'stored': {}, 'actual': {'camping': 2, 'hiking': 1}}
+        assert db.reconcile_stats(fix=False) == {}
+        assert by_type(db.get_enrollment_stats(include_archived=True)) == {'camping': 2, 'hiking': 2}
@@ -0,0 +1,18 @@
+# test_batch.py - Which sub-requests /api/batch runs
+
+import pytest
+
+
+def test_json_endpoints_are_batched(client):
+    body = client.post('/api/batch', json={'requests': ['/api/event/1', '/api/events?limit=5']}).get_json()
+    assert [response['status'] for response in body['responses']] == [200, 200]
+    assert body['responses'][0]['body']['title'] == 'Ridge walk'
+
+
+@pytest.mark.parametrize('path', [
+    '/api/events/stream', '/api/events/qrcodes.zip', '/api/event/1/enrollments/export',
+    '/api/events?stream=1', '/api/users?format=ndjson', '/api/event/1/enrollments?stream=1',
+])
+def test_streaming_endpoints_are_rejected(client, path):
+    body = client.post('/api/batch', json={'requests': [path]}).get_json()
+    assert body['responses'] == [{'status': 400, 'body': {'error': 'Streaming endpoints cannot be batched'}}]
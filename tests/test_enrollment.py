@@ -0,0 +1,61 @@
+# test_enrollment.py - Event capacity, the waitlist and the enrollment counter
+
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        for i in range(2, 5):
+            db.add_user(f'Hiker {i}', f'hiker{i}@example.com')
+        db.update_event(1, max_participants=2)
+    return app
+
+
+def enroll(client, user_id, waitlist=False):
+    return client.post('/api/enroll', json={'event_id': 1, 'user_id': user_id, 'waitlist': waitlist})
+
+
+def roster(client):
+    return sorted(user['id'] for user in client.get('/api/event/1/enrollments').get_json())
+
+
+def test_full_event_answers_409(client):
+    assert [enroll(client, user_id).status_code for user_id in (1, 2)] == [201, 201]
+    response = enroll(client, 3)
+    assert response.status_code == 409
+    assert response.get_json()['full'] is True
+    assert roster(client) == [1, 2]
+
+
+def test_full_event_waitlists_on_request(client):
+    enroll(client, 1)
+    enroll(client, 2)
+    first, second = enroll(client, 3, waitlist=True), enroll(client, 4, waitlist=True)
+    assert (first.status_code, first.get_json()['waitlist_position']) == (202, 1)
+    assert (second.status_code, second.get_json()['waitlist_position']) == (202, 2)
+    assert roster(client) == [1, 2]
+
+
+def test_unenroll_promotes_the_first_waitlisted_user(client):
+    enroll(client, 1)
+    enroll(client, 2)
+    enroll(client, 3, waitlist=True)
+    enroll(client, 4, waitlist=True)
+    response = client.post('/api/unenroll', json={'event_id': 1, 'user_id': 1})
+    assert response.get_json()['promoted_user_id'] == 3
+    assert roster(client) == [2, 3]
+    assert client.get('/api/event/1').get_json()['enrolled_count'] == 2
+
+
+def test_put_cannot_change_the_counter(app, client):
+    enroll(client, 1)
+    enroll(client, 2)
+    assert client.put('/api/event/update/1', json={'enrolled_count': 0}).status_code == 400
+    assert client.put('/api/event/update/1', json={'max_participants': 1}).status_code == 400
+    assert enroll(client, 3).status_code == 409
+    with app.app_context():
+        assert db.check_enrollment_counts() == []
+    assert client.get('/api/event/1').get_json()['enrolled_count'] == 2
@@ -0,0 +1,75 @@
+# test_event_stream.py - Seat count updates pushed over /api/events/stream
+
+import json
+
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def app_overrides():
+    return {'EVENT_STREAM_HEARTBEAT': 0.5, 'EVENT_STREAM_MIN_INTERVAL': 0}
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        db.add_user('Hiker 2', 'hiker2@example.com')
+        db.update_event(1, max_participants=5)
+    return app
+
+
+def next_message(chunks):
+    """The next message of the stream as {field: value}, skipping keep-alive comments"""
+    for chunk in chunks:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if not text.startswith(':'):
+            return dict(line.split(': ', 1) for line in text.strip().splitlines())
+    raise AssertionError('The stream ended')
+
+
+def open_stream(client, last_event_id=None):
+    headers = {'Last-Event-ID': str(last_event_id)} if last_event_id is not None else {}
+    response = client.get('/api/events/stream', headers=headers, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    return response, iter(response.response)
+
+
+def test_enrollment_is_pushed_to_an_open_stream(client):
+    response, chunks = open_stream(client)
+    try:
+        start = next_message(chunks)
+        assert start['retry'] == '3000'
+        assert client.post('/api/enroll', json={'event_id': 1, 'user_id': 2}).status_code == 201
+
+        message = next_message(chunks)
+        assert message['event'] == 'seats'
+        assert int(message['id']) > int(start['id'])
+        assert json.loads(message['data']) == [{'event_id': 1, 'enrolled_count': 1, 'remaining': 4}]
+    finally:
+        response.close()
+
+
+def test_reconnect_resumes_from_last_event_id(client):
+    response, chunks = open_stream(client)
+    start = next_message(chunks)
+    response.close()
+    assert client.post('/api/enroll', json={'event_id': 1, 'user_id': 2}).status_code == 201
+
+    response, chunks = open_stream(client, start['id'])
+    try:
+        next_message(chunks)
+        message = next_message(chunks)
+        assert message['event'] == 'seats'
+        assert json.loads(message['data']) == [{'event_id': 1, 'enrolled_count': 1, 'remaining': 4}]
+    finally:
+        response.close()
+
+
+def test_full_stream_capacity_answers_503(app, client):
+    app.config['EVENT_STREAM_MAX_SUBSCRIBERS'] = 0
+    response = client.get('/api/events/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
@@ -0,0 +1,37 @@
+# test_list_shapes.py - The full list and the paged object of /api/events and /api/users
+
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def app_overrides(tmp_path):
+    return {'ARCHIVE_DATABASE_PATH': str(tmp_path / 'archive.db')}
+
+
+@pytest.mark.parametrize('path', [
+    '/api/events', '/api/events?_=1', '/api/events?include_archived=0', '/api/events?include_archived=1',
+    '/api/users', '/api/users?_=1',
+])
+def test_unrelated_parameters_return_the_full_list(client, path):
+    assert isinstance(client.get(path).get_json(), list)
+
+
+@pytest.mark.parametrize('path', [
+    '/api/events?limit=10', '/api/events?event_type=hiking', '/api/events?location=Trailhead',
+    '/api/events?fields=id,title', '/api/users?after=0', '/api/users?fields=id',
+])
+def test_paging_parameters_return_one_page(client, path):
+    body = client.get(path).get_json()
+    assert set(body) == {'items', 'next_cursor'}
+    assert len(body['items']) == 1
+
+
+def test_include_archived_applies_to_both_shapes(app, client):
+    with app.app_context():
+        db.archive_events('2031-01-01')
+    assert client.get('/api/events').get_json() == []
+    assert [event['id'] for event in client.get('/api/events?include_archived=1').get_json()] == [1]
+    assert client.get('/api/events?limit=10').get_json()['items'] == []
+    assert [event['id'] for event in client.get('/api/events?limit=10&include_archived=1').get_json()['items']] == [1]
@@ -0,0 +1,44 @@
+# test_query_plans.py - Every hot query must be served by an index
+
+import pytest
+
+import database as db
+
+
+def test_hot_queries_use_an_index():
+    assert db.check_query_plans() == []
+
+
+def test_full_table_scan_is_reported(monkeypatch):
+    def users_by_name(name):
+        return db.get_db_connection().execute('SELECT * FROM users WHERE name = ?', (name,)).fetchall()
+
+    monkeypatch.setattr(db, 'HOT_QUERIES', [(users_by_name, ('Hiker 1',))])
+    problems = db.check_query_plans()
+    assert [(func_name, step) for func_name, _, step in problems] == [('users_by_name', 'SCAN users')]
+
+
+def test_full_index_walk_is_reported(monkeypatch):
+    def events_by_date():
+        return db.get_db_connection().execute('SELECT * FROM events ORDER BY event_date').fetchall()
+
+    monkeypatch.setattr(db, 'HOT_QUERIES', [(events_by_date, ())])
+    problems = db.check_query_plans()
+    assert [step for _, _, step in problems] == ['SCAN events USING INDEX idx_events_date']
+
+
+@pytest.mark.parametrize('index, func_name', [
+    ('idx_events_date', 'get_all_events'),
+    ('idx_enrollments_user', 'get_user_enrollments'),
+    ('idx_events_enrolled', '_read_enrollment_stats'),
+])
+def test_dropped_index_is_reported(monkeypatch, index, func_name):
+    init_db = db.init_db
+
+    def init_db_without_index(conn=None):
+        version = init_db(conn)
+        conn.execute(f'DROP INDEX {index}')
+        return version
+
+    monkeypatch.setattr(db, 'init_db', init_db_without_index)
+    assert func_name in {problem[0] for problem in db.check_query_plans()}
@@ -0,0 +1,37 @@
+# test_response_cache.py - Cached GET responses, their revalidation and invalidation by writes
+
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        db.add_user('Hiker 2', 'hiker2@example.com')
+    return app
+
+
+def test_repeat_read_is_a_hit_and_revalidates(client):
+    first = client.get('/api/event/1')
+    assert first.headers['X-Cache'] == 'MISS'
+    second = client.get('/api/event/1')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json()
+
+    revalidated = client.get('/api/event/1', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+
+def test_write_invalidates_the_cached_response(client):
+    before = client.get('/api/event/1')
+    assert client.get('/api/events').headers['X-Cache'] == 'MISS'
+    assert client.post('/api/enroll', json={'event_id': 1, 'user_id': 2}).status_code == 201
+
+    after = client.get('/api/event/1')
+    assert after.headers['X-Cache'] == 'MISS'
+    assert after.get_json()['enrolled_count'] == before.get_json()['enrolled_count'] + 1
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert client.get('/api/event/1', headers={'If-None-Match': before.headers['ETag']}).status_code == 200
+    assert client.get('/api/events').headers['X-Cache'] == 'MISS'
@@ -0,0 +1,50 @@
+# test_write_queue.py - Enrollments through the group-commit queue when their caller times out
+
+import threading
+import time
+
+import pytest
+
+import app as app_module
+import database as db
+
+
+@pytest.fixture
+def app_overrides():
+    return {'WRITE_QUEUE_ENABLED': True, 'WRITE_QUEUE_TIMEOUT': 0.1}
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context():
+        db.add_user('Hiker 2', 'hiker2@example.com')
+    # Every batch takes longer than WRITE_QUEUE_TIMEOUT to commit
+    apply_batch = app_module.enrollment_queue.apply_batch
+    def slow_batch(requests):
+        time.sleep(0.4)
+        return apply_batch(requests)
+    app_module.enrollment_queue.apply_batch = slow_batch
+    return app
+
+
+def enrolled_users(app):
+    with app.app_context():
+        return sorted(row['id'] for row in db.get_event_enrollments(1))
+
+
+def test_timeout_waits_for_a_batch_that_is_already_committing(app):
+    response = app.test_client().post('/api/enroll', json={'event_id': 1, 'user_id': 1})
+    assert response.status_code == 201
+    assert enrolled_users(app) == [1]
+
+
+def test_timeout_withdraws_a_request_that_is_still_queued(app):
+    first = threading.Thread(target=app.test_client().post, args=('/api/enroll',),
+                             kwargs={'json': {'event_id': 1, 'user_id': 1}})
+    first.start()
+    time.sleep(0.1)
+    response = app.test_client().post('/api/enroll', json={'event_id': 1, 'user_id': 2})
+    first.join()
+    assert response.status_code == 503
+    time.sleep(0.5)
+    assert enrolled_users(app) == [1]
@@ -0,0 +1,83 @@
+# write_queue.py - Write-behind queue that group-commits batches of requests on one writer thread
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class QueueFullError(Exception):
+    """Raised when a request is submitted while max_pending requests are already waiting"""
+
+class GroupCommitQueue:
+    """
+    Funnels write requests from many threads to a single writer thread.
+    The writer takes every request that queued up while the previous batch
+    was being committed (up to max_batch) and hands them to
+    apply_batch(requests), which must write them in one transaction and
+    return one result or exception per request. Each caller gets its own
+    result through the Future returned by submit().
+
+    The writer thread starts on the first submit(), so a queue created before
+    gunicorn forks its workers gets one writer per worker process.
+    """
+
+    def __init__(self, apply_batch, max_batch=64, max_delay=0.0, max_pending=1024, on_batch=None):
+        self.apply_batch = apply_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.on_batch = on_batch
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, request):
+        """Queue one request and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((request, future))
+        except queue.Full:
+            raise QueueFullError('Too many writes are waiting, please retry') from None
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Block for one request, then take whatever else is already waiting"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Skip requests whose caller already gave up
+            batch = [(request, future) for request, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                results = self.apply_batch([request for request, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            if self.on_batch is not None:
+                self.on_batch(len(batch), time.perf_counter() - started)